@@ -7,6 +7,15 @@ from .transcriber.transcriber import transcriber_instance
 from .validator.validation import Validator
 from models.models import AudioTranscription, TranscriptionGroup, SpeechSegment
 
+# Un Validator por modelo y worker: parsear la fraseología, compilar el grafo y crear
+# el cliente de Ollama en cada conversación es más caro que la propia validación corta
+_validators = {}
+
+def get_validator(model):
+    if model not in _validators:
+        _validators[model] = Validator(model=model)
+    return _validators[model]
+
 @shared_task
 def process_audio_task(audio_file_id):
     try:
@@ -159,7 +168,7 @@ def validate_conversation_task(conversation_data, model="phi4", group_id=None):
                     print(f"Error al actualizar el estado de validación: {str(db_error)}")
         
         # Inicializamos el validador con el modelo especificado
-        validator = Validator(model=model)
+        validator = get_validator(model)
         
         # Invocamos la validación
         # El método invoke ahora devuelve un resultado serializado
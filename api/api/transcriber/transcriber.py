@@ -576,6 +576,12 @@ class TranscriptionAgent:
         # Añadir el prompt del sistema y la solicitud del usuario a los mensajes
         messages = state['messages']
         messages = messages + [SystemMessage(content=system_prompt), HumanMessage(content="Select the best transcript")]
+        # Respuestas cacheadas por modelo + mensajes (api/llm_cache.py). Import diferido y absoluto:
+        # el módulo está en el paquete principal, fuera de este paquete legacy
+        if self.llm.cache is None:
+            from api.llm_cache import get_llm_cache
+            self.llm.cache = get_llm_cache()
+
         # Invocar el LLM para seleccionar la mejor transcripción
         message_content = self.llm.invoke(messages)
         message = AIMessage(content=message_content)
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        # Recarga del diccionario de normalización al editar correcciones
+        from .transcriber.normalization_dictionary import connect_signals
+        connect_signals()
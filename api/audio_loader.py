@@ -0,0 +1,316 @@
+"""
+Carga de audio compartida por diarización, transcripción y recortes para la UI.
+
+Cada fichero se decodifica una sola vez: un subproceso ffmpeg convierte cualquier formato a
+PCM float32 mono y lo escribe por un pipe directamente en un array de NumPy (sin WAVs
+temporales, pydub ni librosa). El resto de etapas trabaja con ese buffer y sus vistas
+(`waveform[start_sample:end_sample]`).
+
+El remuestreo lo hace ffmpeg (swresample) o, con AUDIO_RESAMPLER=soxr, la librería soxr
+sobre el PCM a la frecuencia original.
+
+Un PCM ya decodificado se puede guardar como .npy (`save_pcm`) y abrirse con memory-map
+(`open_pcm`): los procesos que lo leen comparten las páginas del fichero en lugar de copiar
+el audio, y `load_audio(..., cache_path=...)` evita volver a decodificar el original. En ese
+modo la decodificación va por bloques directamente al .npy (`decode_to_pcm`), así que una
+grabación de varias horas nunca está entera en memoria. AUDIO_PCM_CACHE_DIR no crece sin
+límite: pasado AUDIO_PCM_CACHE_MAX_BYTES se borran los PCM usados hace más tiempo. Sin caché,
+las grabaciones largas se vuelcan igualmente a un .npy temporal (`spill_pcm`).
+"""
+import os
+import uuid
+import hashlib
+import logging
+import tempfile
+import subprocess
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+FFMPEG_BINARY = os.getenv('FFMPEG_BINARY', 'ffmpeg')
+FFPROBE_BINARY = os.getenv('FFPROBE_BINARY', 'ffprobe')
+# 'ffmpeg' (por defecto) o 'soxr'
+AUDIO_RESAMPLER = os.getenv('AUDIO_RESAMPLER', 'ffmpeg').lower()
+# Directorio de PCM decodificados (.npy) que la diarización abre con memory-map (vacío = en memoria)
+AUDIO_PCM_CACHE_DIR = os.getenv('AUDIO_PCM_CACHE_DIR') or None
+
+# PCM temporales de las grabaciones largas cuando no hay AUDIO_PCM_CACHE_DIR (por defecto el tmp
+# del sistema; con el servidor de modelos en otro contenedor debe ser un volumen compartido)
+AUDIO_PCM_SPILL_DIR = os.getenv('AUDIO_PCM_SPILL_DIR') or tempfile.gettempdir()
+SPILL_PREFIX = 'vlas-pcm-'
+# Tamaño máximo de AUDIO_PCM_CACHE_DIR; al superarlo se borran los PCM usados hace más tiempo
+AUDIO_PCM_CACHE_MAX_BYTES = int(os.getenv('AUDIO_PCM_CACHE_MAX_BYTES', str(20 * 1024 ** 3)))
+
+READ_CHUNK_BYTES = 1 << 20
+NPY_HEADER_BYTES = 128
+
+
+class AudioDecodeError(RuntimeError):
+    """ffmpeg no ha podido decodificar el fichero (o no está instalado)."""
+
+
+def _iter_ffmpeg(command: list):
+    """Ejecuta ffmpeg/ffprobe y genera su stdout por bloques de READ_CHUNK_BYTES."""
+    try:
+        process = subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    except FileNotFoundError as e:
+        raise AudioDecodeError(f"{command[0]} not found, install ffmpeg or set FFMPEG_BINARY/FFPROBE_BINARY") from e
+
+    try:
+        while True:
+            chunk = process.stdout.read(READ_CHUNK_BYTES)
+            if not chunk:
+                break
+            yield chunk
+        stderr = process.stderr.read()
+        if process.wait() != 0:
+            raise AudioDecodeError(f"{command[0]} failed ({process.returncode}): {stderr.decode(errors='replace').strip()}")
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+
+
+def _run_ffmpeg(command: list) -> bytearray:
+    """Ejecuta ffmpeg/ffprobe y devuelve su stdout completo."""
+    # Un único bytearray: el array final se crea sobre él sin copiarlo
+    output = bytearray()
+    for chunk in _iter_ffmpeg(command):
+        output += chunk
+    return output
+
+
+def probe_sample_rate(audio_path: str) -> int:
+    """Frecuencia de muestreo del primer stream de audio."""
+    output = _run_ffmpeg([
+        FFPROBE_BINARY, '-v', 'error', '-select_streams', 'a:0',
+        '-show_entries', 'stream=sample_rate', '-of', 'csv=p=0', audio_path
+    ])
+    return int(output.decode().strip().splitlines()[0])
+
+
+def probe_duration(audio_path: str):
+    """Duración en segundos según el contenedor (None si ffprobe no la conoce)."""
+    output = _run_ffmpeg([
+        FFPROBE_BINARY, '-v', 'error', '-show_entries', 'format=duration', '-of', 'csv=p=0', audio_path
+    ])
+    try:
+        return float(output.decode().strip().splitlines()[0])
+    except (ValueError, IndexError):
+        return None
+
+
+def _decode_command(audio_path: str, rate: int, offset: float = None, duration: float = None) -> list:
+    command = [FFMPEG_BINARY, '-nostdin', '-v', 'error']
+    if offset:
+        command += ['-ss', f'{offset:.3f}']
+    if duration is not None:
+        command += ['-t', f'{duration:.3f}']
+    return command + ['-i', audio_path, '-map', '0:a:0', '-f', 'f32le', '-acodec', 'pcm_f32le', '-ac', '1', '-ar', str(rate), '-']
+
+
+def decode_audio(audio_path: str, sample_rate: int = SAMPLE_RATE, offset: float = None,
+                 duration: float = None, resampler: str = None) -> np.ndarray:
+    """
+    Decodifica (un tramo de) un fichero de audio a float32 mono.
+
+    Args:
+        audio_path (str): Fichero en cualquier formato soportado por ffmpeg.
+        sample_rate (int): Frecuencia de salida.
+        offset (float, optional): Segundo de inicio del tramo.
+        duration (float, optional): Duración del tramo en segundos.
+        resampler (str, optional): 'ffmpeg' o 'soxr'. Por defecto AUDIO_RESAMPLER.
+
+    Returns:
+        np.ndarray: Muestras float32 mono a `sample_rate`.
+    """
+    if not os.path.exists(audio_path):
+        raise FileNotFoundError(f"El archivo de audio {audio_path} no existe")
+
+    resampler = (resampler or AUDIO_RESAMPLER).lower()
+    source_rate = probe_sample_rate(audio_path) if resampler == 'soxr' else sample_rate
+
+    waveform = np.frombuffer(_run_ffmpeg(_decode_command(audio_path, source_rate, offset, duration)), dtype=np.float32)
+
+    if source_rate != sample_rate:
+        import soxr
+        waveform = soxr.resample(waveform, source_rate, sample_rate, quality='HQ').astype(np.float32, copy=False)
+    return waveform
+
+
+def _npy_header(samples: int) -> bytes:
+    """
+    Cabecera .npy (formato 1.0) de un vector float32 de `samples` muestras, rellenada siempre a
+    NPY_HEADER_BYTES para poder reservarla antes de conocer la longitud y escribirla al final.
+    """
+    header = repr({'descr': np.lib.format.dtype_to_descr(np.dtype('<f4')), 'fortran_order': False, 'shape': (samples,)})
+    header_len = NPY_HEADER_BYTES - len(np.lib.format.MAGIC_PREFIX) - 4
+    return np.lib.format.magic(1, 0) + header_len.to_bytes(2, 'little') + header.ljust(header_len - 1).encode('latin1') + b'\n'
+
+
+def decode_to_pcm(audio_path: str, pcm_path: str, sample_rate: int = SAMPLE_RATE, resampler: str = None) -> str:
+    """
+    Decodifica un fichero directamente a un .npy en disco sin tenerlo entero en memoria
+    (grabaciones de varias horas): se reserva la cabecera, la salida de ffmpeg se vuelca por
+    bloques detrás y la cabecera se escribe al final con el número de muestras. Cada muestra
+    se escribe una sola vez.
+    """
+    if not os.path.exists(audio_path):
+        raise FileNotFoundError(f"El archivo de audio {audio_path} no existe")
+
+    resampler = (resampler or AUDIO_RESAMPLER).lower()
+    source_rate = probe_sample_rate(audio_path) if resampler == 'soxr' else sample_rate
+    stream = None
+    if source_rate != sample_rate:
+        import soxr
+        stream = soxr.ResampleStream(source_rate, sample_rate, 1, dtype='float32', quality='HQ')
+
+    folder = os.path.dirname(pcm_path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    tmp_path = f"{pcm_path}.{os.getpid()}.tmp"
+    try:
+        samples = 0
+        with open(tmp_path, 'wb') as pcm:
+            pcm.write(b'\0' * NPY_HEADER_BYTES)
+            for chunk in _iter_ffmpeg(_decode_command(audio_path, source_rate)):
+                block = np.frombuffer(chunk, dtype=np.float32)
+                if stream is not None:
+                    block = stream.resample_chunk(block)
+                pcm.write(block.tobytes())
+                samples += len(block)
+            if stream is not None:
+                block = stream.resample_chunk(np.zeros(0, dtype=np.float32), last=True)
+                pcm.write(block.tobytes())
+                samples += len(block)
+            pcm.seek(0)
+            pcm.write(_npy_header(samples))
+        os.replace(tmp_path, pcm_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return pcm_path
+
+
+def save_pcm(pcm_path: str, waveform: np.ndarray) -> str:
+    """Guarda un PCM decodificado como .npy float32 (escritura atómica)."""
+    folder = os.path.dirname(pcm_path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    tmp_path = f"{pcm_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        np.save(f, np.asarray(waveform, dtype=np.float32))
+    os.replace(tmp_path, pcm_path)
+    return pcm_path
+
+
+def open_pcm(pcm_path: str) -> np.ndarray:
+    """Abre un PCM guardado con `save_pcm` con memory-map de solo lectura."""
+    return np.load(pcm_path, mmap_mode='r')
+
+
+def load_audio(audio_path: str, cache_path: str = None, sample_rate: int = SAMPLE_RATE):
+    """
+    Buffer float32 mono de un fichero de audio, decodificado una sola vez.
+
+    Args:
+        audio_path (str): Fichero original.
+        cache_path (str, optional): .npy con el PCM ya decodificado. Si existe y es más reciente
+                                    que el original se abre con memory-map; si no, se decodifica
+                                    por bloques ahí y se abre igual.
+        sample_rate (int): Frecuencia de salida.
+
+    Returns:
+        tuple: (waveform float32, sample_rate)
+    """
+    if cache_path and os.path.exists(cache_path) and os.path.getmtime(cache_path) >= os.path.getmtime(audio_path):
+        try:
+            waveform = open_pcm(cache_path)
+            os.utime(cache_path)  # Orden LRU de evict_pcm_cache
+            return waveform, sample_rate
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable PCM cache {cache_path}: {e}")
+
+    if cache_path:
+        # Decodificación por bloques directamente al .npy: memoria constante sea cual sea la duración
+        try:
+            waveform = open_pcm(decode_to_pcm(audio_path, cache_path, sample_rate=sample_rate))
+            evict_pcm_cache(os.path.dirname(cache_path), keep=cache_path)
+            return waveform, sample_rate
+        except OSError as e:
+            logger.warning(f"Could not write PCM cache {cache_path}: {e}")
+    return decode_audio(audio_path, sample_rate=sample_rate), sample_rate
+
+
+def evict_pcm_cache(cache_dir: str, max_bytes: int = None, keep: str = None):
+    """
+    Borra los .npy de `cache_dir` usados hace más tiempo hasta quedar por debajo de `max_bytes`
+    (por defecto AUDIO_PCM_CACHE_MAX_BYTES). Un fichero borrado que otro proceso tiene abierto
+    con memory-map sigue siendo válido para él hasta que lo cierra.
+    """
+    max_bytes = AUDIO_PCM_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    entries = []
+    with os.scandir(cache_dir) as it:
+        for entry in it:
+            if entry.name.endswith('.npy') and entry.is_file():
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        if keep and os.path.abspath(path) == os.path.abspath(keep):
+            continue
+        try:
+            os.remove(path)
+            total -= size
+            logger.info(f"Evicted PCM cache {path}")
+        except OSError as e:
+            logger.warning(f"Could not evict PCM cache {path}: {e}")
+
+
+def spill_pcm(audio_path: str, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """
+    Decodifica por bloques a un .npy temporal en AUDIO_PCM_SPILL_DIR y lo abre con memory-map:
+    para grabaciones largas sin AUDIO_PCM_CACHE_DIR. Quien termina con el audio lo borra
+    (`release_spill` o borrando `waveform.filename`).
+    """
+    pcm_path = os.path.join(AUDIO_PCM_SPILL_DIR, f"{SPILL_PREFIX}{uuid.uuid4().hex}.npy")
+    return open_pcm(decode_to_pcm(audio_path, pcm_path, sample_rate=sample_rate))
+
+
+def is_spill(pcm_path: str) -> bool:
+    """El fichero es un volcado temporal de `spill_pcm`."""
+    return bool(pcm_path) and os.path.basename(pcm_path).startswith(SPILL_PREFIX)
+
+
+def in_pcm_cache(pcm_path: str) -> bool:
+    """El fichero es una entrada de AUDIO_PCM_CACHE_DIR (la gestiona `evict_pcm_cache`)."""
+    if not (AUDIO_PCM_CACHE_DIR and pcm_path):
+        return False
+    return os.path.dirname(os.path.abspath(pcm_path)) == os.path.abspath(AUDIO_PCM_CACHE_DIR)
+
+
+def release_spill(waveform):
+    """Borra el .npy temporal de `spill_pcm` (acepta el buffer o su ruta; no hace nada con otros)."""
+    pcm_path = waveform if isinstance(waveform, str) else getattr(waveform, 'filename', None)
+    if is_spill(pcm_path) and os.path.exists(pcm_path):
+        try:
+            os.remove(pcm_path)
+        except OSError as e:
+            logger.warning(f"Could not remove spilled PCM {pcm_path}: {e}")
+
+
+def pcm_cache_path(audio_path: str):
+    """
+    Ruta del PCM cacheado de un fichero en AUDIO_PCM_CACHE_DIR (None si no está configurado).
+    La clave incluye tamaño y fecha del original: si se sustituye, se decodifica de nuevo.
+    """
+    if not AUDIO_PCM_CACHE_DIR:
+        return None
+    stat = os.stat(audio_path)
+    key = hashlib.sha1(f"{os.path.abspath(audio_path)}:{stat.st_size}:{stat.st_mtime_ns}".encode()).hexdigest()
+    return os.path.join(AUDIO_PCM_CACHE_DIR, f"{key}.npy")
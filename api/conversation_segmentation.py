@@ -0,0 +1,110 @@
+"""
+Segmentación del flujo de `SpeechSegment` de una sesión en intercambios piloto–ATCO.
+
+El Validator espera una conversación (`list[tuple[rol, frase]]`), pero el pipeline 3.0 produce
+una lista plana de segmentos ordenados por tiempo. Un intercambio termina (y empieza otro) cuando:
+    - cambia el fichero de audio,
+    - el silencio entre transmisiones supera `max_gap` segundos,
+    - aparece un distintivo de llamada distinto del último identificado,
+    - el mismo interlocutor vuelve a transmitir tras más de `same_speaker_gap` segundos
+      (dentro de un intercambio los interlocutores se alternan: instrucción → colación),
+    - el intercambio alcanza `max_turns` transmisiones.
+
+Todas las reglas se evalúan a la vez sobre arrays de NumPy (tiempos, roles, audio y
+distintivos codificados como enteros) en una sola pasada lineal, sin bucles por segmento
+salvo la extracción del distintivo de llamada.
+"""
+import numpy as np
+from django.conf import settings
+
+from .validator.utils.fast_paths import callsign_key
+
+# Roles que forman parte de un intercambio (el resto es ruido/otros)
+EXCHANGE_ROLES = {'ATCO': 0, 'PILOT': 1}
+UNKNOWN = -1
+
+
+def _forward_fill(codes: np.ndarray) -> np.ndarray:
+    """Para cada posición, el último código conocido (>= 0) hasta ella, o UNKNOWN."""
+    positions = np.where(codes != UNKNOWN, np.arange(len(codes)), -1)
+    np.maximum.accumulate(positions, out=positions)
+    return np.where(positions >= 0, codes[np.maximum(positions, 0)], UNKNOWN)
+
+
+class ConversationSegmenter:
+    """
+    Args:
+        max_gap (float): Silencio (s) que separa dos intercambios.
+        same_speaker_gap (float): Silencio (s) tras el cual una nueva transmisión del mismo
+                                  interlocutor abre otro intercambio.
+        max_turns (int): Transmisiones máximas por intercambio (0 = sin límite).
+    """
+
+    def __init__(self, max_gap: float = None, same_speaker_gap: float = None, max_turns: int = None):
+        self.max_gap = max_gap if max_gap is not None else getattr(settings, 'VALIDATION_CONVERSATION_GAP_S', 30)
+        self.same_speaker_gap = same_speaker_gap if same_speaker_gap is not None else getattr(settings, 'VALIDATION_SAME_SPEAKER_GAP_S', 5)
+        self.max_turns = max_turns if max_turns is not None else getattr(settings, 'VALIDATION_MAX_EXCHANGE_TURNS', 8)
+
+    def boundaries(self, starts, ends, roles, audios, callsigns) -> np.ndarray:
+        """
+        Calcula dónde empieza cada intercambio.
+
+        Args:
+            starts, ends (array[float]): Tiempos de cada transmisión (ordenadas por audio y tiempo).
+            roles (array[int]): Rol codificado (ver EXCHANGE_ROLES).
+            audios (array[int]): Fichero de audio codificado.
+            callsigns (array[int]): Distintivo de llamada codificado, UNKNOWN si no se identificó.
+
+        Returns:
+            np.ndarray: Índices (crecientes, sin el 0) en los que empieza un intercambio nuevo.
+        """
+        n = len(starts)
+        if n < 2:
+            return np.empty(0, dtype=np.intp)
+
+        gaps = starts[1:] - ends[:-1]
+        last_callsign = _forward_fill(callsigns)[:-1]
+
+        is_start = np.zeros(n, dtype=bool)
+        is_start[1:] = (
+            (audios[1:] != audios[:-1])
+            | (gaps > self.max_gap)
+            | ((callsigns[1:] != UNKNOWN) & (last_callsign != UNKNOWN) & (callsigns[1:] != last_callsign))
+            | ((roles[1:] == roles[:-1]) & (gaps > self.same_speaker_gap))
+        )
+
+        if self.max_turns:
+            # Posición de cada transmisión dentro de su intercambio: se corta cada max_turns
+            index = np.arange(n)
+            exchange_start = np.where(is_start, index, 0)
+            np.maximum.accumulate(exchange_start, out=exchange_start)
+            position = index - exchange_start
+            is_start |= (position > 0) & (position % self.max_turns == 0)
+
+        return np.flatnonzero(is_start)
+
+    def split(self, segments) -> list:
+        """
+        Agrupa los segmentos de una sesión (ordenados por audio y start_time) en intercambios.
+
+        Returns:
+            list[list[SpeechSegment]]: Intercambios con al menos una transmisión ATCO/PILOT con texto.
+        """
+        segments = [s for s in segments if s.speaker_role in EXCHANGE_ROLES and s.text_content.strip()]
+        if not segments:
+            return []
+
+        audio_codes, callsign_codes = {}, {}
+        starts = np.fromiter((s.start_time for s in segments), dtype=np.float64, count=len(segments))
+        ends = np.fromiter((s.end_time for s in segments), dtype=np.float64, count=len(segments))
+        roles = np.fromiter((EXCHANGE_ROLES[s.speaker_role] for s in segments), dtype=np.int8, count=len(segments))
+        audios = np.fromiter((audio_codes.setdefault(s.audio_file_id, len(audio_codes)) for s in segments), dtype=np.int32, count=len(segments))
+
+        callsigns = np.full(len(segments), UNKNOWN, dtype=np.int32)
+        for i, segment in enumerate(segments):
+            key = callsign_key(segment.text_content)
+            if key is not None:
+                callsigns[i] = callsign_codes.setdefault(key, len(callsign_codes))
+
+        bounds = [0, *self.boundaries(starts, ends, roles, audios, callsigns).tolist(), len(segments)]
+        return [segments[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
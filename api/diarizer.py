@@ -1,17 +1,106 @@
 import os
+import time
+import logging
+import resource
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 import torch
+import numpy as np
 import soundfile as sf
-from librosa import load
 from scipy import signal
-from pydub import AudioSegment
+from scipy.optimize import linear_sum_assignment
 from dotenv import load_dotenv
 from pyannote.audio import Pipeline
 from diarizers import SegmentationModel
 
+from . import audio_loader
+from .transcription_cache import get_transcription_cache, hash_pcm, make_key
+
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 HF_TOKEN = os.getenv('HF_TOKEN')
 
+# Identifica los modelos en las claves de la caché de diarización
+DIARIZATION_MODEL_ID = "pyannote/speaker-diarization-3.1+miguelozaalon/speaker-segmentation-atc"
+
+
+# Muestras por bloque del filtro pasa-bajos de `clean_audio`
+FILTER_CHUNK_SAMPLES = 1 << 20
+
+# Diarización por ventanas de las grabaciones largas (0 = siempre de una vez)
+DIARIZATION_CHUNK_S = float(os.getenv('DIARIZATION_CHUNK_S', '900'))
+DIARIZATION_CHUNK_OVERLAP_S = float(os.getenv('DIARIZATION_CHUNK_OVERLAP_S', '30'))
+# Distancia coseno máxima entre el embedding de un hablante de una ventana y el centroide global
+DIARIZATION_STITCH_THRESHOLD = float(os.getenv('DIARIZATION_STITCH_THRESHOLD', '0.7'))
+# Ventanas diarizadas en paralelo. El Pipeline de pyannote no es thread-safe y se llama bajo
+# un lock, así que sólo se admite 1: la ventana siguiente se diariza mientras se une la anterior
+DIARIZATION_CHUNK_WORKERS = int(os.getenv('DIARIZATION_CHUNK_WORKERS', '1'))
+if DIARIZATION_CHUNK_WORKERS != 1:
+    logger.warning(f"DIARIZATION_CHUNK_WORKERS={DIARIZATION_CHUNK_WORKERS} not supported (pyannote pipeline is not thread-safe), using 1")
+    DIARIZATION_CHUNK_WORKERS = 1
+
+
+@lru_cache(maxsize=None)
+def _lowpass_sos(sampling_rate: int) -> np.ndarray:
+    """Coeficientes SOS (float32) del filtro de `clean_audio`, calculados una vez por frecuencia."""
+    Wn = 1600 / (sampling_rate / 2) # Por debajo de este humbral pasa la señal (Frecuencia de Nyquist)
+    return signal.butter(N=4, Wn=Wn, btype='low', analog=False, output='sos').astype(np.float32)
+
+
+class SpeakerStitcher:
+    """
+    Une los hablantes locales de cada ventana en hablantes globales.
+
+    Cada hablante global es el centroide de los embeddings de pyannote que se le han asignado.
+    Los hablantes de una ventana se emparejan con los globales por asignación óptima (una
+    ventana no puede unir a dos de sus hablantes en el mismo global) con distancia coseno por
+    debajo de `threshold`; el resto abre hablantes globales nuevos.
+    """
+
+    def __init__(self, threshold: float = DIARIZATION_STITCH_THRESHOLD):
+        self.threshold = threshold
+        self.sums = []
+        self.counts = []
+
+    def _new_speaker(self, embedding) -> int:
+        self.sums.append(None if embedding is None else embedding.copy())
+        self.counts.append(0 if embedding is None else 1)
+        return len(self.sums) - 1
+
+    def assign(self, embeddings: dict) -> dict:
+        """
+        Args:
+            embeddings (dict): Etiqueta local -> embedding (None si pyannote no pudo calcularlo).
+
+        Returns:
+            dict: Etiqueta local -> etiqueta global ('SPEAKER_00', ...).
+        """
+        labels = [label for label, e in embeddings.items() if e is not None and np.all(np.isfinite(e))]
+        mapping = {}
+        known = [i for i, count in enumerate(self.counts) if count]
+        if labels and known:
+            local = np.stack([embeddings[label] for label in labels])
+            centroids = np.stack([self.sums[i] / self.counts[i] for i in known])
+            local = local / np.linalg.norm(local, axis=1, keepdims=True)
+            centroids = centroids / np.linalg.norm(centroids, axis=1, keepdims=True)
+            distances = 1.0 - local @ centroids.T
+            for row, column in zip(*linear_sum_assignment(distances)):
+                if distances[row, column] <= self.threshold:
+                    mapping[labels[row]] = known[column]
+
+        for label, embedding in embeddings.items():
+            if label not in mapping:
+                valid = embedding is not None and np.all(np.isfinite(embedding))
+                mapping[label] = self._new_speaker(embedding if valid else None)
+            elif embedding is not None:
+                self.sums[mapping[label]] += embedding
+                self.counts[mapping[label]] += 1
+        return {label: f"SPEAKER_{index:02d}" for label, index in mapping.items()}
+
 
 if torch.cuda.is_available():
     device = torch.device("cuda")
@@ -20,96 +109,327 @@ else:
 
 class AudioDiarization:
     def __init__(self):
+        start = time.time()
         self.pipeline = Pipeline.from_pretrained("pyannote/speaker-diarization-3.1", use_auth_token=HF_TOKEN).to(device)
         model = SegmentationModel().from_pretrained("miguelozaalon/speaker-segmentation-atc", use_auth_token=HF_TOKEN)
         model = model.to_pyannote_model()
         self.pipeline._segmentation.model = model.to(device)
+        # El Pipeline de pyannote no es thread-safe: una inferencia a la vez
+        self._pipeline_lock = threading.Lock()
+        self.load_time = time.time() - start
+        self.warmup_time = None
+        logger.info(f"Pyannote pipeline loaded on {device} in {self.load_time:.1f}s")
 
+    def warmup(self, seconds: float = 2.0):
+        """
+        Ejecuta una inferencia corta sobre ruido sintético para que CUDA/cuDNN hagan su
+        autotuning y se inicialicen los kernels antes del primer audio real.
+        """
+        start = time.time()
+        generator = torch.Generator().manual_seed(0)
+        waveform = 0.01 * torch.randn(1, int(16000 * seconds), generator=generator)
+        try:
+            with self._pipeline_lock:
+                self.pipeline({"waveform": waveform, "sample_rate": 16000})
+        except Exception as e:
+            logger.warning(f"Pyannote warm-up failed: {e}")
+            return None
+        self.warmup_time = time.time() - start
+        logger.info(f"Pyannote warm-up done in {self.warmup_time:.2f}s")
+        return self.warmup_time
 
-    def invoke(self, audio_path: str):
-        if not os.path.exists(audio_path):
-            raise FileNotFoundError(f"El archivo de audio {audio_path} no existe")
-
-        # 1. Convertir cualquier formato a WAV estándar (16kHz, mono) usando pydub (ffmpeg)
-        temp_wav_path = f"temp_clean_{os.path.basename(audio_path)}.wav"
-        if not temp_wav_path.lower().endswith(".wav"):
-             temp_wav_path += ".wav"
-
-        audio_segment = AudioSegment.from_file(audio_path)
-        audio_segment = audio_segment.set_channels(1).set_frame_rate(16000)
-        audio_segment.export(temp_wav_path, format="wav")
+    def health(self):
+        """Información de diagnóstico: tiempos de carga/calentamiento y memoria ocupada."""
+        modules = [
+            getattr(self.pipeline._segmentation, 'model', None),
+            getattr(self.pipeline._embedding, 'model_', None),
+        ]
+        parameter_bytes = sum(
+            p.numel() * p.element_size()
+            for module in modules if isinstance(module, torch.nn.Module)
+            for p in module.parameters()
+        )
+        info = {
+            'loaded': True,
+            'device': str(device),
+            'load_time_s': round(self.load_time, 2),
+            'warmup_time_s': round(self.warmup_time, 2) if self.warmup_time is not None else None,
+            'parameters_mb': round(parameter_bytes / 1024 ** 2, 1),
+            'process_max_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        }
+        if device.type == 'cuda':
+            info['cuda_allocated_mb'] = round(torch.cuda.memory_allocated(device) / 1024 ** 2, 1)
+            info['cuda_reserved_mb'] = round(torch.cuda.memory_reserved(device) / 1024 ** 2, 1)
+        return info
 
-        # 2. Cargar con librosa desde el WAV temporal confiable
-        array, sr = load(temp_wav_path, sr=None)
+    def is_loaded(self):
+        """Devuelve True si el pipeline ya está en memoria."""
+        return getattr(self, 'pipeline', None) is not None
 
-        # 3. Limpiar audio (filtro pasa-bajos)
-        audio_data = self.clean_audio(array, sr)
 
-        # 4. Guardar audio filtrado para diarización
-        # Sobrescribimos el temporal o usamos otro nombre. Pyannote necesita un archivo en disco.
-        processed_audio_path = f"processed_{os.path.basename(audio_path)}.wav"
-        sf.write(processed_audio_path, audio_data, sr)
-
-        # Limpiar primer temporal
-        if os.path.exists(temp_wav_path):
-            os.remove(temp_wav_path)
+    def invoke(self, audio_path: str):
+        """
+        Diariza el audio y exporta un WAV por turno en `<nombre>_segments/`.
 
-        # 5. Ejecutar pipeline sobre audio procesado
-        result = self.pipeline(processed_audio_path)
-        
-        # Limpiar segundo temporal
-        if os.path.exists(processed_audio_path):
-            os.remove(processed_audio_path)
+        Returns:
+            list[dict]: {'path', 'start_time', 'end_time'} por cada turno.
+        """
+        waveform, sr = self.load_audio(audio_path)
 
         # Get the folder path for segments
         base_dir = os.path.dirname(audio_path)
         basename = os.path.splitext(os.path.basename(audio_path))[0]
         folder_path = os.path.join(base_dir, f"{basename}_segments")
-        
-        # Create a list to store segment paths
-        segment_paths = []
-        
-        # Save segments and collect paths
-        for idx, (turn, _, speaker) in enumerate(result.itertracks(yield_label=True), 1):
-            segment_path = os.path.join(folder_path, f"{speaker}_{idx}.wav")
-            segment_paths.append({'path': segment_path, 'start_time': turn.start, 'end_time': turn.end})
-            
-        if folder_path == "":
-            folder_path = "."
-        # Save the segments
-        self.save_segments(folder_path, audio_path, result)
 
-        return segment_paths
+        # Save the segments as they are diarized
+        try:
+            return self.save_segments(folder_path, waveform, sr, self.iter_segments(waveform, sr))
+        finally:
+            audio_loader.release_spill(waveform)
 
-    def save_segments(self, folder_path: str, audio_path: str, diarization_result):
+    def diarize(self, audio_path: str):
         """
-        Guarda los segmentos de audio por hablante en la carpeta especificada.
+        Modo pipeline en memoria: diariza sin exportar ningún WAV de segmento.
+
+        Returns:
+            tuple: (waveform, segments)
+                - waveform (np.ndarray): Audio completo float32 mono 16 kHz (buffer compartido). Si es un
+                  memory-map (`waveform.filename`), quien termina con el audio borra el fichero.
+                - segments (list[dict]): {'start_time', 'end_time', 'label', 'start_sample', 'end_sample'}
+                  por cada turno. `waveform[start_sample:end_sample]` es una vista del turno (sin copia).
         """
-        audio = AudioSegment.from_file(audio_path)
+        waveform, sr = self.load_audio(audio_path)
+        try:
+            return waveform, self._diarized_segments(audio_path, waveform, sr)
+        except BaseException:
+            audio_loader.release_spill(waveform)
+            raise
 
-        if not os.path.exists(folder_path):
-            os.makedirs(folder_path)
+    def _diarized_segments(self, audio_path: str, waveform: np.ndarray, sr: int):
+        """Turnos de `waveform` (de la caché de diarización si ya se calcularon)."""
+        # Capa de diarización de la caché: mismo PCM -> mismos turnos
+        cache = get_transcription_cache()
+        key_parts = [hash_pcm(waveform), sr, DIARIZATION_MODEL_ID] if cache else None
+        if cache is not None and self._is_chunked(len(waveform), sr):
+            key_parts.append(f"chunked:{DIARIZATION_CHUNK_S}/{DIARIZATION_CHUNK_OVERLAP_S}/{DIARIZATION_STITCH_THRESHOLD}")
+        cache_key = make_key(*key_parts) if cache else None
+        if cache is not None:
+            cached = cache.get('diarization', cache_key)
+            if cached is not None:
+                logger.info(f"Diarization cache hit for {audio_path}")
+                return cached
+
+        segments = list(self.iter_segments(waveform, sr))
 
-        for idx, (turn, _, speaker) in enumerate(diarization_result.itertracks(yield_label=True), 1):
-            start_time = turn.start
-            end_time = turn.end
+        if cache is not None:
+            cache.put('diarization', cache_key, segments)
+
+        return segments
+
+    def iter_segments(self, waveform: np.ndarray, sr: int):
+        """
+        Genera los turnos de la diarización en orden: {'start_time', 'end_time', 'label',
+        'start_sample', 'end_sample'}. Las grabaciones de más de DIARIZATION_CHUNK_S segundos se
+        diarizan por ventanas (ver `_iter_chunked`) y los turnos salen según se completa cada una.
+        """
+        if self._is_chunked(len(waveform), sr):
+            yield from self._iter_chunked(waveform, sr)
+            return
+        for start_time, end_time, label in self._turns(self.diarize_waveform(waveform, sr)):
+            segment = self._segment(start_time, end_time, label, sr, len(waveform))
+            if segment is not None:
+                yield segment
 
-            start_ms = start_time * 1000
-            end_ms = end_time * 1000
+    @staticmethod
+    def _turns(annotation, offset: float = 0.0):
+        for turn, _, speaker in annotation.itertracks(yield_label=True):
+            yield offset + turn.start, offset + turn.end, speaker
 
-            # Recortar el audio
-            speaker_audio = audio[start_ms:end_ms]
+    @staticmethod
+    def _segment(start_time: float, end_time: float, label: str, sr: int, n_samples: int):
+        start_sample = max(0, int(round(start_time * sr)))
+        end_sample = min(n_samples, int(round(end_time * sr)))
+        if end_sample <= start_sample:
+            return None
+        return {
+            'start_time': start_time,
+            'end_time': end_time,
+            'label': label,
+            'start_sample': start_sample,
+            'end_sample': end_sample,
+        }
 
+    @staticmethod
+    def _is_chunked(n_samples: int, sr: int) -> bool:
+        return DIARIZATION_CHUNK_S > 0 and n_samples > (DIARIZATION_CHUNK_S + DIARIZATION_CHUNK_OVERLAP_S) * sr
+
+    @staticmethod
+    def _windows(n_samples: int, sr: int):
+        """
+        Ventanas (start, end, own_start, own_end) en muestras. Las ventanas consecutivas se solapan
+        DIARIZATION_CHUNK_OVERLAP_S segundos y cada una es dueña del tramo entre los puntos medios
+        de sus solapes: un turno pertenece a la ventana que contiene su punto medio.
+        """
+        window = int(DIARIZATION_CHUNK_S * sr)
+        overlap = min(int(DIARIZATION_CHUNK_OVERLAP_S * sr), window // 2)
+        starts = list(range(0, max(n_samples - overlap, 1), window - overlap))
+        # La última ventana se alinea con el final para que tenga la duración completa
+        starts[-1] = max(0, min(starts[-1], n_samples - window))
+        ends = [min(start + window, n_samples) for start in starts]
+        owners = [0] + [(start + previous_end) // 2 for start, previous_end in zip(starts[1:], ends[:-1])] + [n_samples]
+        return [(starts[i], ends[i], owners[i], owners[i + 1]) for i in range(len(starts))]
+
+    def _diarize_window(self, waveform: np.ndarray, sr: int, start: int, end: int):
+        """Diariza una ventana. Devuelve (turnos en tiempo global, embeddings por etiqueta local)."""
+        audio_data = self.clean_audio(waveform[start:end], sr)
+        with self._pipeline_lock:
+            annotation, embeddings = self.pipeline(
+                {"waveform": torch.from_numpy(audio_data)[None], "sample_rate": sr}, return_embeddings=True
+            )
+        labels = annotation.labels()
+        by_label = {
+            label: (np.asarray(embeddings[i], dtype=np.float64) if embeddings is not None and i < len(embeddings) else None)
+            for i, label in enumerate(labels)
+        }
+        return list(self._turns(annotation, offset=start / sr)), by_label
+
+    def _iter_chunked(self, waveform: np.ndarray, sr: int):
+        """
+        Diarización por ventanas solapadas para grabaciones de varias horas.
+
+        Solo se filtra y se pasa a pyannote una ventana a la vez (la siguiente se diariza mientras
+        se une la anterior), así que la memoria no crece con la duración; la forma de onda completa
+        tampoco, porque las grabaciones largas llegan en memory-map (ver `load_audio`). Los hablantes de cada ventana
+        se unen a los globales por sus embeddings (`SpeakerStitcher`), en orden, y los turnos se
+        generan en cuanto su ventana está lista.
+        """
+        windows = self._windows(len(waveform), sr)
+        logger.info(f"Chunked diarization: {len(waveform) / sr:.0f}s in {len(windows)} windows of {DIARIZATION_CHUNK_S:.0f}s")
+        stitcher = SpeakerStitcher()
+
+        with ThreadPoolExecutor(max_workers=max(1, DIARIZATION_CHUNK_WORKERS), thread_name_prefix='diarize-window') as executor:
+            pending = deque()
+            remaining = iter(windows)
+            for window in remaining:
+                pending.append((window, executor.submit(self._diarize_window, waveform, sr, window[0], window[1])))
+                if len(pending) >= max(1, DIARIZATION_CHUNK_WORKERS):
+                    break
+
+            while pending:
+                (start, end, own_start, own_end), future = pending.popleft()
+                # Mantener como mucho DIARIZATION_CHUNK_WORKERS ventanas en vuelo
+                following = next(remaining, None)
+                if following is not None:
+                    pending.append((following, executor.submit(self._diarize_window, waveform, sr, following[0], following[1])))
+
+                turns, embeddings = future.result()
+                labels = stitcher.assign(embeddings)
+                for start_time, end_time, label in sorted(turns):
+                    middle = (start_time + end_time) / 2 * sr
+                    if not own_start <= middle < own_end:
+                        continue
+                    segment = self._segment(start_time, end_time, labels[label], sr, len(waveform))
+                    if segment is not None:
+                        yield segment
+
+    def load_audio(self, audio_path: str):
+        """
+        Decodifica cualquier formato a float32 mono 16 kHz (una única pasada de ffmpeg,
+        ver `audio_loader.py`). Con AUDIO_PCM_CACHE_DIR el resultado es un memory-map; sin él,
+        las grabaciones que se diarizan por ventanas se vuelcan a un .npy temporal
+        (`audio_loader.spill_pcm`) para no tenerlas enteras en memoria.
+
+        Returns:
+            tuple: (waveform float32, sample_rate)
+        """
+        cache_path = audio_loader.pcm_cache_path(audio_path)
+        if cache_path is None and DIARIZATION_CHUNK_S > 0:
+            duration = audio_loader.probe_duration(audio_path)
+            if duration is not None and self._is_chunked(int(duration * audio_loader.SAMPLE_RATE), audio_loader.SAMPLE_RATE):
+                return audio_loader.spill_pcm(audio_path), audio_loader.SAMPLE_RATE
+        return audio_loader.load_audio(audio_path, cache_path=cache_path)
+
+    def diarize_waveform(self, waveform: np.ndarray, sr: int):
+        """Filtra la forma de onda y ejecuta pyannote. Devuelve la anotación de pyannote."""
+        # 3. Limpiar audio (filtro pasa-bajos)
+        audio_data = self.clean_audio(waveform, sr)
+
+        # 4. Ejecutar pipeline sobre el audio filtrado en memoria (sin WAV temporal)
+        with self._pipeline_lock:
+            return self.pipeline({"waveform": torch.from_numpy(audio_data)[None], "sample_rate": sr})
+
+    def save_segments(self, folder_path: str, waveform: np.ndarray, sr: int, segments):
+        """
+        Guarda los segmentos de audio por hablante en la carpeta especificada, recortándolos
+        del buffer ya decodificado a medida que llegan.
+
+        Returns:
+            list[dict]: {'path', 'start_time', 'end_time'} por cada segmento.
+        """
+        if folder_path and not os.path.exists(folder_path):
+            os.makedirs(folder_path)
+
+        segment_paths = []
+        for idx, segment in enumerate(segments, 1):
             # Crear el nombre del archivo de salida usando el índice global
-            output_filename = os.path.join(folder_path, f"{speaker}_{idx}.wav")
+            output_filename = os.path.join(folder_path, f"{segment['label']}_{idx}.wav")
 
             # Guardar el fragmento de audio
-            speaker_audio.export(output_filename, format="wav")
+            sf.write(output_filename, waveform[segment['start_sample']:segment['end_sample']], sr)
+            segment_paths.append({'path': output_filename, 'start_time': segment['start_time'], 'end_time': segment['end_time']})
+        return segment_paths
 
     def clean_audio(self, audio, sampling_rate):
         """
-        Clean the noise from the audio
+        Clean the noise from the audio (4th order low-pass Butterworth at 1600 Hz).
+
+        Filters in float32, in chunks of FILTER_CHUNK_SAMPLES carrying the filter state between
+        them, so the only full-length allocation is the filtered output.
         """
-        Wn = 1600 / (sampling_rate / 2) # Por debajo de este humbral pasa la señal (Frecuencia de Nyquist)
-        sos = signal.butter(N=4, Wn=Wn, btype='low', analog=False, output='sos')
-        return signal.sosfilt(sos, audio)
+        sos = _lowpass_sos(sampling_rate)
+        audio = np.asarray(audio)
+        filtered = np.empty(len(audio), dtype=np.float32)
+        zi = np.zeros((sos.shape[0], 2), dtype=np.float32)
+        for start in range(0, len(audio), FILTER_CHUNK_SAMPLES):
+            end = start + FILTER_CHUNK_SAMPLES
+            filtered[start:end], zi = signal.sosfilt(sos, audio[start:end].astype(np.float32, copy=False), zi=zi)
+        return filtered
+
+
+def export_segment_audio(audio_path: str, start_time: float, end_time: float, output_path: str):
+    """
+    Recorta un tramo del audio original y lo guarda como WAV (16 kHz mono).
+    Se usa para generar bajo demanda los recortes que pide la UI para reproducir.
+    """
+    sr = audio_loader.SAMPLE_RATE
+    array = audio_loader.decode_audio(audio_path, sample_rate=sr, offset=start_time, duration=max(0.0, end_time - start_time))
+
+    folder = os.path.dirname(output_path)
+    if folder and not os.path.exists(folder):
+        os.makedirs(folder)
+
+    sf.write(output_path, array, sr)
+    return output_path
+
+
+# Instancia global lazy (una por proceso, reutilizada entre tareas)
+_diarizer_instance = None
+
+def get_diarizer_instance():
+    global _diarizer_instance
+    if _diarizer_instance is None:
+        _diarizer_instance = AudioDiarization()
+    return _diarizer_instance
+
+def is_diarizer_loaded():
+    """Chequeo rápido para ver si pyannote está en memoria en este proceso."""
+    global _diarizer_instance
+    if _diarizer_instance and _diarizer_instance.is_loaded():
+        return True
+    return False
+
+def diarizer_health():
+    """Estado del diarizador de este proceso sin forzar su carga."""
+    if not is_diarizer_loaded():
+        return {'loaded': False}
+    return _diarizer_instance.health()
@@ -0,0 +1,208 @@
+"""
+Caché de respuestas de LLM (LangChain `BaseCache`) para el Validator, el sanitizador semántico y el selector de transcripciones legacy.
+
+Las peticiones son deterministas (temperatura baja) y muchas frases se repiten entre sesiones
+("recibido", "autorizado despegue pista 27"...), así que se reutiliza la respuesta de una
+petición idéntica. La clave es el hash de la configuración del modelo (nombre, temperatura...)
+más la lista completa de mensajes, tal y como los serializa LangChain.
+
+Configuración (variables de entorno, el Validator no depende de Django):
+    LLM_CACHE_BACKEND       'memory' (por defecto), 'sqlite' o 'none'
+    LLM_CACHE_PATH          fichero SQLite (por defecto media/cache/llm_cache.sqlite3)
+    LLM_CACHE_TTL           segundos de validez de una respuesta (0 = sin caducidad)
+    LLM_CACHE_MAX_ENTRIES   número máximo de respuestas (expulsión LRU)
+
+Uso:
+    ChatOllama(model=..., cache=get_llm_cache())
+"""
+import os
+import time
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+
+import xxhash
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'media', 'cache', 'llm_cache.sqlite3')
+
+
+class ResponseCache(BaseCache):
+    """
+    Caché con caducidad (TTL) y expulsión LRU por número de entradas.
+
+    Args:
+        backend (str): 'memory' (diccionario del proceso) o 'sqlite' (compartida entre procesos).
+        path (str): Fichero SQLite para el backend 'sqlite'.
+        ttl (float): Segundos de validez de cada respuesta. 0/None = sin caducidad.
+        max_entries (int): Número máximo de respuestas guardadas.
+    """
+
+    def __init__(self, backend: str = 'memory', path: str = None, ttl: float = None, max_entries: int = DEFAULT_MAX_ENTRIES):
+        if backend not in ('memory', 'sqlite'):
+            raise ValueError(f"Unknown LLM cache backend: {backend}")
+        self.backend = backend
+        self.ttl = ttl or None
+        self.max_entries = max_entries
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+        self._lock = threading.Lock()
+
+        if backend == 'memory':
+            self._entries = OrderedDict()  # key -> (expires_at, generations)
+        else:
+            self.path = path or DEFAULT_PATH
+            self._local = threading.local()
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            with self._connection() as conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS llm_cache ("
+                    " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+                    " expires_at REAL, last_access REAL NOT NULL)"
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_last_access ON llm_cache (last_access)")
+
+    @staticmethod
+    def _key(prompt: str, llm_string: str) -> str:
+        return xxhash.xxh3_128_hexdigest(f"{llm_string}\x1f{prompt}".encode('utf-8'))
+
+    def _connection(self):
+        # Una conexión por hilo: las llamadas async de LangChain llegan desde un executor
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, hit: bool):
+        with self._lock:
+            self.stats['hits' if hit else 'misses'] += 1
+
+    # ---------------------------------------------------------
+    # Interfaz BaseCache
+    # ---------------------------------------------------------
+
+    def lookup(self, prompt: str, llm_string: str):
+        key = self._key(prompt, llm_string)
+        now = time.time()
+        value = None
+
+        if self.backend == 'memory':
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    expires_at, generations = entry
+                    if expires_at is not None and expires_at < now:
+                        del self._entries[key]
+                    else:
+                        self._entries.move_to_end(key)
+                        value = generations
+        else:
+            try:
+                with self._connection() as conn:
+                    row = conn.execute("SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+                    if row is not None:
+                        if row[1] is not None and row[1] < now:
+                            conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                        else:
+                            conn.execute("UPDATE llm_cache SET last_access = ? WHERE key = ?", (now, key))
+                            value = loads(row[0])
+            except sqlite3.Error as e:
+                logger.warning(f"LLM cache read failed: {e}")
+
+        self._count(value is not None)
+        return value
+
+    def update(self, prompt: str, llm_string: str, return_val):
+        key = self._key(prompt, llm_string)
+        now = time.time()
+        expires_at = now + self.ttl if self.ttl else None
+
+        if self.backend == 'memory':
+            with self._lock:
+                self._entries[key] = (expires_at, return_val)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.stats['evictions'] += 1
+            return
+
+        try:
+            with self._connection() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, value, expires_at, last_access) VALUES (?, ?, ?, ?)",
+                    (key, dumps(return_val), expires_at, now)
+                )
+                excess = conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0] - self.max_entries
+                if excess > 0:
+                    conn.execute(
+                        "DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache ORDER BY last_access LIMIT ?)",
+                        (excess,)
+                    )
+                    with self._lock:
+                        self.stats['evictions'] += excess
+        except sqlite3.Error as e:
+            logger.warning(f"LLM cache write failed: {e}")
+
+    def clear(self, **kwargs):
+        if self.backend == 'memory':
+            with self._lock:
+                self._entries.clear()
+        else:
+            with self._connection() as conn:
+                conn.execute("DELETE FROM llm_cache")
+
+    async def alookup(self, prompt: str, llm_string: str):
+        if self.backend == 'memory':
+            # Operación en memoria: no merece la pena pasar por el executor
+            return self.lookup(prompt, llm_string)
+        return await super().alookup(prompt, llm_string)
+
+    async def aupdate(self, prompt: str, llm_string: str, return_val):
+        if self.backend == 'memory':
+            return self.update(prompt, llm_string, return_val)
+        return await super().aupdate(prompt, llm_string, return_val)
+
+    # ---------------------------------------------------------
+    # Métricas
+    # ---------------------------------------------------------
+
+    def size(self) -> int:
+        if self.backend == 'memory':
+            return len(self._entries)
+        with self._connection() as conn:
+            return conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+    def get_stats(self) -> dict:
+        """Aciertos/fallos acumulados en este proceso y tamaño actual de la caché."""
+        with self._lock:
+            stats = dict(self.stats)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 3) if lookups else 0.0
+        stats['entries'] = self.size()
+        stats['backend'] = self.backend
+        return stats
+
+
+# Instancia global lazy
+_llm_cache_instance = None
+
+def get_llm_cache():
+    """Caché compartida por los modelos de este proceso, o None si está desactivada."""
+    global _llm_cache_instance
+    backend = os.getenv('LLM_CACHE_BACKEND', 'memory').lower()
+    if backend == 'none':
+        return None
+    if _llm_cache_instance is None:
+        _llm_cache_instance = ResponseCache(
+            backend=backend,
+            path=os.getenv('LLM_CACHE_PATH') or None,
+            ttl=float(os.getenv('LLM_CACHE_TTL', '0')),
+            max_entries=int(os.getenv('LLM_CACHE_MAX_ENTRIES', str(DEFAULT_MAX_ENTRIES)))
+        )
+    return _llm_cache_instance
@@ -0,0 +1,243 @@
+"""
+Cliente común para los LLM externos (Gemini) y locales (Ollama) del Validator y del sanitizador.
+
+Política compartida por todas las llamadas:
+    - httpx con pool de conexiones (un `AsyncClient` por event loop) y timeouts por petición.
+    - Reintentos con backoff exponencial con jitter (tenacity) ante errores de red, 429 y 5xx.
+    - Circuit breaker por backend: tras `LLM_BREAKER_THRESHOLD` fallos seguidos deja de llamar
+      durante `LLM_BREAKER_RESET_S` segundos y falla al instante con `CircuitOpenError`, de modo
+      que el llamante pasa a su plan B (p.ej. el texto sin sanitizar) sin bloquear el worker.
+
+El código síncrono (tareas de Celery, vistas) usa `run()`, que ejecuta la corrutina en un event
+loop propio del proceso en un hilo de fondo: se puede llamar desde cualquier hilo.
+
+Configuración (variables de entorno, el Validator no depende de Django):
+    OLLAMA_BASE_URL          URL de Ollama (por defecto OLLAMA_HOST o http://localhost:11434)
+    GEMINI_BASE_URL          URL de la API de Gemini (sobrescribible para un servidor stub)
+    LLM_TIMEOUT              segundos máximos de una respuesta (por defecto 120)
+    LLM_CONNECT_TIMEOUT      segundos máximos para conectar (por defecto 5)
+    LLM_MAX_RETRIES          reintentos tras el primer intento (por defecto 3)
+    LLM_MAX_CONNECTIONS      conexiones simultáneas del pool (por defecto 20)
+    LLM_BREAKER_THRESHOLD    fallos seguidos que abren el circuito (por defecto 5)
+    LLM_BREAKER_RESET_S      segundos con el circuito abierto (por defecto 30)
+
+Para probarlo sin servicios reales: `python tools/llm_stub_server.py` y
+OLLAMA_BASE_URL / GEMINI_BASE_URL apuntando a él.
+"""
+import os
+import time
+import asyncio
+import logging
+import threading
+import weakref
+
+import httpx
+from tenacity import AsyncRetrying, retry_if_exception, stop_after_attempt, wait_random_exponential
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+DEFAULT_GEMINI_BASE_URL = 'https://generativelanguage.googleapis.com'
+
+
+class CircuitOpenError(RuntimeError):
+    """El backend ha fallado demasiadas veces seguidas: no se le envían peticiones."""
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Errores transitorios: red/timeouts, 429 y 5xx (httpx u ollama.ResponseError/ConnectionError)."""
+    if isinstance(error, (httpx.TransportError, ConnectionError)):
+        return True
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code in RETRYABLE_STATUS
+    return getattr(error, 'status_code', None) in RETRYABLE_STATUS
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker clásico (cerrado → abierto → semiabierto).
+
+    Con el circuito abierto se rechaza todo hasta que pasan `reset_timeout` segundos; entonces
+    se deja pasar una petición de prueba: si va bien se cierra, si falla se vuelve a abrir.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return 'closed'
+        return 'half-open' if time.monotonic() - self.opened_at >= self.reset_timeout else 'open'
+
+    def before_call(self) -> bool:
+        """Rechaza la petición con el circuito abierto. Devuelve True si es la petición de prueba."""
+        with self._lock:
+            state = self.state
+            if state == 'open' or (state == 'half-open' and self._probing):
+                raise CircuitOpenError(f"{self.name} circuit is open")
+            if state == 'half-open':
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.opened_at is not None:
+                logger.info(f"{self.name} circuit closed")
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._probing or self.failures >= self.failure_threshold:
+                if self.opened_at is None or self._probing:
+                    logger.warning(f"{self.name} circuit opened after {self.failures} consecutive failures")
+                self.opened_at = time.monotonic()
+            self._probing = False
+
+
+class LLMClient:
+    """Transporte, reintentos y circuit breakers compartidos por todos los LLM del proceso."""
+
+    def __init__(self, ollama_base_url: str = None, gemini_base_url: str = None, timeout: float = None,
+                 connect_timeout: float = None, max_retries: int = None, max_connections: int = None,
+                 breaker_threshold: int = None, breaker_reset: float = None):
+        self.ollama_base_url = ollama_base_url or os.getenv('OLLAMA_BASE_URL') or os.getenv('OLLAMA_HOST') or 'http://localhost:11434'
+        if '://' not in self.ollama_base_url:
+            self.ollama_base_url = f'http://{self.ollama_base_url}'
+        self.gemini_base_url = gemini_base_url or os.getenv('GEMINI_BASE_URL') or DEFAULT_GEMINI_BASE_URL
+        self.timeout = httpx.Timeout(
+            timeout or float(os.getenv('LLM_TIMEOUT', '120')),
+            connect=connect_timeout or float(os.getenv('LLM_CONNECT_TIMEOUT', '5'))
+        )
+        max_connections = max_connections or int(os.getenv('LLM_MAX_CONNECTIONS', '20'))
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv('LLM_MAX_RETRIES', '3'))
+        self.breaker_threshold = breaker_threshold or int(os.getenv('LLM_BREAKER_THRESHOLD', '5'))
+        self.breaker_reset = breaker_reset or float(os.getenv('LLM_BREAKER_RESET_S', '30'))
+
+        self._breakers = {}
+        self._clients = weakref.WeakKeyDictionary()  # Un AsyncClient por event loop
+        self._lock = threading.Lock()
+        self._loop = None
+        self._loop_thread = None
+
+    # ---------------------------------------------------------
+    # Infraestructura
+    # ---------------------------------------------------------
+
+    def breaker(self, name: str) -> CircuitBreaker:
+        with self._lock:
+            if name not in self._breakers:
+                self._breakers[name] = CircuitBreaker(name, self.breaker_threshold, self.breaker_reset)
+            return self._breakers[name]
+
+    def http(self) -> httpx.AsyncClient:
+        """Cliente httpx con pool de conexiones del event loop actual."""
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            client = self._clients[loop] = httpx.AsyncClient(timeout=self.timeout, limits=self.limits)
+        return client
+
+    def ollama_client_kwargs(self) -> dict:
+        """Parámetros para `ChatOllama(client_kwargs=...)`: mismos timeouts y tamaño de pool."""
+        return {'timeout': self.timeout, 'limits': self.limits}
+
+    def run(self, coroutine):
+        """Ejecuta una corrutina en el event loop de fondo del proceso y espera su resultado."""
+        with self._lock:
+            if self._loop is None or not self._loop_thread.is_alive():
+                self._loop = asyncio.new_event_loop()
+                self._loop_thread = threading.Thread(target=self._loop.run_forever, name='llm-client-loop', daemon=True)
+                self._loop_thread.start()
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    async def call(self, backend: str, request):
+        """
+        Ejecuta `request()` (una función que devuelve un awaitable) con la política común:
+        circuit breaker del backend + reintentos con jitter de los errores transitorios.
+        """
+        breaker = self.breaker(backend)
+        probe = breaker.before_call()
+        succeeded = False
+        try:
+            async for attempt in AsyncRetrying(
+                retry=retry_if_exception(is_retryable),
+                stop=stop_after_attempt(self.max_retries + 1),
+                wait=wait_random_exponential(multiplier=0.5, max=10),
+                before_sleep=lambda state: logger.warning(
+                    f"{backend} request failed ({state.outcome.exception()!r}), retry {state.attempt_number}/{self.max_retries}"
+                ),
+                reraise=True,
+            ):
+                with attempt:
+                    result = await request()
+            succeeded = True
+        except Exception as e:
+            if is_retryable(e) and not probe:
+                breaker.record_failure()
+            raise
+        finally:
+            if succeeded:
+                breaker.record_success()
+            elif probe:
+                # La petición de prueba no ha ido bien (4xx, respuesta inválida, cancelación...):
+                # se vuelve a abrir en lugar de dejar el circuito bloqueado en semiabierto
+                breaker.record_failure()
+        return result
+
+    # ---------------------------------------------------------
+    # Backends
+    # ---------------------------------------------------------
+
+    async def gemini_generate(self, model: str, prompt: str, api_key: str, json_output: bool = True) -> str:
+        """Texto de la respuesta de `models/{model}:generateContent` (API REST de Gemini)."""
+        payload = {'contents': [{'parts': [{'text': prompt}]}]}
+        if json_output:
+            payload['generationConfig'] = {'responseMimeType': 'application/json'}
+
+        async def request():
+            response = await self.http().post(
+                f"{self.gemini_base_url}/v1beta/models/{model}:generateContent",
+                params={'key': api_key},
+                json=payload,
+            )
+            response.raise_for_status()
+            return response.json()['candidates'][0]['content']['parts'][0]['text']
+
+        return await self.call('gemini', request)
+
+    async def ollama_chat(self, model: str, messages: list, format=None, options: dict = None) -> str:
+        """Contenido del mensaje de respuesta de `/api/chat` de Ollama (sin streaming)."""
+        payload = {'model': model, 'messages': messages, 'stream': False}
+        if format:
+            payload['format'] = format
+        if options:
+            payload['options'] = options
+
+        async def request():
+            response = await self.http().post(f"{self.ollama_base_url}/api/chat", json=payload)
+            response.raise_for_status()
+            return response.json()['message']['content']
+
+        return await self.call('ollama', request)
+
+
+# Instancia global lazy
+_llm_client_instance = None
+
+def get_llm_client() -> LLMClient:
+    global _llm_client_instance
+    if _llm_client_instance is None:
+        _llm_client_instance = LLMClient()
+    return _llm_client_instance
@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from api.model_server import ModelServer
+
+class Command(BaseCommand):
+    help = 'Starts the persistent model server (Whisper + pyannote) shared by all Celery workers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--address', default=None, help="Socket Unix o host:puerto (por defecto settings.MODEL_SERVER_ADDRESS)")
+        parser.add_argument('--coalesce-ms', type=int, default=None, help="Ventana de agrupación de peticiones en milisegundos")
+
+    def handle(self, *args, **options):
+        address = options['address'] or getattr(settings, 'MODEL_SERVER_ADDRESS', None) or '0.0.0.0:7070'
+        self.stdout.write(f"Iniciando servidor de modelos en {address}...")
+
+        server = ModelServer(address, coalesce_ms=options['coalesce_ms'])
+        server.load_models()
+        self.stdout.write("Modelos cargados. Esperando peticiones.")
+        server.serve_forever()
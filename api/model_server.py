@@ -0,0 +1,305 @@
+"""
+Servidor de modelos persistente para VLAS.
+
+Un único proceso de larga duración carga Whisper (Faster-Whisper) y pyannote una sola vez
+y atiende a todos los workers de Celery a través de un socket local
+(`multiprocessing.connection`). Las peticiones de transcripción que llegan casi a la vez
+desde distintas tareas se agrupan (coalescing) en una única llamada a `invoke_batch`.
+
+Arranque:
+    python manage.py run_model_server
+
+Los workers lo usan si `settings.MODEL_SERVER_ADDRESS` está definido; si no, cargan los
+modelos en su propio proceso como hasta ahora.
+
+La diarización no devuelve la forma de onda por el socket: el servidor la deja como .npy en
+MEDIA_ROOT/cache/pcm y el cliente la abre con memory-map (el worker que la recibe la borra al
+terminar el audio). Limitación: hay un único hilo de inferencia, así que mientras corre una
+diarización (minutos en audios largos) las transcripciones esperan; dentro de cada ronda de
+coalescing se atienden primero las transcripciones.
+"""
+import os
+import time
+import queue
+import logging
+import threading
+import uuid
+from multiprocessing.connection import Listener, Client
+
+from django.conf import settings
+
+from .audio_loader import save_pcm, open_pcm
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_COALESCE_MS = 50
+DEFAULT_MAX_BATCH_SEGMENTS = 64
+DEFAULT_TIMEOUT = 3600
+
+
+def parse_address(address: str):
+    """'host:puerto' -> tupla TCP; cualquier otra cosa se trata como ruta de socket Unix."""
+    if ':' in address and not address.startswith('/'):
+        host, port = address.rsplit(':', 1)
+        return (host, int(port))
+    return address
+
+
+def get_authkey() -> bytes:
+    key = os.getenv('MODEL_SERVER_AUTHKEY') or getattr(settings, 'SECRET_KEY', None) or 'vlas'
+    return key.encode('utf-8')
+
+
+class _Request:
+    """Petición pendiente en la cola de inferencia, con su hueco de respuesta."""
+
+    def __init__(self, op: str, kwargs: dict):
+        self.op = op
+        self.kwargs = kwargs
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+    def resolve(self, result=None, error=None):
+        self.result = result
+        self.error = error
+        self.done.set()
+
+
+class ModelServer:
+    """
+    Propietario único de los modelos. Un hilo de inferencia consume la cola de peticiones
+    (la GPU sólo la usa ese hilo) y un hilo por conexión recibe/responde a los clientes.
+    """
+
+    def __init__(self, address: str, coalesce_ms: int = None, max_batch_segments: int = None):
+        self.address = parse_address(address)
+        self.coalesce_s = (coalesce_ms if coalesce_ms is not None else getattr(settings, 'MODEL_SERVER_COALESCE_MS', DEFAULT_COALESCE_MS)) / 1000
+        self.max_batch_segments = max_batch_segments or getattr(settings, 'MODEL_SERVER_MAX_BATCH_SEGMENTS', DEFAULT_MAX_BATCH_SEGMENTS)
+        self.requests = queue.Queue()
+        self.transcriber = None
+        self.diarizer = None
+        self.stats = {'requests': 0, 'transcribe_calls': 0, 'coalesced_requests': 0, 'diarize_calls': 0}
+
+    def load_models(self):
+        """Carga Whisper y pyannote una sola vez para todo el servidor."""
+        from .transcriber.transcriber import get_transcriber_instance
+        from .diarizer import get_diarizer_instance
+
+        start = time.time()
+        self.transcriber = get_transcriber_instance()
+        self.diarizer = get_diarizer_instance()
+        self.diarizer.warmup()
+        logger.info(f"Model server: models loaded in {time.time() - start:.1f}s")
+
+    def serve_forever(self):
+        if self.transcriber is None:
+            self.load_models()
+
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.remove(self.address)
+
+        threading.Thread(target=self._inference_loop, daemon=True, name='inference').start()
+
+        with Listener(self.address, authkey=get_authkey()) as listener:
+            logger.info(f"Model server listening on {self.address}")
+            while True:
+                try:
+                    conn = listener.accept()
+                except Exception as e:
+                    logger.warning(f"Model server: rejected connection: {e}")
+                    continue
+                threading.Thread(target=self._handle_connection, args=(conn,), daemon=True).start()
+
+    # ---------------------------------------------------------
+    # Conexiones
+    # ---------------------------------------------------------
+
+    def _handle_connection(self, conn):
+        try:
+            while True:
+                try:
+                    op, kwargs = conn.recv()
+                except EOFError:
+                    break
+
+                if op == 'ping':
+                    conn.send(('ok', {'status': 'ready', **self.stats, 'diarizer': self.diarizer.health()}))
+                    continue
+
+                request = _Request(op, kwargs)
+                self.requests.put(request)
+                request.done.wait()
+
+                if request.error is not None:
+                    conn.send(('error', request.error))
+                else:
+                    conn.send(('ok', request.result))
+        except Exception as e:
+            logger.error(f"Model server connection error: {e}")
+        finally:
+            conn.close()
+
+    # ---------------------------------------------------------
+    # Inferencia
+    # ---------------------------------------------------------
+
+    def _inference_loop(self):
+        while True:
+            pending = [self.requests.get()]
+
+            # Coalescing: esperar un poco a que lleguen más peticiones de otros workers
+            deadline = time.monotonic() + self.coalesce_s
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    pending.append(self.requests.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            self.stats['requests'] += len(pending)
+            transcribe_groups, diarizations = {}, []
+            for request in pending:
+                if request.op == 'transcribe':
+                    kw = request.kwargs
+                    key = (kw.get('normalize', True), kw.get('language'), kw.get('airport_id'))
+                    transcribe_groups.setdefault(key, []).append(request)
+                elif request.op == 'diarize':
+                    diarizations.append(request)
+                else:
+                    request.resolve(error=f"Unknown operation: {request.op}")
+
+            # Transcripciones (cortas) antes que las diarizaciones de la misma ronda
+            for (normalize, language, airport_id), group in transcribe_groups.items():
+                self._run_transcribe(group, normalize, language, airport_id)
+            for request in diarizations:
+                self._run_diarize(request)
+
+    def _run_diarize(self, request):
+        try:
+            self.stats['diarize_calls'] += 1
+            waveform, segments = self.diarizer.diarize(request.kwargs['audio_path'])
+            # El PCM viaja como fichero (memory-map en el cliente), no serializado por el socket. Si ya
+            # está en disco (AUDIO_PCM_CACHE_DIR o volcado temporal) se pasa su ruta; el cliente sólo
+            # borra los temporales (ver `tasks._remove_pcm_cache`)
+            pcm_path = getattr(waveform, 'filename', None) or save_pcm(
+                os.path.join(settings.MEDIA_ROOT, 'cache', 'pcm', f"diarize-{uuid.uuid4().hex}.npy"), waveform
+            )
+            request.resolve(result=(pcm_path, segments))
+        except Exception as e:
+            logger.error(f"Model server diarization failed: {e}")
+            request.resolve(error=str(e))
+
+    def _run_transcribe(self, group, normalize, language, airport_id):
+        """Une los segmentos de varias peticiones compatibles en llamadas a invoke_batch."""
+        while group:
+            # Limitar el tamaño del batch combinado sin partir ninguna petición
+            chunk, total = [], 0
+            while group and (not chunk or total + len(group[0].kwargs['segments']) <= self.max_batch_segments):
+                request = group.pop(0)
+                chunk.append(request)
+                total += len(request.kwargs['segments'])
+
+            segments = [seg for request in chunk for seg in request.kwargs['segments']]
+            try:
+                self.stats['transcribe_calls'] += 1
+                self.stats['coalesced_requests'] += len(chunk) - 1
+                texts = self.transcriber.invoke_batch(segments, normalize=normalize, language=language, airport_id=airport_id)
+            except Exception as e:
+                logger.error(f"Model server transcription failed: {e}")
+                for request in chunk:
+                    request.resolve(error=str(e))
+                continue
+
+            offset = 0
+            for request in chunk:
+                n = len(request.kwargs['segments'])
+                request.resolve(result=texts[offset:offset + n])
+                offset += n
+
+
+class ModelServerClient:
+    """
+    Cliente del servidor de modelos. Expone la misma interfaz que usan las tareas
+    (`invoke_batch` del transcriptor y `diarize` del diarizador).
+    """
+
+    def __init__(self, address: str, timeout: int = None):
+        self.address = parse_address(address)
+        self.timeout = timeout or getattr(settings, 'MODEL_SERVER_TIMEOUT', DEFAULT_TIMEOUT)
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _call(self, op: str, **kwargs):
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    if self._conn is None:
+                        self._conn = Client(self.address, authkey=get_authkey())
+                    self._conn.send((op, kwargs))
+                    if not self._conn.poll(self.timeout):
+                        raise TimeoutError(f"Model server did not answer '{op}' in {self.timeout}s")
+                    status, payload = self._conn.recv()
+                    break
+                except TimeoutError:
+                    # La respuesta tardía llegaría a la siguiente petición: se descarta la conexión
+                    # y no se reintenta (volvería a lanzar el mismo trabajo largo)
+                    self.close()
+                    raise
+                except (EOFError, ConnectionError, OSError) as e:
+                    # Conexión caída (reinicio del servidor): reconectar una vez
+                    self.close()
+                    if attempt == 1:
+                        raise ConnectionError(f"Model server unavailable at {self.address}: {e}")
+
+        if status == 'error':
+            raise RuntimeError(f"Model server error: {payload}")
+        return payload
+
+    def close(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+
+    def ping(self):
+        return self._call('ping')
+
+    def diarize(self, audio_path: str):
+        """Igual que `AudioDiarization.diarize`; la forma de onda es un memory-map del PCM del servidor."""
+        pcm_path, segments = self._call('diarize', audio_path=audio_path)
+        return open_pcm(pcm_path), segments
+
+    def invoke_batch(self, segments: list, normalize: bool = True, language: str = None, airport_id: str = None, batch_size: int = None):
+        return self._call('transcribe', segments=list(segments), normalize=normalize, language=language, airport_id=airport_id)
+
+    def invoke(self, audio_path, normalize: bool = True, language: str = None, airport_id: str = None):
+        return self.invoke_batch([audio_path], normalize=normalize, language=language, airport_id=airport_id)[0]
+
+
+# Instancia global lazy (una conexión por proceso)
+_client_instance = None
+
+def get_model_server_client():
+    global _client_instance
+    if _client_instance is None:
+        _client_instance = ModelServerClient(settings.MODEL_SERVER_ADDRESS)
+    return _client_instance
+
+def get_transcription_backend():
+    """Servidor de modelos si está configurado; si no, el Whisper de este proceso."""
+    if getattr(settings, 'MODEL_SERVER_ADDRESS', None):
+        return get_model_server_client()
+    from .transcriber.transcriber import transcriber_instance
+    return transcriber_instance
+
+def get_diarization_backend():
+    """Servidor de modelos si está configurado; si no, pyannote en este proceso."""
+    if getattr(settings, 'MODEL_SERVER_ADDRESS', None):
+        return get_model_server_client()
+    from .diarizer import get_diarizer_instance
+    return get_diarizer_instance()
@@ -1,4 +1,5 @@
 from django.conf import settings
+from django.urls import reverse
 from rest_framework import serializers
 from api.models.models import CommunicationSession, AudioFile, SpeechSegment
 
@@ -18,11 +19,11 @@ class SpeechSegmentSerializer(serializers.ModelSerializer):
         ]
 
     def get_segment_url(self, obj):
-        # TODO: Implementar lógica robusta de URL para archivos segmentados si existen
-        # Por ahora devolvemos la ruta si está guardada
+        # Si el recorte ya existe se sirve directamente desde MEDIA.
+        # Si no, se apunta al endpoint que lo genera bajo demanda.
         if obj.segment_file_path:
              return f"{settings.SITE_URL}{settings.MEDIA_URL}{obj.segment_file_path}"
-        return None
+        return f"{settings.SITE_URL}{reverse('segment-audio', args=[obj.id])}"
 
 class AudioFileSerializer(serializers.ModelSerializer):
     file_url = serializers.SerializerMethodField()
@@ -0,0 +1,153 @@
+"""
+Validación de Safety de una `CommunicationSession` completa.
+
+1. Los `SpeechSegment` de la sesión (ATCO/PILOT) se agrupan en intercambios piloto–ATCO
+   (ver `conversation_segmentation.py`).
+2. Todas las conversaciones se validan en paralelo con un único `Validator` caliente por
+   proceso (fraseología, índice TF-IDF, grafo y cliente de Ollama se crean una sola vez);
+   el límite de peticiones simultáneas a Ollama lo pone el propio Validator.
+3. Los resultados se escriben en bloque: `SpeechSegment.has_error/error_details` con
+   `bulk_update` y el informe completo en `CommunicationSession.validation_report`.
+"""
+import time
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from api.models.models import SpeechSegment
+from .llm_client import get_llm_client
+from .validator.validation import Validator
+from .validator.utils import fast_paths
+from .conversation_segmentation import ConversationSegmenter
+
+logger = logging.getLogger(__name__)
+
+# Roles que intervienen en la validación (el resto es ruido/otros)
+VALIDATED_ROLES = {'ATCO': 'atco', 'PILOT': 'pilot'}
+# Evaluaciones de callsign que no son un error
+CALLSIGN_OK = ('', 'Correcto', 'No requiere call sign')
+
+
+# Instancias globales lazy (una por proceso/worker)
+_validator_instances = {}
+
+def get_validator(model: str = None) -> Validator:
+    """Validator caliente del proceso para el modelo indicado (por defecto `VALIDATOR_MODEL`)."""
+    model = model or getattr(settings, 'VALIDATOR_MODEL', None) or settings.OLLAMA_MODEL
+    if model not in _validator_instances:
+        logger.info(f"Loading Validator for model {model}")
+        _validator_instances[model] = Validator(model=model)
+    # Aerolíneas de los fast paths: se recargan aquí (código síncrono) cuando caducan
+    fast_paths.refresh_airlines()
+    return _validator_instances[model]
+
+def run_validation(coroutine):
+    """
+    Ejecuta una corrutina del Validator en el event loop persistente del proceso.
+
+    El cliente async de Ollama se queda ligado al loop en el que abrió sus conexiones, así que
+    reutilizar el Validator con un `asyncio.run` nuevo en cada tarea no es seguro. Se usa el
+    loop de fondo del cliente LLM común (`api/llm_client.py`), compartido con el sanitizador.
+    """
+    return get_llm_client().run(coroutine)
+
+
+def _total_score(result: dict):
+    """Puntuación total (0-5) de una conversación validada, o None si no se pudo extraer."""
+    total = result.get('score', {}).get('puntuacion_total')
+    if isinstance(total, dict):
+        total = total.get('score')
+    if isinstance(total, str):
+        # Formato 'X.X/5'
+        total = total.split('/')[0]
+    try:
+        return float(total)
+    except (TypeError, ValueError):
+        return None
+
+
+def validate_session(session, model: str = None) -> dict:
+    """
+    Valida todas las conversaciones de una sesión y guarda los resultados.
+
+    Returns:
+        dict: El informe guardado en `session.validation_report`.
+    """
+    started = time.monotonic()
+    segments = list(
+        SpeechSegment.objects.filter(audio_file__session=session).order_by('audio_file_id', 'start_time')
+    )
+    conversations = ConversationSegmenter().split(segments)
+    logger.info(f"Validating session {session.id}: {len(conversations)} conversations, {len(segments)} segments")
+
+    validator = get_validator(model)
+    inputs = [
+        [(VALIDATED_ROLES[segment.speaker_role], segment.text_content) for segment in conversation]
+        for conversation in conversations
+    ]
+    results = run_validation(validator.validate_many(inputs))
+
+    # Una nueva validación sustituye a la anterior en todos los segmentos
+    for segment in segments:
+        segment.has_error = False
+        segment.error_details = None
+
+    report_conversations, scores, llm_calls, failed = [], [], 0, 0
+    for conversation, result in zip(conversations, results):
+        entry = {
+            'segment_ids': [str(segment.id) for segment in conversation],
+            'start_time': conversation[0].start_time,
+            'end_time': conversation[-1].end_time,
+        }
+        if isinstance(result, Exception):
+            logger.error(f"Validation of a conversation of session {session.id} failed: {result}")
+            entry['error'] = str(result)
+            failed += 1
+            report_conversations.append(entry)
+            continue
+
+        for segment, phrase in zip(conversation, result.get('phrases', [])):
+            segment.has_error = bool(
+                phrase['otherPhraseology']
+                or phrase['phraseologyCorrect'] == False
+                or (phrase['callSignFailure'] or '') not in CALLSIGN_OK
+            )
+            segment.error_details = {
+                'rule': phrase['rule'],
+                'phraseology': phrase['phraseologyFails'],
+                'callsign': phrase['callSignFailure'],
+                'other_phraseology': phrase['otherPhraseology'],
+            }
+
+        score = _total_score(result)
+        if score is not None:
+            scores.append(score)
+        llm_calls += result.get('metrics', {}).get('llm_calls', 0)
+        entry['result'] = result
+        report_conversations.append(entry)
+
+    report = {
+        'validated_at': timezone.now().isoformat(),
+        'model': validator.model.model,
+        'conversations': report_conversations,
+        'summary': {
+            'conversations': len(conversations),
+            'failed_conversations': failed,
+            'segments_with_errors': sum(1 for segment in segments if segment.has_error),
+            'llm_calls': llm_calls,
+            'duration_seconds': round(time.monotonic() - started, 2),
+        },
+    }
+
+    with transaction.atomic():
+        SpeechSegment.objects.bulk_update(segments, ['has_error', 'error_details'], batch_size=500)
+        session.validation_report = report
+        # Media de las puntuaciones totales (0-5) escalada a 0-100
+        session.safety_score = round(sum(scores) / len(scores) * 20) if scores else None
+        session.status = 'validated'
+        session.save(update_fields=['validation_report', 'safety_score', 'status'])
+
+    logger.info(f"Session {session.id} validated in {report['summary']['duration_seconds']}s: {report['summary']}")
+    return report
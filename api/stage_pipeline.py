@@ -0,0 +1,163 @@
+"""
+Pipeline productor/consumidor para el procesado de un audio.
+
+Cada etapa corre en su propio hilo y se comunica con la siguiente por una cola acotada, de
+modo que mientras Whisper transcribe un batch el sanitizador espera la respuesta del LLM del
+anterior y el hilo que llama prepara las filas de lo ya sanitizado. El tiempo total tiende al de la
+etapa más lenta en lugar de a la suma de todas, y la cola acotada limita la memoria si una
+etapa se queda atrás.
+
+Una etapa es una función `iterador -> iterador` (normalmente un generador): puede agrupar
+elementos (p.ej. ventanas del sanitizador) o filtrarlos. Al haber un único hilo por etapa y
+colas FIFO, el orden de los elementos se conserva de principio a fin.
+
+    pipeline = StagePipeline(decode(), name='audio 42').stage('transcribe', transcribe)
+    for item in pipeline:   # última etapa, consumida en el hilo que llama
+        ...
+    logger.info(pipeline.summary())
+"""
+import time
+import queue
+import logging
+import threading
+
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_END = object()
+
+
+class _Failure:
+    """Excepción de una etapa, propagada por las colas hasta el consumidor."""
+
+    def __init__(self, stage: str, error: BaseException):
+        self.stage = stage
+        self.error = error
+
+
+class _Stopped(Exception):
+    """El pipeline se ha detenido (error en otra etapa o el consumidor dejó de leer)."""
+
+
+class StagePipeline:
+    """
+    Args:
+        source (iterable): Productor de la primera etapa ('decode'); se itera en su propio hilo.
+        maxsize (int): Elementos máximos en cada cola entre etapas.
+        name (str): Nombre para los logs y los hilos.
+    """
+
+    POLL_S = 0.1
+
+    def __init__(self, source, maxsize: int = 32, name: str = 'pipeline'):
+        self.name = name
+        self.maxsize = maxsize
+        self._stages = [('decode', lambda _: iter(source))]
+        self._stop = threading.Event()
+        self.busy = {}  # segundos de trabajo efectivo (sin esperas en colas) por etapa
+        self.wall = 0.0
+
+    def stage(self, name: str, function):
+        """Añade una etapa `function(iterador) -> iterador` al final del pipeline."""
+        self._stages.append((name, function))
+        return self
+
+    # ---------------------------------------------------------
+    # Colas
+    # ---------------------------------------------------------
+
+    def _put(self, q: queue.Queue, item) -> float:
+        """Encola esperando lo necesario; devuelve los segundos esperados."""
+        started = time.perf_counter()
+        while True:
+            try:
+                q.put(item, timeout=self.POLL_S)
+                return time.perf_counter() - started
+            except queue.Full:
+                if self._stop.is_set():
+                    raise _Stopped()
+
+    def _drain(self, q: queue.Queue, waits: list):
+        """Itera los elementos de la cola hasta el fin de la etapa anterior."""
+        while True:
+            started = time.perf_counter()
+            while True:
+                try:
+                    item = q.get(timeout=self.POLL_S)
+                    break
+                except queue.Empty:
+                    if self._stop.is_set():
+                        raise _Stopped()
+            waits[0] += time.perf_counter() - started
+            if item is _END:
+                return
+            if isinstance(item, _Failure):
+                # Se reenvía tal cual para que el consumidor vea la etapa de origen
+                raise _Stopped(item)
+            yield item
+
+    def _worker(self, name: str, function, inbox, outbox):
+        started = time.perf_counter()
+        waits = [0.0]
+        try:
+            for item in function(self._drain(inbox, waits) if inbox is not None else None):
+                waits[0] += self._put(outbox, item)
+            self._put(outbox, _END)
+        except _Stopped as stopped:
+            if stopped.args:
+                self._forward(outbox, stopped.args[0])
+        except BaseException as e:
+            logger.error(f"{self.name}: stage '{name}' failed: {e}")
+            self._forward(outbox, _Failure(name, e))
+        finally:
+            self.busy[name] = time.perf_counter() - started - waits[0]
+            # Conexiones a BD abiertas desde este hilo (p.ej. el diccionario de normalización)
+            connections.close_all()
+
+    def _forward(self, outbox, failure):
+        try:
+            self._put(outbox, failure)
+        except _Stopped:
+            pass
+
+    # ---------------------------------------------------------
+    # Ejecución
+    # ---------------------------------------------------------
+
+    def __iter__(self):
+        started = time.perf_counter()
+        self.busy = {name: 0.0 for name, _ in self._stages}
+        inbox, threads = None, []
+        for name, function in self._stages:
+            outbox = queue.Queue(maxsize=self.maxsize)
+            thread = threading.Thread(
+                target=self._worker, args=(name, function, inbox, outbox),
+                name=f"{self.name}-{name}", daemon=True
+            )
+            thread.start()
+            threads.append(thread)
+            inbox = outbox
+
+        waits = [0.0]
+        try:
+            while True:
+                wait_started = time.perf_counter()
+                item = inbox.get()
+                waits[0] += time.perf_counter() - wait_started
+                if item is _END:
+                    break
+                if isinstance(item, _Failure):
+                    raise item.error
+                yield item
+        finally:
+            # Error o consumidor que deja de leer: las etapas salen en su próximo acceso a cola
+            self._stop.set()
+            for thread in threads:
+                thread.join()
+            self.wall = time.perf_counter() - started
+            self.busy['consume'] = self.wall - waits[0]
+
+    def summary(self) -> str:
+        stages = ', '.join(f"{name} {seconds:.2f}s" for name, seconds in self.busy.items())
+        return f"{self.name}: {self.wall:.2f}s wall-clock for {sum(self.busy.values()):.2f}s of stage work ({stages})"
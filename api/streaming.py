@@ -0,0 +1,289 @@
+"""
+Transcripción en (casi) tiempo real de frecuencias en directo.
+
+El cliente abre una sesión en vivo y envía trozos de PCM (16 kHz, mono, int16 little-endian)
+por HTTP. La vista sólo añade el trozo al fichero del stream y encola
+`process_live_stream_task`: el VAD (Silero, incluido en Faster-Whisper), Whisper y el
+sanitizador corren en un worker de Celery (cola `LIVE_STREAM_QUEUE`), nunca en el hilo de la
+petición web. Cuando una transmisión termina (silencio de al menos `LIVE_STREAM_MIN_SILENCE_MS`)
+se da por cerrada, se transcribe, se sanitiza y se guarda como `SpeechSegment`; el cliente los
+recibe en las respuestas de los trozos siguientes.
+
+En radio ATC el canal es half-duplex (PTT): cada transmisión la emite un único hablante,
+así que los turnos de la diarización coinciden con las locuciones que detecta el VAD y el
+rol (ATCO/PILOT) lo asigna el sanitizador, igual que en el pipeline offline.
+
+El estado de cada stream vive en disco compartido (MEDIA_ROOT/cache/live), no en memoria de un
+proceso, así que cualquier proceso web o worker puede atenderlo:
+    <sesión>.pcm   audio recibido (int16 en bruto, sólo se añade al final)
+    <sesión>.json  muestras ya procesadas, contexto del sanitizador e id del AudioFile
+    <sesión>.lock  flock que serializa el procesado de un mismo stream entre procesos
+    <sesión>.append.lock  flock entre las escrituras de los trozos y el cierre del stream
+Un stream sin trozos nuevos durante `LIVE_STREAM_IDLE_TIMEOUT_S` se cierra solo
+(`reap_live_stream_task`), de modo que no quedan ficheros ni sesiones colgadas. Al cerrarlo se
+borra el audio y el .json queda marcado como cerrado: un trozo que llega después se rechaza
+con `LiveStreamClosedError` en lugar de fallar.
+"""
+import os
+import json
+import time
+import fcntl
+import logging
+from contextlib import contextmanager
+
+import numpy as np
+import soundfile as sf
+from django.conf import settings
+
+from api.models.models import AudioFile, SpeechSegment
+from .model_server import get_transcription_backend
+from .transcriber.semantic_sanitizer import get_sanitizer
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+SAMPLE_BYTES = 2  # int16
+WAV_WRITE_SAMPLES = 1 << 20
+
+
+class LiveStreamClosedError(Exception):
+    """El stream no acepta audio: ya se ha cerrado (`finalized`) o no existe."""
+
+    def __init__(self, session_id, finalized: bool):
+        self.finalized = finalized
+        super().__init__(f"Live stream for session {session_id} {'is already closed' if finalized else 'does not exist'}")
+
+
+def _stream_dir() -> str:
+    return os.path.join(settings.MEDIA_ROOT, 'cache', 'live')
+
+
+class LiveTranscriptionStream:
+    """
+    Stream en vivo de una `CommunicationSession`, identificado por el id de la sesión.
+    """
+
+    def __init__(self, session_id):
+        self.session_id = str(session_id)
+        base = os.path.join(_stream_dir(), self.session_id)
+        self.pcm_path = f"{base}.pcm"
+        self.state_path = f"{base}.json"
+        self.lock_path = f"{base}.lock"
+        self.append_lock_path = f"{base}.append.lock"
+
+        self.min_silence_ms = getattr(settings, 'LIVE_STREAM_MIN_SILENCE_MS', 500)
+        self.max_utterance_s = getattr(settings, 'LIVE_STREAM_MAX_UTTERANCE_S', 30)
+        self.sanitize = getattr(settings, 'LIVE_STREAM_SANITIZE', True)
+
+    # ---------------------------------------------------------
+    # Estado compartido
+    # ---------------------------------------------------------
+
+    @classmethod
+    def create(cls, session, audio_file):
+        stream = cls(session.id)
+        os.makedirs(_stream_dir(), exist_ok=True)
+        open(stream.pcm_path, 'wb').close()
+        stream._save_state({
+            'audio_file_id': str(audio_file.id),
+            'airport_id': session.airport_code,
+            'consumed': 0,
+            'context_window': [],
+            'closed': False,
+        })
+        return stream
+
+    def exists(self) -> bool:
+        return os.path.exists(self.state_path) and os.path.exists(self.pcm_path)
+
+    def _load_state(self) -> dict:
+        with open(self.state_path) as f:
+            return json.load(f)
+
+    def _save_state(self, state: dict):
+        tmp_path = f"{self.state_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.state_path)
+
+    @contextmanager
+    def _locked(self, lock_path=None, operation=fcntl.LOCK_EX):
+        with open(lock_path or self.lock_path, 'a') as lock:
+            fcntl.flock(lock, operation)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def idle_seconds(self) -> float:
+        """Segundos desde el último trozo recibido."""
+        return time.time() - os.path.getmtime(self.pcm_path)
+
+    # ---------------------------------------------------------
+    # Vista (proceso web): sólo E/S
+    # ---------------------------------------------------------
+
+    def _check_open(self):
+        if not os.path.exists(self.state_path):
+            raise LiveStreamClosedError(self.session_id, finalized=False)
+        if not os.path.exists(self.pcm_path):
+            # El cierre borra el audio y deja el .json marcado como cerrado
+            raise LiveStreamClosedError(self.session_id, finalized=True)
+
+    def append(self, pcm_bytes: bytes):
+        """
+        Añade un trozo de PCM int16 al final del audio del stream.
+
+        Raises:
+            LiveStreamClosedError: El stream ya se ha cerrado (o no existe).
+        """
+        # Antes del lock para no crear ficheros de lock de sesiones que no son en vivo
+        self._check_open()
+        data = pcm_bytes[:len(pcm_bytes) - len(pcm_bytes) % SAMPLE_BYTES]
+        # Compartido entre trozos (O_APPEND), exclusivo frente al cierre
+        with self._locked(self.append_lock_path, fcntl.LOCK_SH):
+            self._check_open()
+            fd = os.open(self.pcm_path, os.O_WRONLY | os.O_APPEND)
+            try:
+                os.write(fd, data)
+            finally:
+                os.close(fd)
+
+    # ---------------------------------------------------------
+    # Worker: VAD + transcripción + sanitización
+    # ---------------------------------------------------------
+
+    def process(self, final: bool = False) -> list:
+        """
+        Procesa el audio pendiente y guarda las locuciones cerradas. Con `final` se transcribe
+        todo lo que quede, se escribe la grabación WAV y se cierra el stream.
+
+        Returns:
+            list[SpeechSegment]: Segmentos creados.
+        """
+        with self._locked():
+            if not self.exists():
+                return []
+            state = self._load_state()
+            if state['closed']:
+                return []
+
+            audio_file = AudioFile.objects.select_related('session').get(id=state['audio_file_id'])
+            pending = np.fromfile(self.pcm_path, dtype='<i2', offset=state['consumed'] * SAMPLE_BYTES)
+            buffer = pending.astype(np.float32) / 32768.0
+
+            segments, consumed = self._process_buffer(buffer, state, audio_file, final)
+            state['consumed'] += consumed
+
+            if final:
+                self._finalize(audio_file, state)
+            else:
+                self._save_state(state)
+            return segments
+
+    def _process_buffer(self, buffer: np.ndarray, state: dict, audio_file, final: bool):
+        """Ejecuta el VAD sobre el audio pendiente. Devuelve (segmentos, muestras consumidas)."""
+        if len(buffer) == 0:
+            return [], 0
+
+        from faster_whisper.vad import VadOptions, get_speech_timestamps
+        vad_options = VadOptions(min_silence_duration_ms=self.min_silence_ms, speech_pad_ms=200)
+        speeches = get_speech_timestamps(buffer, vad_options, sampling_rate=SAMPLE_RATE)
+        max_samples = int(self.max_utterance_s * SAMPLE_RATE)
+
+        utterances = []
+        consumed = 0
+        for speech in speeches:
+            # Una locución está cerrada si el VAD ya ha visto el silencio que la termina.
+            # Si llega al final del buffer sigue abierta, salvo cierre del stream o duración máxima.
+            is_open = speech['end'] >= len(buffer)
+            if is_open and not final and speech['end'] - speech['start'] < max_samples:
+                break
+            utterances.append((speech['start'], speech['end']))
+            consumed = speech['end']
+
+        if not speeches:
+            # Sólo silencio: conservar un pequeño margen para no cortar el inicio de la próxima locución
+            consumed = max(0, len(buffer) - SAMPLE_RATE)
+        if final:
+            consumed = len(buffer)
+
+        segments = self._emit(buffer, utterances, state, audio_file) if utterances else []
+        return segments, consumed
+
+    def _emit(self, buffer: np.ndarray, utterances: list, state: dict, audio_file):
+        audios = [buffer[start:end] for start, end in utterances]
+        raw_texts = get_transcription_backend().invoke_batch(audios, normalize=True, airport_id=state['airport_id'])
+        sanitizer = get_sanitizer() if self.sanitize else None
+        offset = state['consumed']
+
+        segments = []
+        for (start, end), raw_text in zip(utterances, raw_texts):
+            # Noise Gate
+            if not raw_text or len(raw_text.strip()) < 2:
+                continue
+
+            refined_text, speaker_role = raw_text, 'OTHER'
+            if sanitizer is not None:
+                sanitization_result = sanitizer.invoke(text=raw_text, context_window=state['context_window'][-3:])
+                refined_text = sanitization_result.get('refined_text', raw_text)
+                speaker_role = sanitization_result.get('speaker', 'OTHER').upper()
+            state['context_window'] = (state['context_window'] + [f"{speaker_role}: {refined_text}"])[-3:]
+
+            db_role = 'OTHER'
+            if 'ATCO' in speaker_role: db_role = 'ATCO'
+            elif 'PILOT' in speaker_role: db_role = 'PILOT'
+
+            segments.append(SpeechSegment.objects.create(
+                audio_file=audio_file,
+                start_time=(offset + start) / SAMPLE_RATE,
+                end_time=(offset + end) / SAMPLE_RATE,
+                speaker_role=db_role,
+                text_content=refined_text,
+                original_ai_text=raw_text
+            ))
+
+        return segments
+
+    def _finalize(self, audio_file, state: dict):
+        """
+        Escribe la grabación completa como WAV, cierra el audio/sesión y borra el audio del
+        stream; el .json queda marcado como cerrado para rechazar los trozos que lleguen tarde.
+        """
+        recording_path = audio_file.file.path
+        os.makedirs(os.path.dirname(recording_path), exist_ok=True)
+        with self._locked(self.append_lock_path):
+            pcm = np.memmap(self.pcm_path, dtype='<i2', mode='r') if os.path.getsize(self.pcm_path) else np.zeros(0, dtype='<i2')
+            with sf.SoundFile(recording_path, mode='w', samplerate=SAMPLE_RATE, channels=1, subtype='PCM_16') as recording:
+                for start in range(0, len(pcm), WAV_WRITE_SAMPLES):
+                    recording.write(np.asarray(pcm[start:start + WAV_WRITE_SAMPLES]))
+            del pcm
+
+            state['closed'] = True
+            self._save_state(state)
+            os.remove(self.pcm_path)
+
+        audio_file.duration_seconds = state['consumed'] / SAMPLE_RATE
+        audio_file.is_processed = True
+        audio_file.save(update_fields=['duration_seconds', 'is_processed'])
+        audio_file.session.status = 'ready' # Lista para revisión humana
+        audio_file.session.save(update_fields=['status'])
+        logger.info(f"Live stream closed for session {self.session_id}")
+
+
+def open_stream(session, audio_file):
+    stream = LiveTranscriptionStream.create(session, audio_file)
+    from .tasks import reap_live_stream_task
+    reap_live_stream_task.apply_async((str(session.id),), countdown=getattr(settings, 'LIVE_STREAM_IDLE_TIMEOUT_S', 120))
+    logger.info(f"Live stream opened for session {session.id}")
+    return stream
+
+def get_stream(session_id):
+    """Stream abierto de la sesión (en cualquier proceso) o None."""
+    stream = LiveTranscriptionStream(session_id)
+    return stream if stream.exists() else None
+
+def enqueue_processing(session_id, final: bool = False):
+    """Encola el procesado del audio pendiente en la cola de tiempo real."""
+    from .tasks import process_live_stream_task
+    process_live_stream_task.apply_async((str(session_id), final), queue=getattr(settings, 'LIVE_STREAM_QUEUE', None))
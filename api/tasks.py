@@ -1,20 +1,27 @@
 import os
 import logging
-from pathlib import Path
-from celery import shared_task
+import itertools
+import numpy as np
+from celery import shared_task, chord, group
 from django.db import transaction
+from django.db.models import Count, Q
 from django.conf import settings
 from django.utils import timezone
 
 from api.models.models import AudioFile, SpeechSegment, CommunicationSession
 
 # AI Components
-from .transcriber.transcriber import transcriber_instance
-from .diarizer import AudioDiarization
+from .model_server import get_transcription_backend, get_diarization_backend
 from .transcriber.semantic_sanitizer import get_sanitizer
+from .stage_pipeline import StagePipeline
+from . import audio_loader
+from .audio_loader import save_pcm, open_pcm
 
 logger = logging.getLogger(__name__)
 
+# SpeechSegment por INSERT en el bulk_create final
+SEGMENT_INSERT_BATCH = 64
+
 @shared_task(bind=True)
 def process_audio_file_task(self, audio_file_id):
     """
@@ -23,7 +30,15 @@ def process_audio_file_task(self, audio_file_id):
     2. Transcripción (Whisper) -> Audio a Texto.
     3. Sanitización (Gemini) -> Limpieza y Clasificación de Hablantes.
     4. Guardado en DB.
+
+    Con `PIPELINE_FANOUT` activo la transcripción se reparte en un chord de Celery:
+    un `transcribe_segment_batch_task` por cada batch de segmentos (en paralelo entre workers)
+    y `finalize_audio_file_task` como reducer (sanitización con contexto + guardado).
+    Sin fan-out, los pasos 2-4 corren solapados en un pipeline de hilos (`stage_pipeline.py`).
     """
+    # PCM de la diarización en disco (memory-map del servidor de modelos, volcado temporal o entrada
+    # de AUDIO_PCM_CACHE_DIR): se reutiliza para el fan-out y, si es del procesado, se borra al final
+    pcm_path, fanned_out = None, False
     try:
         # Recuperar el AudioFile
         try:
@@ -36,7 +51,7 @@ def process_audio_file_task(self, audio_file_id):
         session = audio_file.session
         if session.status != 'processing':
             session.status = 'processing'
-            session.save()
+            session.save(update_fields=['status'])
 
         logger.info(f"Processing AudioFile {audio_file_id} for Session {session.id}")
         file_path = audio_file.file.path
@@ -46,96 +61,275 @@ def process_audio_file_task(self, audio_file_id):
         # ---------------------------------------------------------
         logger.info(f"Starting Diarization for {file_path}")
         try: 
-            diarizer = AudioDiarization()
-            # invoke devuelve lista de dicts: {'path': '...', 'start_time': 0.0, 'end_time': 2.5, 'label': 'SPEAKER_00'}
-            diarized_segments = diarizer.invoke(file_path)
+            diarizer = get_diarization_backend()
+            # Modo en memoria: un único buffer float32 16 kHz + offsets por turno
+            # {'start_time': 0.0, 'end_time': 2.5, 'label': 'SPEAKER_00', 'start_sample': 0, 'end_sample': 40000}
+            waveform, diarized_segments = diarizer.diarize(file_path)
+            pcm_path = getattr(waveform, 'filename', None)
         except Exception as e:
              logger.error(f"Diarization failed: {e}")
              raise e
 
         if not diarized_segments:
             logger.warning("No segments found in audio.")
-            audio_file.is_processed = True
-            audio_file.save()
+            _mark_audio_processed(audio_file)
             return
 
         # ---------------------------------------------------------
-        # PASO 2: TRANSCRIPCIÓN Y SANITIZACIÓN (Loop)
+        # PASO 2: TRANSCRIPCIÓN EN FAN-OUT
         # ---------------------------------------------------------
-        sanitizer = get_sanitizer()
-        context_window = [] # Memoria temporal para Gemini
-
-        for idx, seg_data in enumerate(diarized_segments, start=1):
-            seg_abs_path = Path(seg_data['path'])
-            start_time = seg_data['start_time']
-            end_time = seg_data['end_time']
-            
-            # --- 2.1 Whisper ---
-            raw_text = transcriber_instance.invoke(
-                audio_path=str(seg_abs_path),
-                normalize=True,
-                airport_id=session.airport_code # Priming with airport code
-            )
+        batch_size = getattr(settings, 'PIPELINE_FANOUT_BATCH_SEGMENTS', 16)
+        batches = [diarized_segments[i:i + batch_size] for i in range(0, len(diarized_segments), batch_size)]
 
-            # Noise Gate
-            if not raw_text or len(raw_text.strip()) < 2:
-                continue
-
-            # --- 2.2 Semantic Sanitizer (Gemini) ---
-            # Pasamos las últimas 3 frases como contexto
-            sanitization_result = sanitizer.invoke(
-                text=raw_text,
-                context_window=context_window[-3:]
-            )
-            
-            refined_text = sanitization_result.get('refined_text', raw_text)
-            speaker_role = sanitization_result.get('speaker', 'OTHER').upper() # ATCO, PILOT, OTHER
-
-            # Update context
-            context_window.append(f"{speaker_role}: {refined_text}")
-
-            # --- 2.3 Guardar SpeechSegment ---
-            relative_path = seg_abs_path.relative_to(settings.MEDIA_ROOT) if seg_abs_path.is_absolute() else seg_abs_path
-
-            # Mapeo de roles estandarizados
-            db_role = 'OTHER'
-            if 'ATCO' in speaker_role: db_role = 'ATCO'
-            elif 'PILOT' in speaker_role: db_role = 'PILOT'
-
-            SpeechSegment.objects.create(
-                audio_file=audio_file,
-                start_time=start_time,
-                end_time=end_time,
-                speaker_role=db_role,
-                text_content=refined_text,
-                original_ai_text=raw_text,
-                segment_file_path=str(relative_path)
+        if getattr(settings, 'PIPELINE_FANOUT', True) and len(batches) > 1:
+            # Fan-out: el buffer está (o se guarda una vez) en disco (.npy) y cada tarea lo abre con mmap
+            pcm_path = pcm_path or _save_pcm_cache(audio_file_id, waveform)
+            header = group(
+                transcribe_segment_batch_task.s(
+                    pcm_path,
+                    [(seg['start_sample'], seg['end_sample']) for seg in batch],
+                    session.airport_code
+                )
+                for batch in batches
             )
-            
+            reducer = finalize_audio_file_task.s(audio_file_id, diarized_segments, pcm_path)
+            chord(header)(reducer.on_error(audio_processing_failed_task.si(audio_file_id, pcm_path)))
+            fanned_out = True  # El reducer o el errback borran el PCM
+            logger.info(f"AudioFile {audio_file_id}: {len(diarized_segments)} segments fanned out in {len(batches)} batches")
+            return
+
         # ---------------------------------------------------------
-        # FIN DEL PROCESO
+        # PASO 2-4: TRANSCRIPCIÓN, SANITIZACIÓN Y GUARDADO (en pipeline)
         # ---------------------------------------------------------
-        audio_file.is_processed = True
-        audio_file.save()
-        
-        # Verificar si la sesión ha terminado (todos los audios procesados)
-        all_audios = session.audios.all()
-        if all(a.is_processed for a in all_audios):
-            session.status = 'ready' # Lista para revisión humana
-            session.save()
+        # Whisper transcribe el batch siguiente mientras el sanitizador espera al LLM y se
+        # guardan en BD los segmentos ya sanitizados. Se le pasan recortes del buffer
+        # compartido: no hay WAVs intermedios en disco.
+        backend = get_transcription_backend()
+        chunk = getattr(settings, 'WHISPER_BATCH_SIZE', 8)
+
+        def decode():
+            for start in range(0, len(diarized_segments), chunk):
+                batch = diarized_segments[start:start + chunk]
+                yield batch, [np.ascontiguousarray(waveform[seg['start_sample']:seg['end_sample']]) for seg in batch]
 
+        def transcribe(batches):
+            for batch, audio in batches:
+                texts = backend.invoke_batch(audio, normalize=True, airport_id=session.airport_code) # Priming with airport code
+                yield from zip(batch, texts)
+
+        pipeline = _audio_pipeline(audio_file_id, decode()).stage('transcribe', transcribe)
+        _finalize_segments(audio_file, pipeline)
         logger.info(f"Finished processing AudioFile {audio_file_id}")
 
     except Exception as e:
         logger.error(f"Error processing audio task: {e}")
+        _mark_audio_failed(audio_file_id, e)
+        raise e
+    finally:
+        if not fanned_out:
+            _remove_pcm_cache(pcm_path)
+
+@shared_task(bind=True)
+def transcribe_segment_batch_task(self, pcm_path, sample_ranges, airport_id=None):
+    """
+    Tarea del fan-out: transcribe un batch de segmentos leyendo el buffer compartido con mmap.
+    Devuelve los textos en el mismo orden que `sample_ranges`.
+    """
+    waveform = open_pcm(pcm_path)
+    segments = [np.ascontiguousarray(waveform[start:end]) for start, end in sample_ranges]
+    return get_transcription_backend().invoke_batch(segments, normalize=True, airport_id=airport_id)
+
+@shared_task(bind=True)
+def finalize_audio_file_task(self, batch_results, audio_file_id, diarized_segments, pcm_path=None):
+    """
+    Reducer del chord: recibe los textos de cada batch (en orden), sanitiza con la ventana
+    de contexto y guarda los segmentos.
+    """
+    try:
+        audio_file = AudioFile.objects.select_related('session').get(id=audio_file_id)
+        raw_texts = [text for batch in batch_results for text in batch]
+        _finalize_segments(audio_file, _audio_pipeline(audio_file_id, zip(diarized_segments, raw_texts)))
+        logger.info(f"Finished processing AudioFile {audio_file_id}")
+    except Exception as e:
+        logger.error(f"Error finalizing audio task: {e}")
+        _mark_audio_failed(audio_file_id, e)
+        raise e
+    finally:
+        _remove_pcm_cache(pcm_path)
+
+@shared_task
+def audio_processing_failed_task(audio_file_id, pcm_path=None):
+    """Errback del chord: alguna tarea de transcripción ha fallado."""
+    _mark_audio_failed(audio_file_id, "Segment transcription failed")
+    _remove_pcm_cache(pcm_path)
+
+def _audio_pipeline(audio_file_id, source) -> StagePipeline:
+    return StagePipeline(source, maxsize=getattr(settings, 'PIPELINE_QUEUE_SIZE', 32), name=f"audio-{audio_file_id}")
+
+def _sanitize_stage(transcribed):
+    """
+    Etapa del sanitizador: noise gate y sanitización por ventanas (una petición por cada
+    `SANITIZER_BATCH_SIZE` segmentos, con las frases anteriores como contexto) a medida que
+    llegan los textos de Whisper.
+    """
+    # Noise Gate
+    kept, texts = itertools.tee(
+        (seg_data, raw_text) for seg_data, raw_text in transcribed
+        if raw_text and len(raw_text.strip()) >= 2
+    )
+
+    # --- Semantic Sanitizer (Gemini / Ollama) ---
+    results = get_sanitizer().sanitize_stream(raw_text for _, raw_text in texts)
+    for (seg_data, raw_text), sanitization_result in zip(kept, results):
+        yield seg_data, raw_text, sanitization_result
+
+def _finalize_segments(audio_file, pipeline):
+    """
+    Sanitiza y guarda los SpeechSegment de un AudioFile.
+
+    `pipeline` produce pares (segmento diarizado, texto de Whisper) en orden; se le añade la
+    etapa del sanitizador y este hilo prepara las filas según llegan. La inserción y el estado
+    del audio/sesión van después en una única transacción corta: no se mantiene una transacción
+    (ni sus bloqueos) abierta durante Whisper y el LLM, y un fallo no deja segmentos a medias.
+    """
+    pipeline.stage('sanitize', _sanitize_stage)
+
+    speech_segments = []
+    for seg_data, raw_text, sanitization_result in pipeline:
+        refined_text = sanitization_result.get('refined_text', raw_text)
+        speaker_role = sanitization_result.get('speaker', 'OTHER').upper() # ATCO, PILOT, OTHER
+
+        # --- Guardar SpeechSegment ---
+        # El recorte WAV se genera bajo demanda cuando la UI lo reproduce (SegmentAudioView)
+        # Mapeo de roles estandarizados
+        db_role = 'OTHER'
+        if 'ATCO' in speaker_role: db_role = 'ATCO'
+        elif 'PILOT' in speaker_role: db_role = 'PILOT'
+
+        speech_segments.append(SpeechSegment(
+            audio_file=audio_file,
+            start_time=seg_data['start_time'],
+            end_time=seg_data['end_time'],
+            speaker_role=db_role,
+            text_content=refined_text,
+            original_ai_text=raw_text
+        ))
+
+    with transaction.atomic():
+        SpeechSegment.objects.bulk_create(speech_segments, batch_size=SEGMENT_INSERT_BATCH)
+        _mark_audio_processed(audio_file)
+
+    logger.info(pipeline.summary())
+
+@transaction.atomic
+def _mark_audio_processed(audio_file):
+    """
+    Marca el audio como procesado y, si era el último de la sesión, la pasa a 'ready'.
+    El bloqueo de la fila de la sesión serializa los audios que terminan a la vez,
+    de modo que siempre hay uno que ve el recuento final.
+    """
+    session = CommunicationSession.objects.select_for_update().get(id=audio_file.session_id)
+
+    audio_file.is_processed = True
+    audio_file.save(update_fields=['is_processed'])
+
+    # Verificar si la sesión ha terminado (una única consulta agregada)
+    pending = session.audios.aggregate(pending=Count('id', filter=Q(is_processed=False)))['pending']
+    if pending == 0:
+        session.status = 'ready' # Lista para revisión humana
+        session.save(update_fields=['status'])
+
+def _mark_audio_failed(audio_file_id, error):
+    try:
+        audio = AudioFile.objects.get(id=audio_file_id)
+        audio.processing_error = str(error)
+        audio.save(update_fields=['processing_error'])
+        audio.session.status = 'error'
+        audio.session.save(update_fields=['status'])
+    except:
+        pass
+
+def _pcm_temp_dir():
+    # PCM temporales del procesado: `_save_pcm_cache` y los `diarize-*.npy` del servidor de modelos
+    return os.path.join(settings.MEDIA_ROOT, 'cache', 'pcm')
+
+def _save_pcm_cache(audio_file_id, waveform):
+    return save_pcm(os.path.join(_pcm_temp_dir(), f"{audio_file_id}.npy"), waveform)
+
+def _remove_pcm_cache(pcm_path):
+    """
+    Borra el PCM de un audio terminado sólo si es del propio procesado (volcado `vlas-pcm-*` o
+    fichero de `_pcm_temp_dir`). Las entradas de AUDIO_PCM_CACHE_DIR se quedan para reutilizarse
+    al reprocesar; las expulsa `audio_loader.evict_pcm_cache`.
+    """
+    if not pcm_path or audio_loader.in_pcm_cache(pcm_path):
+        return
+    if audio_loader.is_spill(pcm_path):
+        audio_loader.release_spill(pcm_path)
+        return
+    if os.path.dirname(os.path.abspath(pcm_path)) != os.path.abspath(_pcm_temp_dir()):
+        return
+    if os.path.exists(pcm_path):
         try:
-            audio = AudioFile.objects.get(id=audio_file_id)
-            audio.processing_error = str(e)
-            audio.save()
-            audio.session.status = 'error'
-            audio.session.save()
-        except:
-            pass
+            os.remove(pcm_path)
+        except OSError as e:
+            logger.warning(f"Could not remove PCM cache {pcm_path}: {e}")
+
+@shared_task
+def process_live_stream_task(session_id, final=False):
+    """
+    Procesa el audio pendiente de un stream en vivo (VAD, Whisper, sanitizador y BD).
+    Las tareas de un mismo stream se serializan con su lock, así que el orden de encolado
+    no importa: cada una procesa lo que haya llegado hasta ese momento.
+    """
+    from .streaming import get_stream
+
+    stream = get_stream(session_id)
+    if stream is None:
+        return 0
+    return len(stream.process(final=final))
+
+@shared_task
+def reap_live_stream_task(session_id):
+    """
+    Cierra un stream en vivo que lleva LIVE_STREAM_IDLE_TIMEOUT_S sin recibir audio (cliente
+    caído o que nunca envió `final`). Si sigue activo, se vuelve a programar.
+    """
+    from .streaming import get_stream
+
+    stream = get_stream(session_id)
+    if stream is None:
+        return
+    timeout = getattr(settings, 'LIVE_STREAM_IDLE_TIMEOUT_S', 120)
+    idle = stream.idle_seconds()
+    if idle < timeout:
+        reap_live_stream_task.apply_async((session_id,), countdown=timeout - idle)
+        return
+    logger.warning(f"Live stream for session {session_id} idle for {idle:.0f}s, closing it")
+    stream.process(final=True)
+
+@shared_task(bind=True)
+def validate_session_task(self, session_id):
+    """
+    Validación de Safety de una sesión completa: agrupa sus segmentos en conversaciones,
+    las valida en paralelo con el Validator caliente del worker y guarda los resultados.
+    """
+    from .session_validation import validate_session
+
+    try:
+        session = CommunicationSession.objects.get(id=session_id)
+    except CommunicationSession.DoesNotExist:
+        logger.error(f"Session {session_id} not found.")
+        return
+
+    try:
+        report = validate_session(session)
+        return report['summary']
+    except Exception as e:
+        logger.error(f"Error validating session {session_id}: {e}")
+        # La transcripción sigue siendo válida: sólo se registra el fallo de la validación
+        session.validation_report = {'error': str(e), 'failed_at': timezone.now().isoformat()}
+        session.save(update_fields=['validation_report'])
         raise e
 
 @shared_task(bind=True)
@@ -146,6 +340,14 @@ def initialize_backend_models(self):
     try:
         import time
         logger.info("Starting granular model initialization...")
+
+        # 0. Servidor de modelos: los modelos viven allí, sólo comprobamos que responde
+        if getattr(settings, 'MODEL_SERVER_ADDRESS', None):
+            from .model_server import get_model_server_client
+            self.update_state(state='PROGRESS', meta={'message': 'Conectando con el servidor de modelos...'})
+            server_status = get_model_server_client().ping()
+            logger.info(f"Model server ready: {server_status}")
+            return {"status": "ready", "details": "Servidor de modelos listo."}
         
         # 1. Whisper
         from .transcriber.transcriber import get_transcriber_instance, is_model_loaded
@@ -162,13 +364,24 @@ def initialize_backend_models(self):
             logger.info("Whisper loaded.")
 
         # 2. Pyannote (Diarización)
-        logger.info("Updating state to PROGRESS: Pyannote...")
-        self.update_state(state='PROGRESS', meta={'message': 'Inicializando Pyannote (Identificación de Hablantes)...'})
-        time.sleep(1)
-        _ = AudioDiarization()
-        logger.info("Pyannote loaded.")
+        from .diarizer import get_diarizer_instance, is_diarizer_loaded
+
+        if is_diarizer_loaded():
+            logger.info("Pyannote already loaded. Skipping.")
+            self.update_state(state='PROGRESS', meta={'message': 'Pyannote ya está listo...'})
+            diarizer = get_diarizer_instance()
+        else:
+            logger.info("Updating state to PROGRESS: Pyannote...")
+            self.update_state(state='PROGRESS', meta={'message': 'Inicializando Pyannote (Identificación de Hablantes)...'})
+            diarizer = get_diarizer_instance()
+            logger.info("Pyannote loaded.")
+
+        # 3. Warm-up: una inferencia corta para que CUDA/cuDNN no penalicen el primer audio real
+        if diarizer.warmup_time is None:
+            self.update_state(state='PROGRESS', meta={'message': 'Calentando Pyannote...'})
+            diarizer.warmup()
 
-        return {"status": "ready", "details": "Todos los motores inicializados."}
+        return {"status": "ready", "details": "Todos los motores inicializados.", "diarizer": diarizer.health()}
 
     except Exception as e:
         logger.error(f"Error initializing models: {e}")
@@ -1,3 +1,145 @@
-from django.test import TestCase
+import os
+import uuid
+import asyncio
+import shutil
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.test import SimpleTestCase, override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+import numpy as np
+
+from . import audio_loader, streaming, tasks
+from .views import SessionViewSet
+from .llm_client import get_llm_client
+from .validator.validation import Validator
+
+
+class LiveStreamClosedTests(SimpleTestCase):
+    """Trozos de audio que llegan cuando el stream en vivo ya se ha cerrado."""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        self.session = mock.Mock(id=str(uuid.uuid4()), airport_code='LEMD')
+        self.audio_file = mock.Mock(id=str(uuid.uuid4()))
+        self.audio_file.file.path = os.path.join(self.media_root, 'sessions', 'audio', 'live.wav')
+        self.stream = streaming.LiveTranscriptionStream.create(self.session, self.audio_file)
+
+    def _finalize(self):
+        self.stream.append(b'\x00\x01' * 1600)
+        self.stream._finalize(self.audio_file, self.stream._load_state())
+
+    def _post_chunk(self, session_id):
+        request = APIRequestFactory().post(
+            f'/sessions/{session_id}/live/chunk/', data=b'\x00\x00', content_type='application/octet-stream'
+        )
+        force_authenticate(request, user=mock.Mock(is_authenticated=True))
+        session = mock.Mock(id=session_id)
+        with mock.patch.object(SessionViewSet, 'get_object', return_value=session), \
+                mock.patch.object(streaming, 'enqueue_processing') as enqueue:
+            response = SessionViewSet.as_view({'post': 'live_chunk'})(request, pk=session_id)
+        return response, enqueue
+
+    def test_append_after_finalize_raises_closed(self):
+        self._finalize()
+        self.assertTrue(os.path.exists(self.audio_file.file.path))
+
+        with self.assertRaises(streaming.LiveStreamClosedError) as ctx:
+            self.stream.append(b'\x00\x00')
+        self.assertTrue(ctx.exception.finalized)
+        self.assertIsNone(streaming.get_stream(self.session.id))
+
+    def test_append_to_unknown_stream_raises_not_found(self):
+        with self.assertRaises(streaming.LiveStreamClosedError) as ctx:
+            streaming.LiveTranscriptionStream(uuid.uuid4()).append(b'\x00\x00')
+        self.assertFalse(ctx.exception.finalized)
+
+    def test_live_chunk_after_finalize_returns_409(self):
+        self._finalize()
+        response, enqueue = self._post_chunk(self.session.id)
+        self.assertEqual(response.status_code, 409)
+        enqueue.assert_not_called()
+
+    def test_live_chunk_without_stream_returns_404(self):
+        response, enqueue = self._post_chunk(str(uuid.uuid4()))
+        self.assertEqual(response.status_code, 404)
+        enqueue.assert_not_called()
+
+
+class ValidatorInvokeTests(SimpleTestCase):
+    """`Validator.invoke` reutilizado (como con `get_validator`) sobre el mismo event loop."""
+
+    def test_invoke_twice_on_the_same_instance(self):
+        validator = object.__new__(Validator)
+        validator.llm_client = get_llm_client()
+        loops = []
+
+        async def ainvoke(input):
+            # Como el cliente de Ollama/httpx: ligado al loop en el que se usa por primera vez
+            loop = asyncio.get_running_loop()
+            if loops and loops[0] is not loop:
+                raise RuntimeError('attached to a different loop')
+            loops.append(loop)
+            return input
+
+        with mock.patch.object(validator, 'ainvoke', side_effect=ainvoke):
+            self.assertEqual(validator.invoke([('atco', 'first')]), [('atco', 'first')])
+            self.assertEqual(validator.invoke([('atco', 'second')]), [('atco', 'second')])
+
+        self.assertEqual(len(loops), 2)
+        self.assertFalse(loops[0].is_closed())
+
+
+class PcmCacheOwnershipTests(SimpleTestCase):
+    """Al terminar un audio sólo se borran los PCM del propio procesado, no los de la caché."""
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=os.path.join(self.root, 'media'))
+        media.enable()
+        self.addCleanup(media.disable)
+
+        self.cache_dir = os.path.join(self.root, 'pcm-cache')
+        patcher = mock.patch.object(audio_loader, 'AUDIO_PCM_CACHE_DIR', self.cache_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _process_with_waveform(self, pcm_path):
+        audio_loader.save_pcm(pcm_path, np.zeros(16000, dtype=np.float32))
+        waveform = audio_loader.open_pcm(pcm_path)
+        diarizer = mock.Mock()
+        diarizer.diarize.return_value = (waveform, [])
+        audio_file = mock.Mock(id=1)
+        audio_file.file.path = os.path.join(self.root, 'audio.wav')
+
+        with mock.patch.object(tasks.AudioFile.objects, 'get', return_value=audio_file), \
+                mock.patch.object(tasks, 'get_diarization_backend', return_value=diarizer), \
+                mock.patch.object(tasks, '_mark_audio_processed') as mark_processed:
+            tasks.process_audio_file_task(audio_file.id)
+        mark_processed.assert_called_once_with(audio_file)
+
+    def test_cache_dir_entry_survives_processing(self):
+        pcm_path = os.path.join(self.cache_dir, 'entry.npy')
+        self._process_with_waveform(pcm_path)
+        self.assertTrue(os.path.exists(pcm_path))
+
+    def test_spilled_pcm_is_removed_after_processing(self):
+        pcm_path = os.path.join(self.root, f"{audio_loader.SPILL_PREFIX}test.npy")
+        self._process_with_waveform(pcm_path)
+        self.assertFalse(os.path.exists(pcm_path))
+
+    def test_remove_pcm_cache_only_removes_task_files(self):
+        temp_path = tasks._save_pcm_cache(1, np.zeros(10, dtype=np.float32))
+        other_path = audio_loader.save_pcm(os.path.join(self.root, 'other.npy'), np.zeros(10, dtype=np.float32))
+
+        tasks._remove_pcm_cache(temp_path)
+        tasks._remove_pcm_cache(other_path)
+        self.assertFalse(os.path.exists(temp_path))
+        self.assertTrue(os.path.exists(other_path))
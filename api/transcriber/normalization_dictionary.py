@@ -0,0 +1,118 @@
+"""
+Diccionario de normalización (Capa 1) cargado desde la base de datos.
+
+`TranscriptionCorrection` se lee una sola vez por proceso y se compila en las estructuras
+que usa `normalize.py`:
+    - mistakes: {palabra incorrecta -> corrección} para `apply_text_corrections`.
+    - numbers:  {número hablado -> dígitos} + regex compilada para `convert_numbers_to_digits`.
+
+Invalidación:
+    - En el proceso que guarda/borra una corrección, al instante (señales post_save/post_delete,
+      conectadas en `ApiConfig.ready`).
+    - En el resto de procesos (workers, servidor de modelos), al vencer
+      `NORMALIZATION_DICTIONARY_TTL` segundos.
+"""
+import re
+import time
+import logging
+import threading
+
+import xxhash
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Categorías de TranscriptionCorrection que son correcciones de palabra
+MISTAKE_CATEGORIES = ('general', 'airline', 'terminology')
+# Categorías que convierten números hablados a dígitos. De 'nato_alphabet' sólo se usan
+# las entradas numéricas (seed_normalization mezcla ahí letras y números).
+NUMBER_CATEGORIES = ('number', 'nato_alphabet')
+_NUMERIC = re.compile(r'\d+')
+
+
+class CompiledDictionary:
+    """Estructuras de búsqueda listas para usar (inmutables una vez creadas)."""
+
+    def __init__(self, mistakes: dict, numbers: dict):
+        self.mistakes = mistakes
+        self.numbers = numbers
+        self.numbers_pattern = None
+        if numbers:
+            # Más largas primero: "diez y seis" antes que "diez"
+            keys = sorted(numbers, key=len, reverse=True)
+            self.numbers_pattern = re.compile(r'\b(?:' + '|'.join(map(re.escape, keys)) + r')\b', re.IGNORECASE)
+        # Huella del contenido: forma parte de la clave de la caché de transcripciones
+        self.fingerprint = xxhash.xxh64_hexdigest(repr((sorted(mistakes.items()), sorted(numbers.items()))).encode('utf-8'))
+
+
+EMPTY_DICTIONARY = CompiledDictionary({}, {})
+
+
+class NormalizationDictionary:
+    """Caché versionada en memoria de la tabla `TranscriptionCorrection`."""
+
+    def __init__(self, ttl: float = None):
+        self.ttl = ttl if ttl is not None else getattr(settings, 'NORMALIZATION_DICTIONARY_TTL', 60)
+        self.version = 0
+        self._loaded_version = -1
+        self._loaded_at = 0.0
+        self._compiled = EMPTY_DICTIONARY
+        self._lock = threading.Lock()
+
+    def invalidate(self, *args, **kwargs):
+        """Receptor de señales: fuerza la recarga en el próximo acceso."""
+        self.version += 1
+
+    def get(self) -> CompiledDictionary:
+        if self._loaded_version == self.version and (not self.ttl or time.monotonic() - self._loaded_at < self.ttl):
+            return self._compiled
+
+        with self._lock:
+            # Otro hilo puede haberlo recargado mientras esperábamos
+            if self._loaded_version != self.version or (self.ttl and time.monotonic() - self._loaded_at >= self.ttl):
+                self._reload()
+        return self._compiled
+
+    def _reload(self):
+        version = self.version
+        try:
+            from api.models.models import TranscriptionCorrection
+
+            mistakes, numbers = {}, {}
+            rows = TranscriptionCorrection.objects.values_list('incorrect_text', 'correct_text', 'category')
+            for incorrect, correct, category in rows:
+                key = incorrect.strip().lower()
+                if not key:
+                    continue
+                if category in NUMBER_CATEGORIES and _NUMERIC.fullmatch(correct.strip()):
+                    numbers[key] = correct.strip()
+                elif category in MISTAKE_CATEGORIES:
+                    mistakes[key] = correct
+
+            self._compiled = CompiledDictionary(mistakes, numbers)
+            logger.info(f"Normalization dictionary loaded: {len(mistakes)} corrections, {len(numbers)} numbers")
+        except Exception as e:
+            # Sin BD (p.ej. scripts sueltos): se sigue con el último diccionario válido
+            logger.warning(f"Could not load normalization dictionary: {e}")
+
+        self._loaded_version = version
+        self._loaded_at = time.monotonic()
+
+
+# Instancia global lazy
+_dictionary_instance = None
+
+def get_normalization_dictionary():
+    global _dictionary_instance
+    if _dictionary_instance is None:
+        _dictionary_instance = NormalizationDictionary()
+    return _dictionary_instance
+
+def connect_signals():
+    """Invalida el diccionario de este proceso cuando cambia una corrección."""
+    from django.db.models.signals import post_save, post_delete
+    from api.models.models import TranscriptionCorrection
+
+    dictionary = get_normalization_dictionary()
+    post_save.connect(dictionary.invalidate, sender=TranscriptionCorrection, dispatch_uid='normalization_dictionary_save')
+    post_delete.connect(dictionary.invalidate, sender=TranscriptionCorrection, dispatch_uid='normalization_dictionary_delete')
@@ -1,4 +1,6 @@
 import re
+import xxhash
+from functools import lru_cache
 
 """
 Reglas de normalización determinista (Capa 2).
@@ -91,8 +93,115 @@ AIRPORT_RULES = {
     ]
 }
 
+# Versión de las reglas: cambia automáticamente al editar COMMON_RULES/AIRPORT_RULES
+# e invalida las transcripciones cacheadas (api/transcription_cache.py).
+RULES_VERSION = xxhash.xxh64_hexdigest(repr((COMMON_RULES, sorted(AIRPORT_RULES.items()))).encode('utf-8'))
+
+# Patrón de regla "de palabra": (?i)\b(alt1|alt2|...)\b con alternativas literales
+# (sólo letras y espacios simples) y reemplazo sin backreferences.
+_LITERAL_ALTERNATIVE = re.compile(r"[^\W\d_]+(?: [^\W\d_]+)*")
+_WHITESPACE = re.compile(r'\s+')
+
+
+def _literal_alternatives(pattern: str, replacement: str):
+    """Devuelve las alternativas literales de una regla de palabra, o None si no lo es."""
+    prefix, suffix = '(?i)\\b', '\\b'
+    if not (pattern.startswith(prefix) and pattern.endswith(suffix)) or '\\' in replacement:
+        return None
+    body = pattern[len(prefix):-len(suffix)]
+    if body.startswith('(') and body.endswith(')'):
+        body = body[1:-1]
+    alternatives = body.split('|')
+    if not all(_LITERAL_ALTERNATIVE.fullmatch(alt) for alt in alternatives):
+        return None
+    return alternatives
+
+
+class _WordGroup:
+    """Reglas de palabra consecutivas fusionadas en una sola alternancia + tabla de búsqueda."""
+
+    def __init__(self):
+        self.alternatives = []
+        self.lookup = {}
+        self.tokens = set()
+        self.output_tokens = set()
+
+    def accepts(self, alternatives, replacement):
+        """
+        Una regla sólo se fusiona si el resultado es idéntico a aplicarla después de las
+        anteriores: no comparte palabras con ellas (no hay solapes entre coincidencias)
+        y no puede coincidir con texto producido por ellas.
+        """
+        tokens = {word for alt in alternatives for word in alt.lower().split()}
+        if tokens & (self.tokens | self.output_tokens):
+            return False
+        return all(alt.lower() not in self.lookup for alt in alternatives)
+
+    def add(self, alternatives, replacement):
+        for alt in alternatives:
+            self.alternatives.append(alt)
+            self.lookup[alt.lower()] = replacement
+        self.tokens |= {word for alt in alternatives for word in alt.lower().split()}
+        self.output_tokens |= set(re.findall(r'\w+', replacement.lower()))
+
+    def compile(self):
+        # El orden de las alternativas se conserva: misma prioridad que las reglas originales
+        pattern = re.compile(r'(?i)\b(?:' + '|'.join(map(re.escape, self.alternatives)) + r')\b')
+        lookup = self.lookup
+        return pattern, lambda match: lookup[match.group(0).lower()]
+
+
+@lru_cache(maxsize=64)
+def get_rule_passes(airport_code: str = None):
+    """
+    Compila (una vez por aeropuerto) las reglas comunes + las del aeropuerto en una lista
+    ordenada de pasadas `(regex compilada, reemplazo)`.
+    """
+    rules = list(COMMON_RULES)
+    if airport_code:
+        rules += AIRPORT_RULES.get(airport_code, [])
+
+    passes = []
+    group = None
+    for pattern, replacement in rules:
+        alternatives = _literal_alternatives(pattern, replacement)
+        if alternatives is not None:
+            if group is None or not group.accepts(alternatives, replacement):
+                if group is not None:
+                    passes.append(group.compile())
+                group = _WordGroup()
+            group.add(alternatives, replacement)
+            continue
+
+        # Regla dependiente del orden (backreferences, clases, lookaheads...): pasada propia
+        if group is not None:
+            passes.append(group.compile())
+            group = None
+        passes.append((re.compile(pattern), replacement))
+
+    if group is not None:
+        passes.append(group.compile())
+    return tuple(passes)
+
+
 def apply_normalization_rules(text: str, airport_code: str = None) -> str:
-    """Aplica reglas regex secuencialmente al texto."""
+    """Aplica las reglas (compiladas y cacheadas por aeropuerto) al texto."""
+    if not text:
+        return ""
+
+    code = airport_code.upper().strip() if airport_code else None
+    if code not in AIRPORT_RULES:
+        code = None
+
+    for pattern, replacement in get_rule_passes(code):
+        text = pattern.sub(replacement, text)
+
+    # Limpieza final de espacios dobles
+    return _WHITESPACE.sub(' ', text).strip()
+
+
+def apply_normalization_rules_sequential(text: str, airport_code: str = None) -> str:
+    """Implementación de referencia: cada regla es una pasada re.sub independiente."""
     if not text:
         return ""
         
@@ -1,10 +1,11 @@
 import re
 import unicodedata
-# from .normalization_rules import get_normalization_rules  <-- REMOVED
+from .normalization_dictionary import get_normalization_dictionary
 
-# Mocks para evitar romper código legacy si alugien lo llama
 def get_normalization_rules():
-    return {}, {}
+    """Devuelve (mistakes, numbers) del diccionario cacheado de la BD."""
+    dictionary = get_normalization_dictionary().get()
+    return dictionary.mistakes, dictionary.numbers
 
 def apply_text_corrections(text, mistakes_dict):
     """
@@ -27,14 +28,19 @@ def apply_text_corrections(text, mistakes_dict):
             
     return ' '.join(new_words)
 
-def convert_numbers_to_digits(text, number_mapping):
+def convert_numbers_to_digits(text, number_mapping, pattern=None):
     """
     Convierte números escritos (uno, dos) a dígitos (1, 2) usando NUMBER_MAPPING.
     Usa regex con bordes de palabra (\b) para evitar reemplazar "uno" dentro de "alguno".
+    Si se pasa `pattern` (alternancia precompilada de las claves en minúsculas) se hace
+    una única pasada.
     """
     if not number_mapping:
         return text
 
+    if pattern is not None:
+        return pattern.sub(lambda match: number_mapping[match.group(0).lower()], text)
+
     # Ordenamos por longitud inversa para reemplazar "diez y seis" antes que "diez" (si hubiera compuestos)
     sorted_nums = sorted(number_mapping.keys(), key=len, reverse=True)
     
@@ -79,10 +85,10 @@ def filterAndNormalize(text):
     if not text: 
         return ""
     
-    # MOCK: Ya no cargamos reglas legacy de DB.
-    # mistakes, numbers = get_normalization_rules()
-    mistakes = {}
-    numbers = {}
+    # Diccionario de la BD, cacheado en memoria (sin consultas por segmento)
+    dictionary = get_normalization_dictionary().get()
+    mistakes = dictionary.mistakes
+    numbers = dictionary.numbers
 
     # 1. Limpieza básica
     # Convertir a minúsculas iniciales para análisis, pero el output puede cambiar
@@ -90,7 +96,7 @@ def filterAndNormalize(text):
     
     # 2. Normalización de Números (uno -> 1)
     # Es útil hacerlo antes de las palabras para limpiar contexto
-    cleaned_s2 = convert_numbers_to_digits(cleaned_s1, numbers)
+    cleaned_s2 = convert_numbers_to_digits(cleaned_s1, numbers, dictionary.numbers_pattern)
     
     # 3. Correcciones de Diccionario (Victoria -> Victor)
     cleaned_s3 = apply_text_corrections(cleaned_s2, mistakes)
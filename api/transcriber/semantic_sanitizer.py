@@ -1,71 +1,129 @@
-
 import logging
 import json
 import os
-try:
-    import google.generativeai as genai
-except ImportError:
-    genai = None
 from django.conf import settings
 
+from ..llm_client import get_llm_client, CircuitOpenError
+
 logger = logging.getLogger(__name__)
 
+SPEAKERS = ('ATCO', 'PILOT', 'OTHER')
+
+OBJECTIVES = """
+        OBJETIVOS:
+        1. REFINED_TEXT: Limpia SOLO errores obvios de transcripción (ej: 'ok recibido' -> 'Recibido', mayúsculas iniciales). NO cambies la fraseología técnica aunque sea incorrecta.
+        2. SPEAKER: Clasifica RIGUROSAMENTE quién habla ('ATCO' o 'PILOT').
+
+        GUÍA DE CLASIFICACIÓN (LECU):
+        - ATCO (Controlador):
+            * Empieza por el Callsign del avión: "Aerotec uno, autorizado...", "EC-H, notifique...".
+            * Da órdenes: "Autorizado", "Notifique", "Ruede", "Mantenga", "Viento", "Pista libre", "Motor y al aire".
+            * Dice "Adelante" para dar paso.
+
+        - PILOT (Piloto):
+            * Empieza llamando a la dependencia: "Torre, Aerotec uno...", "Cuatro Vientos, buenas...".
+            * Colaciona (repite instrucciones): "Autorizado despegue...", "Rodando al punto...".
+            * Informa posición: "Viento en cola", "Final pista 27".
+            * Dice "Recibido", "Entendido".
+"""
+
+
 class SemanticSanitizer:
-    def __init__(self, model_name="gemini-1.5-flash"):
-        self.model_name = model_name
-        self.api_key = os.getenv('GEMINI_API_KEY')
+    """
+    Refina transcripciones y clasifica el hablante (ATCO/PILOT) con un LLM.
+
+    Backends:
+        - 'gemini': Google Gemini por su API REST (necesita GEMINI_API_KEY).
+        - 'ollama': modelo local vía Ollama (sin conexión externa).
+
+    Las peticiones pasan por el cliente común (`api/llm_client.py`): pool de conexiones,
+    timeout por petición, reintentos con jitter y circuit breaker. Si el backend falla o el
+    circuito está abierto se devuelve el texto original sin refinar.
+
+    `invoke_batch` envía una ventana de varios segmentos en una sola petición y recibe un
+    array JSON con un resultado por segmento; `sanitize_stream`/`sanitize_all` recorren un audio
+    completo en ventanas de `batch_size`, pasando las últimas `context_lines` frases ya refinadas
+    como contexto de la ventana siguiente.
+    """
+
+    def __init__(self, model_name: str = None, backend: str = None, batch_size: int = None, context_lines: int = None):
+        self.backend = (backend or getattr(settings, 'SANITIZER_BACKEND', 'gemini')).lower()
+        self.model_name = model_name or getattr(settings, 'SANITIZER_MODEL', None) or (
+            "gemini-1.5-flash" if self.backend == 'gemini' else settings.OLLAMA_MODEL
+        )
+        self.batch_size = max(1, batch_size or getattr(settings, 'SANITIZER_BATCH_SIZE', 8))
+        self.context_lines = context_lines if context_lines is not None else getattr(settings, 'SANITIZER_CONTEXT_LINES', 3)
         self.client_ready = False
-        
-        if self.api_key:
+        self.llm_client = get_llm_client()
+
+        if self.backend == 'ollama':
             try:
-                genai.configure(api_key=self.api_key)
-                self.model = genai.GenerativeModel(
-                    self.model_name,
-                    generation_config={"response_mime_type": "application/json"}
+                from langchain_ollama import ChatOllama
+                from ..llm_cache import get_llm_cache
+                self.model = ChatOllama(
+                    model=self.model_name, temperature=0, format='json', cache=get_llm_cache(),
+                    base_url=self.llm_client.ollama_base_url, client_kwargs=self.llm_client.ollama_client_kwargs()
                 )
                 self.client_ready = True
-                logger.info(f"Gemini Sanitizer initialized with model: {self.model_name}")
+                logger.info(f"Ollama Sanitizer initialized with model: {self.model_name}")
             except Exception as e:
-                logger.error(f"Failed to initialize Gemini client: {e}")
+                logger.error(f"Failed to initialize Ollama client: {e}")
+            return
+
+        self.api_key = os.getenv('GEMINI_API_KEY')
+        if self.api_key:
+            self.client_ready = True
+            logger.info(f"Gemini Sanitizer initialized with model: {self.model_name}")
         else:
             logger.warning("GEMINI_API_KEY not found in environment. Sanitizer will be disabled.")
 
+    def _generate(self, prompt: str):
+        """Envía el prompt al backend y devuelve el JSON de la respuesta ya parseado."""
+        if self.backend == 'ollama':
+            async def request():
+                return (await self.model.ainvoke(prompt)).content
+            content = self.llm_client.run(self.llm_client.call('ollama', request))
+        else:
+            content = self.llm_client.run(self.llm_client.gemini_generate(self.model_name, prompt, self.api_key))
+
+        # Limpieza robusta de Markdown json fences
+        if "```json" in content:
+            content = content.replace("```json", "").replace("```", "")
+        elif "```" in content:
+            content = content.replace("```", "")
+        return json.loads(content.strip())
+
+    @staticmethod
+    def _result(data, text: str) -> dict:
+        if not isinstance(data, dict):
+            return {"refined_text": text, "speaker": "OTHER"}
+        refined = data.get('refined_text') or text
+        speaker = str(data.get('speaker', 'OTHER')).upper()
+        if speaker not in SPEAKERS:
+            speaker = 'OTHER'
+        return {"refined_text": refined, "speaker": speaker}
+
+    @staticmethod
+    def _context(context_window: list) -> str:
+        if context_window:
+            return "Contexto previo (conversación anterior):\n" + "\n".join(context_window)
+        return "No hay contexto previo."
+
     def invoke(self, text: str, context_window: list = None) -> dict:
         """
-        Refina la transcripción y clasifica el hablante usando Google Gemini.
+        Refina la transcripción de un único segmento y clasifica el hablante.
         Returns:
             dict: {"refined_text": str, "speaker": str}
         """
         if not text or not self.client_ready:
             return {"refined_text": text, "speaker": "OTHER"}
 
-        # Construir contexto simple
-        ctx_str = "No hay contexto previo."
-        if context_window and len(context_window) > 0:
-            ctx_str = "Contexto previo (conversación anterior):\n" + "\n".join(context_window[-3:]) # Últimas 3 frases
-
         prompt = f"""
         Eres un sistema experto en clasificación de diálogos ATC (Air Traffic Control) para Madrid Cuatro Vientos (LECU).
-        
+
         TU INPUT: "{text}"
-        {ctx_str}
-        
-        OBJETIVOS:
-        1. REFINED_TEXT: Limpia SOLO errores obvios de transcripción (ej: 'ok recibido' -> 'Recibido', mayúsculas iniciales). NO cambies la fraseología técnica aunque sea incorrecta.
-        2. SPEAKER: Clasifica RIGUROSAMENTE quién habla ('ATCO' o 'PILOT').
-        
-        GUÍA DE CLASIFICACIÓN (LECU):
-        - ATCO (Controlador):
-            * Empieza por el Callsign del avión: "Aerotec uno, autorizado...", "EC-H, notifique...".
-            * Da órdenes: "Autorizado", "Notifique", "Ruede", "Mantenga", "Viento", "Pista libre", "Motor y al aire".
-            * Dice "Adelante" para dar paso.
-            
-        - PILOT (Piloto):
-            * Empieza llamando a la dependencia: "Torre, Aerotec uno...", "Cuatro Vientos, buenas...".
-            * Colaciona (repite instrucciones): "Autorizado despegue...", "Rodando al punto...".
-            * Informa posición: "Viento en cola", "Final pista 27".
-            * Dice "Recibido", "Entendido".
-           
+        {self._context((context_window or [])[-self.context_lines:])}
+        {OBJECTIVES}
         Responde SIEMPRE con este JSON válido (sin markdown):
         {{
             "refined_text": "...",
@@ -74,32 +132,99 @@ class SemanticSanitizer:
         """
 
         try:
-            response = self.model.generate_content(prompt)
-            content = response.text
-            
-            # Logger para depuración
-            logger.info(f"Gemini Response for '{text[:20]}...': {content}")
-            
-            # Limpieza robusta de Markdown json fences
-            if "```json" in content:
-                content = content.replace("```json", "").replace("```", "")
-            elif "```" in content:
-                content = content.replace("```", "")
-            
-            data = json.loads(content.strip())
-            
-            refined = data.get('refined_text', text)
-            speaker = data.get('speaker', 'OTHER').upper()
-            
-            if speaker not in ['ATCO', 'PILOT', 'OTHER']:
-                speaker = 'OTHER'
-                
-            return {"refined_text": refined, "speaker": speaker}
-
+            data = self._generate(prompt)
+            logger.info(f"Sanitizer Response for '{text[:20]}...': {data}")
+            return self._result(data, text)
+        except CircuitOpenError as e:
+            logger.warning(f"Sanitizer skipped, {e}")
+            return {"refined_text": text, "speaker": "OTHER"}
         except Exception as e:
-            logger.error(f"Error in Semantic Sanitizer Gemini call: {e}")
+            logger.error(f"Error in Semantic Sanitizer call: {e}")
             return {"refined_text": text, "speaker": "OTHER"}
 
+    def invoke_batch(self, texts: list, context_window: list = None) -> list:
+        """
+        Refina y clasifica una ventana de segmentos consecutivos en una sola petición.
+
+        Returns:
+            list[dict]: Un {"refined_text", "speaker"} por texto, en el mismo orden. Los que falten
+                        en la respuesta se piden de uno en uno.
+        """
+        if not self.client_ready:
+            return [{"refined_text": text, "speaker": "OTHER"} for text in texts]
+
+        numbered = "\n".join(f'        {i}. "{text}"' for i, text in enumerate(texts, start=1))
+        prompt = f"""
+        Eres un sistema experto en clasificación de diálogos ATC (Air Traffic Control) para Madrid Cuatro Vientos (LECU).
+
+        TU INPUT: {len(texts)} transmisiones consecutivas de la misma frecuencia, en orden:
+{numbered}
+        {self._context((context_window or [])[-self.context_lines:])}
+        {OBJECTIVES}
+        Las transmisiones forman parte de la misma conversación: úsalas como contexto entre sí
+        (una colación del piloto suele seguir a una instrucción del ATCO).
+
+        Responde SIEMPRE con un array JSON válido (sin markdown) con exactamente {len(texts)} elementos,
+        uno por transmisión y en el mismo orden:
+        [
+            {{"index": 1, "refined_text": "...", "speaker": "ATCO" | "PILOT" | "OTHER"}},
+            ...
+        ]
+        """
+
+        results = [None] * len(texts)
+        try:
+            data = self._generate(prompt)
+            if isinstance(data, dict):
+                # Algunos modelos envuelven el array en un objeto
+                data = next((value for value in data.values() if isinstance(value, list)), [])
+            for position, item in enumerate(data):
+                if not isinstance(item, dict):
+                    continue
+                index = item.get('index', position + 1)
+                if isinstance(index, int) and 1 <= index <= len(texts) and results[index - 1] is None:
+                    results[index - 1] = self._result(item, texts[index - 1])
+        except CircuitOpenError as e:
+            # Backend degradado: texto original sin reintentar segmento a segmento
+            logger.warning(f"Sanitizer batch skipped, {e}")
+            return [{"refined_text": text, "speaker": "OTHER"} for text in texts]
+        except Exception as e:
+            logger.error(f"Error in Semantic Sanitizer batch call: {e}")
+
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing:
+            logger.warning(f"Sanitizer batch returned {len(texts) - len(missing)}/{len(texts)} results, retrying the rest one by one")
+        for i in missing:
+            context = list(context_window or []) + [f"{r['speaker']}: {r['refined_text']}" for r in results[:i] if r is not None]
+            results[i] = self.invoke(texts[i], context_window=context)
+        return results
+
+    def sanitize_stream(self, texts):
+        """
+        Sanitiza un flujo de segmentos en ventanas de `batch_size` (una petición por ventana),
+        a medida que llegan. Cada ventana recibe como contexto las últimas frases refinadas de
+        la anterior. Genera un resultado por texto, en el mismo orden.
+        """
+        context_window = []
+        window = []
+        for text in texts:
+            window.append(text)
+            if len(window) < self.batch_size:
+                continue
+            yield from self._sanitize_window(window, context_window)
+            window = []
+        if window:
+            yield from self._sanitize_window(window, context_window)
+
+    def _sanitize_window(self, window: list, context_window: list) -> list:
+        results = self.invoke_batch(window, context_window=context_window[-self.context_lines:])
+        context_window.extend(f"{r['speaker']}: {r['refined_text']}" for r in results)
+        return results
+
+    def sanitize_all(self, texts: list) -> list:
+        """Sanitiza todos los segmentos de un audio (ver `sanitize_stream`)."""
+        return list(self.sanitize_stream(texts))
+
 # Instancia global lazy-loaded
 _sanitizer_instance = None
 def get_sanitizer():
@@ -1,10 +1,17 @@
 from faster_whisper import WhisperModel
+from faster_whisper.audio import pad_or_trim
+from faster_whisper.tokenizer import Tokenizer
+from faster_whisper.transcribe import get_suppressed_tokens
 import os
+import numpy as np
 import torch
 from django.conf import settings
 from .normalize import filterAndNormalize
 from .airport_prompts import get_prompt_for_airport
-from .normalization_rules import apply_normalization_rules
+from .normalization_rules import apply_normalization_rules, RULES_VERSION
+from .normalization_dictionary import get_normalization_dictionary
+from ..audio_loader import decode_audio
+from ..transcription_cache import get_transcription_cache, hash_pcm, make_key
 import logging
 
 logger = logging.getLogger(__name__)
@@ -17,6 +24,11 @@ ALLOWED_EXTENSIONS = [
     '.m4a',
 ]
 
+SAMPLING_RATE = 16000
+# Ventana máxima del encoder de Whisper (30 s). Segmentos más largos no caben en
+# un único batch y se transcriben por la vía secuencial (invoke).
+MAX_BATCH_SEGMENT_SECONDS = 30
+
 # Prompt inicial para condicionar al modelo (Context Priming)
 # Prompt optimizado (Context Priming) - Max densidad de info, min relleno.
 # Objetivo: Forzar contexto ATC Español/Inglés y corregir fonética común.
@@ -125,12 +137,13 @@ class TranscriptionAgent:
                  logger.critical(f'CRITICAL: Final fallback failed: {e2}')
                  raise e2
 
-    def invoke(self, audio_path: str, normalize: bool = True, language: str = None, airport_id: str = None):
+    def invoke(self, audio_path, normalize: bool = True, language: str = None, airport_id: str = None):
         """
         Transcribe un archivo de audio.
 
         Args:
-            audio_path (str): Ruta absoluta al archivo de audio.
+            audio_path (str | np.ndarray): Ruta absoluta al archivo de audio, o la forma de onda
+                                           ya decodificada (float32 mono 16 kHz).
             normalize (bool): Si True, aplica normalización post-transcripción (limpieza de texto).
             language (str, optional): 'es', 'en' o None para auto-detección.
             airport_id (str, optional): Código ICAO del aeropuerto (ej: 'LECU') para cargar prompt específico.
@@ -138,17 +151,24 @@ class TranscriptionAgent:
         Returns:
             str: Texto transcrito.
         """
-        if not os.path.exists(audio_path):
-            logger.error(f'Error: Audio path does not exist: {audio_path}')
-            return ''
-        
-        ext = os.path.splitext(audio_path)[1].lower()
-        if ext not in ALLOWED_EXTENSIONS:
-            logger.error(f'Error: Invalid extension {ext}')
-            return ''
+        if isinstance(audio_path, np.ndarray):
+            audio_path = np.asarray(audio_path, dtype=np.float32)
+        else:
+            if not os.path.exists(audio_path):
+                logger.error(f'Error: Audio path does not exist: {audio_path}')
+                return ''
+
+            ext = os.path.splitext(audio_path)[1].lower()
+            if ext not in ALLOWED_EXTENSIONS:
+                logger.error(f'Error: Invalid extension {ext}')
+                return ''
 
         try:
-            logger.info(f'Transcribing file: {audio_path}')
+            if isinstance(audio_path, np.ndarray):
+                logger.info(f'Transcribing in-memory audio ({audio_path.shape[0] / SAMPLING_RATE:.1f}s)')
+            else:
+                logger.info(f'Transcribing file: {audio_path}')
+                audio_path = decode_audio(audio_path, sample_rate=SAMPLING_RATE)
             # Transcribir
             # Configuración temporal: Forzar español si no se especifica
             target_lang = language if language else 'es'
@@ -177,13 +197,7 @@ class TranscriptionAgent:
             # Unir todo el texto
             transcription = ' '.join(full_text).strip()
 
-            # Normalización Determinista (Capa 2)
-            if normalize:
-                # 1. Limpieza básica de alucinaciones (existente)
-                transcription = filterAndNormalize(transcription)
-                
-                # 2. Reglas Contextuales (Nuevo)
-                transcription = apply_normalization_rules(transcription, airport_code=airport_id)
+            transcription = self._postprocess(transcription, normalize, airport_id)
 
             logger.info('Transcription completed.')
             return transcription
@@ -192,6 +206,159 @@ class TranscriptionAgent:
             logger.error(f'Error during transcription: {e}')
             return ''
 
+    def invoke_batch(self, segments: list, normalize: bool = True, language: str = None, airport_id: str = None, batch_size: int = None):
+        """
+        Transcribe varios segmentos de audio en batches sobre el encoder/decoder de CTranslate2.
+
+        Decodifica todas las formas de onda al principio, calcula los espectrogramas
+        log-Mel, los rellena a la ventana de 30 s de Whisper y los pasa por el modelo
+        en batches de `batch_size`. Los segmentos ya vienen cortados por la diarización,
+        por lo que no se aplica el filtro VAD por segmento de `invoke`.
+
+        Args:
+            segments (list): Segmentos en orden: rutas absolutas a ficheros de audio o formas de
+                             onda float32 mono 16 kHz (p.ej. vistas del buffer de la diarización).
+            normalize (bool): Si True, aplica normalización post-transcripción.
+            language (str, optional): 'es', 'en' o None (por defecto 'es', igual que `invoke`).
+            airport_id (str, optional): Código ICAO del aeropuerto para el prompt específico.
+            batch_size (int, optional): Segmentos por batch. Por defecto settings.WHISPER_BATCH_SIZE.
+
+        Returns:
+            list[str]: Textos transcritos en el mismo orden que `segments` ('' si falla).
+        """
+        results = [''] * len(segments)
+        if not segments:
+            return results
+
+        batch_size = batch_size or getattr(settings, 'WHISPER_BATCH_SIZE', 8)
+        target_lang = language if language else 'es'
+        current_prompt = get_prompt_for_airport(airport_id)
+
+        # 1. Decodificar todos los segmentos antes de tocar el modelo
+        cache = get_transcription_cache()
+        cache_keys = {}
+        pending = []  # (índice, features)
+        for idx, audio_path in enumerate(segments):
+            audio = self._load_segment_audio(audio_path)
+            if audio is None:
+                continue
+
+            # Capa de transcripción de la caché: mismo segmento + mismos parámetros -> mismo texto
+            if cache is not None:
+                cache_keys[idx] = make_key(
+                    hash_pcm(audio), self.model_size, self.compute_type, target_lang,
+                    current_prompt, normalize, airport_id if normalize else None, RULES_VERSION,
+                    get_normalization_dictionary().get().fingerprint if normalize else None
+                )
+                cached = cache.get('transcript', cache_keys[idx])
+                if cached is not None:
+                    results[idx] = cached
+                    continue
+
+            if audio.shape[0] > MAX_BATCH_SEGMENT_SECONDS * SAMPLING_RATE:
+                # No cabe en la ventana del encoder: vía secuencial con VAD
+                results[idx] = self.invoke(audio, normalize=normalize, language=language, airport_id=airport_id)
+                if cache is not None and results[idx]:  # invoke devuelve '' también si falla
+                    cache.put('transcript', cache_keys[idx], results[idx])
+                continue
+
+            features = self.model.feature_extractor(audio)[..., :-1]
+            pending.append((idx, pad_or_trim(features)))
+
+        if not pending:
+            if cache_keys:
+                logger.info(f"Batch transcription served from cache ({len(cache_keys)} segments)")
+            return results
+
+        logger.info(f"Batch transcribing {len(pending)} segments (batch_size={batch_size}, language={target_lang})")
+        logger.info(f"Using AIRPORT PROMPT for: {airport_id or 'DEFAULT'}")
+
+        tokenizer = Tokenizer(
+            self.model.hf_tokenizer,
+            self.model.model.is_multilingual,
+            task='transcribe',
+            language=target_lang,
+        )
+        prompt = self.model.get_prompt(
+            tokenizer,
+            previous_tokens=tokenizer.encode(' ' + current_prompt.strip()),
+            without_timestamps=True,
+        )
+        suppress_tokens = get_suppressed_tokens(tokenizer, [-1])
+
+        # 2. Encoder + decoder por batches rellenados
+        for start in range(0, len(pending), batch_size):
+            chunk = pending[start:start + batch_size]
+            try:
+                features = np.stack([feat for _, feat in chunk])
+                texts = self._generate_batch(features, prompt, tokenizer, suppress_tokens)
+            except Exception as e:
+                logger.error(f'Error during batch transcription: {e}')
+                continue
+
+            for (idx, _), text in zip(chunk, texts):
+                results[idx] = self._postprocess(text, normalize, airport_id)
+                if cache is not None:
+                    cache.put('transcript', cache_keys[idx], results[idx])
+
+        logger.info('Batch transcription completed.')
+        return results
+
+    def _load_segment_audio(self, audio_path):
+        """
+        Decodifica un segmento a float32 mono 16 kHz. Devuelve None si no es válido
+        (vacío, inexistente o con extensión no soportada); los errores de ffmpeg se propagan.
+        """
+        if isinstance(audio_path, np.ndarray):
+            return np.asarray(audio_path, dtype=np.float32) if audio_path.size else None
+
+        if not os.path.exists(audio_path):
+            logger.error(f'Error: Audio path does not exist: {audio_path}')
+            return None
+
+        ext = os.path.splitext(audio_path)[1].lower()
+        if ext not in ALLOWED_EXTENSIONS:
+            logger.error(f'Error: Invalid extension {ext}')
+            return None
+
+        return decode_audio(audio_path, sample_rate=SAMPLING_RATE)
+
+    def _generate_batch(self, features, prompt, tokenizer, suppress_tokens):
+        """Ejecuta encoder y beam search de CTranslate2 sobre un batch de features."""
+        encoder_output = self.model.encode(features)
+
+        outputs = self.model.model.generate(
+            encoder_output,
+            [list(prompt) for _ in range(features.shape[0])],
+            beam_size=15,
+            max_length=self.model.max_length,
+            suppress_blank=True,
+            suppress_tokens=suppress_tokens,
+            return_scores=True,
+            return_no_speech_prob=True,
+        )
+
+        texts = []
+        for output in outputs:
+            tokens = output.sequences_ids[0]
+            # Mismo criterio de silencio que faster-whisper (no_speech_threshold=0.6, log_prob_threshold=-1.0)
+            avg_logprob = output.scores[0] * len(tokens) / (len(tokens) + 1)
+            if output.no_speech_prob > 0.6 and avg_logprob < -1.0:
+                texts.append('')
+            else:
+                texts.append(tokenizer.decode(tokens).strip())
+        return texts
+
+    def _postprocess(self, transcription: str, normalize: bool, airport_id: str = None):
+        """Normalización Determinista (Capa 2)."""
+        if normalize:
+            # 1. Limpieza básica de alucinaciones (existente)
+            transcription = filterAndNormalize(transcription)
+
+            # 2. Reglas Contextuales (Nuevo)
+            transcription = apply_normalization_rules(transcription, airport_code=airport_id)
+        return transcription
+
     def is_loaded(self):
         """Devuelve True si el modelo ya está en memoria."""
         return hasattr(self, 'model') and self.model is not None
@@ -218,6 +385,9 @@ class LazyTranscriberProxy:
     def invoke(self, *args, **kwargs):
         return get_transcriber_instance().invoke(*args, **kwargs)
 
+    def invoke_batch(self, *args, **kwargs):
+        return get_transcriber_instance().invoke_batch(*args, **kwargs)
+
     def is_loaded(self):
         return get_transcriber_instance().is_loaded()
 
@@ -0,0 +1,158 @@
+"""
+Caché direccionada por contenido para el pipeline de audio.
+
+Las claves se calculan con xxhash sobre el PCM decodificado (float32 16 kHz), no sobre el
+fichero subido, así que un mismo audio en otro contenedor/bitrate equivalente también acierta.
+Dos capas independientes:
+    - 'diarization': turnos de pyannote por hash del audio completo.
+    - 'transcript':  texto final por hash del segmento + modelo + compute_type + prompt
+                     del aeropuerto + idioma + versión de las reglas de normalización.
+
+Almacenamiento: un fichero SQLite (compartido por workers y servidor de modelos) con
+expulsión LRU cuando el tamaño total supera `TRANSCRIPTION_CACHE_MAX_BYTES`. Cada proceso lleva
+una estimación del tamaño (el total leído más lo que ha escrito) y sólo calcula el total real
+al superarla o cada `EVICT_CHECK_INTERVAL` escrituras (para ver lo escrito por otros procesos).
+"""
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+
+import numpy as np
+import xxhash
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 512 * 1024 ** 2
+EVICT_CHECK_INTERVAL = 256
+
+
+def hash_pcm(waveform) -> str:
+    """Hash de contenido de una forma de onda (sin copias si ya es float32 contigua)."""
+    array = np.ascontiguousarray(waveform, dtype=np.float32)
+    return xxhash.xxh3_128_hexdigest(memoryview(array).cast('B'))
+
+
+def make_key(*parts) -> str:
+    """Combina el hash del audio con los parámetros que afectan al resultado."""
+    return xxhash.xxh3_128_hexdigest('\x1f'.join('' if p is None else str(p) for p in parts).encode('utf-8'))
+
+
+class TranscriptionCache:
+    """Almacén clave/valor JSON en SQLite con expulsión LRU por tamaño."""
+
+    def __init__(self, path: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+        self._size_lock = threading.Lock()
+        self._estimated_size = None  # None = hay que leer el total real
+        self._writes_since_check = 0
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " layer TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL,"
+                " size INTEGER NOT NULL, last_access REAL NOT NULL,"
+                " PRIMARY KEY (layer, key))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)")
+
+    def _connection(self):
+        # Una conexión por hilo (el servidor de modelos atiende desde varios hilos)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, layer: str, key: str):
+        try:
+            with self._connection() as conn:
+                row = conn.execute("SELECT value FROM entries WHERE layer = ? AND key = ?", (layer, key)).fetchone()
+                if row is None:
+                    self.stats['misses'] += 1
+                    return None
+                conn.execute("UPDATE entries SET last_access = ? WHERE layer = ? AND key = ?", (time.time(), layer, key))
+        except sqlite3.Error as e:
+            logger.warning(f"Transcription cache read failed: {e}")
+            return None
+
+        self.stats['hits'] += 1
+        return json.loads(row[0])
+
+    def put(self, layer: str, key: str, value):
+        data = json.dumps(value, ensure_ascii=False)
+        size = len(data) + len(key)
+        try:
+            with self._connection() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries (layer, key, value, size, last_access) VALUES (?, ?, ?, ?, ?)",
+                    (layer, key, data, size, time.time())
+                )
+                if self._needs_check(size):
+                    self._evict(conn)
+        except sqlite3.Error as e:
+            logger.warning(f"Transcription cache write failed: {e}")
+
+    def _needs_check(self, size: int) -> bool:
+        # Estimación por exceso (un REPLACE suma el tamaño entero): sólo provoca una comprobación de más
+        with self._size_lock:
+            self._writes_since_check += 1
+            if self._estimated_size is not None:
+                self._estimated_size += size
+            return (self._estimated_size is None or self._estimated_size > self.max_bytes
+                    or self._writes_since_check >= EVICT_CHECK_INTERVAL)
+
+    def _evict(self, conn):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        with self._size_lock:
+            self._estimated_size = total
+            self._writes_since_check = 0
+        if total <= self.max_bytes:
+            return
+
+        # Bajar al 90% del límite para no expulsar en cada escritura
+        excess = total - int(self.max_bytes * 0.9)
+        victims, freed = [], 0
+        for layer, key, size in conn.execute("SELECT layer, key, size FROM entries ORDER BY last_access"):
+            victims.append((layer, key))
+            freed += size
+            excess -= size
+            if excess <= 0:
+                break
+        conn.executemany("DELETE FROM entries WHERE layer = ? AND key = ?", victims)
+        with self._size_lock:
+            self._estimated_size = total - freed
+        self.stats['evictions'] += len(victims)
+        logger.info(f"Transcription cache: evicted {len(victims)} entries")
+
+    def clear(self):
+        with self._connection() as conn:
+            conn.execute("DELETE FROM entries")
+        with self._size_lock:
+            self._estimated_size = None
+
+
+# Instancia global lazy
+_cache_instance = None
+
+def get_transcription_cache():
+    """Devuelve la caché del proceso, o None si está desactivada."""
+    global _cache_instance
+    if not getattr(settings, 'TRANSCRIPTION_CACHE_ENABLED', True):
+        return None
+    if _cache_instance is None:
+        cache_dir = getattr(settings, 'TRANSCRIPTION_CACHE_DIR', None) or os.path.join(settings.MEDIA_ROOT, 'cache')
+        _cache_instance = TranscriptionCache(
+            os.path.join(cache_dir, 'transcription_cache.sqlite3'),
+            max_bytes=getattr(settings, 'TRANSCRIPTION_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES)
+        )
+    return _cache_instance
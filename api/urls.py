@@ -1,7 +1,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
-    login, register, SessionViewSet, SegmentUpdateView
+    login, register, SessionViewSet, SegmentUpdateView, SegmentAudioView
 )
 
 # Router automático para ViewSets
@@ -18,4 +18,5 @@ urlpatterns = [
 
     # Segment Editing (Granular updates)
     path('segments/<uuid:pk>/', SegmentUpdateView.as_view(), name='segment-update'),
+    path('segments/<uuid:pk>/audio/', SegmentAudioView.as_view(), name='segment-audio'),
 ]
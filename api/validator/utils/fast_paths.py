@@ -0,0 +1,247 @@
+"""
+Deterministic pre-checks that answer some Validator questions without calling the LLM.
+
+Each function returns a confident answer or `None` when it is not sure, in which case the
+Validator falls back to the LLM prompt:
+
+    - detect_language: lexicon-based language ID ('spanish' / 'english').
+    - needs_collation: False when no ATCO turn contains an instruction/clearance keyword.
+    - check_callsign_position: True when a callsign (airline telephony + number, ICAO-style code
+      or registration) is found where the rule places "(distintivo de llamada de la aeronave)".
+
+Only the cheap, unambiguous cases are decided here; mixed language, collation that may be
+required and missing/misplaced callsigns are always left to the LLM.
+"""
+import re
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# --- Language lexicons (callsigns and numbers are not used as evidence) ---
+SPANISH_WORDS = {
+    'autorizado', 'autorizada', 'pista', 'rumbo', 'nivel', 'vuelo', 'ascienda', 'descienda', 'mantenga',
+    'notifique', 'viento', 'nudos', 'grados', 'rodaje', 'ruede', 'rodando', 'punto', 'espera', 'despegue',
+    'despegar', 'aterrizaje', 'aterrizar', 'frecuencia', 'contacte', 'recibido', 'afirmativo', 'negativo',
+    'solicito', 'solicita', 'buenos', 'días', 'dias', 'tardes', 'noches', 'gracias', 'torre', 'aproximación',
+    'aproximacion', 'rodadura', 'salida', 'llegada', 'cruce', 'cruzar', 'mantener', 'después', 'despues',
+    'pies', 'altitud', 'velocidad', 'izquierda', 'derecha', 'directo', 'hacia', 'sobre', 'entre', 'desde',
+    'hasta', 'de', 'la', 'el', 'los', 'las', 'del', 'en', 'para', 'con', 'por', 'al', 'y', 'que', 'uno', 'dos',
+    'tres', 'cuatro', 'cinco', 'seis', 'siete', 'ocho', 'nueve', 'cero', 'mil',
+}
+ENGLISH_WORDS = {
+    'cleared', 'runway', 'heading', 'level', 'flight', 'climb', 'descend', 'maintain', 'report', 'wind',
+    'knots', 'degrees', 'taxi', 'holding', 'point', 'takeoff', 'take', 'off', 'land', 'landing', 'contact',
+    'frequency', 'roger', 'wilco', 'affirm', 'negative', 'request', 'requesting', 'good', 'morning',
+    'afternoon', 'evening', 'thanks', 'thank', 'tower', 'approach', 'ground', 'departure', 'arrival',
+    'cross', 'after', 'feet', 'altitude', 'speed', 'left', 'right', 'direct', 'towards', 'via', 'until',
+    'the', 'to', 'and', 'for', 'with', 'of', 'at', 'on', 'is', 'one', 'two', 'three', 'four', 'five', 'six',
+    'seven', 'eight', 'nine', 'niner', 'zero', 'thousand', 'hundred',
+}
+SPANISH_CHARS = re.compile(r'[ñáéíóú¿¡]')
+WORD = re.compile(r"[a-zñáéíóúü]+")
+
+# --- Instructions that may require a readback ---
+INSTRUCTION_KEYWORDS = re.compile(
+    r'\b('
+    r'pista|runway|rumbo|heading|nivel|level|altitud|altitude|pies|feet|qnh|squawk|transpondedor|transponder|'
+    r'frecuencia|frequency|contacte|contact|ruede|rodar|rodaje|taxi|despegue|despegar|take ?off|aterrice|aterrizar|'
+    r'aterrizaje|land|ascienda|ascender|climb|descienda|descender|descend|velocidad|speed|nudos|knots|autorizado|'
+    r'autorizada|cleared|mantenga|maintain|espera|hold|holding|cruce|cruzar|cross|directo|direct|ruta|route|'
+    r'vire|turn|entre|enter|line ?up|alin[eé]ese|retroceda|push ?back|ils|vor|transici[oó]n|transition'
+    r')\b'
+)
+NUMBER_TOKEN = (
+    r'(?:\d+|uno|dos|tres|cuatro|cinco|seis|siete|ocho|nueve|cero|one|two|three|four|five|six|seven|eight|nine|niner|zero|'
+    r'alfa|alpha|bravo|charlie|delta|echo|eco|foxtrot|golf|hotel|india|juliett|juliet|kilo|lima|mike|november|oscar|'
+    r'papa|quebec|romeo|sierra|tango|uniform|victor|whiskey|x-?ray|yankee|zulu)'
+)
+# ICAO designator + flight number as written by the normalizer ("ibe3032"), and registrations ("ec-abc")
+CODED_CALLSIGN = re.compile(r'\b(?!qnh|fl\d)[a-z]{2,3}\d{1,5}[a-z]{0,2}\b')
+REGISTRATION = re.compile(r'\b[a-z]{1,2}-[a-z]{3,4}\b')
+RULE_NUMBER = re.compile(r'^\d+\.\s*')
+CALLSIGN_PLACEHOLDER = re.compile(r'\((?:distintivo de llamada[^)]*|aircraft call ?sign)\)')
+
+# Airline telephony designators (Airline table, with the legacy dictionaries as fallback).
+# The table is read from synchronous code (`refresh_airlines`, called when the Validator is built
+# or reused): the checks run inside the Validator's async nodes, where the ORM is not allowed.
+AIRLINES_TTL = 300
+_airlines_pattern = None
+_airlines_loaded_at = 0.0
+
+
+def _legacy_airline_names():
+    from ...transcriber.normalize_legacy import airlines_oaci_codes, airlines_iata_codes, airlines_icao_codes
+    names = set(airlines_oaci_codes)
+    names.update(name.lower() for name in airlines_iata_codes.values())
+    names.update(name.lower() for name in airlines_icao_codes.values())
+    return names
+
+
+def _load_airline_names():
+    try:
+        from ...models.models import Airline
+        names = set()
+        for name, callsign in Airline.objects.values_list('name', 'callsign'):
+            names.update(n.lower() for n in (name, callsign) if n)
+        return names
+    except Exception as e:
+        # Without Django/DB (standalone validator)
+        logger.warning(f"Airline table not available ({e!r}), using the legacy airline dictionaries")
+        return _legacy_airline_names()
+
+
+def _compile_airlines(names, fresh=True):
+    global _airlines_pattern, _airlines_loaded_at
+    alternatives = '|'.join(re.escape(name) for name in sorted(names, key=len, reverse=True)) or r'(?!x)x'
+    _airlines_pattern = re.compile(rf'\b(?:{alternatives})(?:\s+{NUMBER_TOKEN}){{1,6}}\b')
+    # A fallback that is not fresh is replaced by the next refresh_airlines()
+    _airlines_loaded_at = time.monotonic() if fresh else 0.0
+    return _airlines_pattern
+
+
+def refresh_airlines(max_age: float = AIRLINES_TTL):
+    """
+    Reloads the airline names from the Airline table if they are older than `max_age` seconds.
+    Must be called from synchronous code (not from inside an event loop).
+    """
+    if not _airlines_loaded_at or time.monotonic() - _airlines_loaded_at > max_age:
+        _compile_airlines(_load_airline_names())
+
+
+def airline_callsign_pattern():
+    """Compiled `<airline> <number/letters>` pattern (never queries the database)."""
+    if _airlines_pattern is None:
+        logger.warning("Airline names not loaded with refresh_airlines(), using the legacy airline dictionaries")
+        return _compile_airlines(_legacy_airline_names(), fresh=False)
+    return _airlines_pattern
+
+
+def detect_language(text):
+    """
+    Lexicon language ID of a phrase.
+
+    Returns:
+        str | None: 'spanish' or 'english' when only one language has evidence (at least two
+                    words, or Spanish-only characters), None when mixed or unknown.
+    """
+    text = text.lower()
+    text = airline_callsign_pattern().sub(' ', text)  # Callsigns do not determine the language
+    words = WORD.findall(text)
+    spanish = sum(1 for w in words if w in SPANISH_WORDS) + (2 if SPANISH_CHARS.search(text) else 0)
+    english = sum(1 for w in words if w in ENGLISH_WORDS)
+
+    if spanish >= 2 and english == 0:
+        return 'spanish'
+    if english >= 2 and spanish == 0:
+        return 'english'
+    return None
+
+
+def needs_collation(conversation):
+    """
+    Args:
+        conversation (list[tuple[str, str]]): (role, message) turns.
+
+    Returns:
+        bool | None: False when no ATCO turn contains an instruction or clearance keyword,
+                     None otherwise (the LLM decides).
+    """
+    atco_turns = [message.lower() for role, message in conversation if 'atco' in role.lower()]
+    if not any(INSTRUCTION_KEYWORDS.search(message) for message in atco_turns):
+        return False
+    return None
+
+
+def _find_callsigns(text):
+    spans = []
+    for pattern in (airline_callsign_pattern(), CODED_CALLSIGN, REGISTRATION):
+        spans.extend((m.start(), m.end()) for m in pattern.finditer(text))
+    return spans
+
+
+SPOKEN_DIGITS = {
+    'cero': '0', 'uno': '1', 'dos': '2', 'tres': '3', 'cuatro': '4', 'cinco': '5', 'seis': '6', 'siete': '7',
+    'ocho': '8', 'nueve': '9', 'zero': '0', 'one': '1', 'two': '2', 'three': '3', 'four': '4', 'five': '5',
+    'six': '6', 'seven': '7', 'eight': '8', 'nine': '9', 'niner': '9',
+}
+
+
+def callsign_key(text):
+    """
+    Comparable key of the first callsign of a phrase: its flight number in digits, so that
+    "iberia tres dos cuatro" and "ibe324" give the same key. None if no callsign is found.
+    """
+    text = text.lower()
+    spans = sorted(_find_callsigns(text))
+    if not spans:
+        return None
+    start, end = spans[0]
+    callsign = text[start:end]
+    digits = ''.join(SPOKEN_DIGITS.get(token, token) for token in re.findall(r'\d+|[a-z]+', callsign)
+                     if token.isdigit() or token in SPOKEN_DIGITS)
+    return digits or ' '.join(callsign.split())
+
+
+def _placeholder_position(rule):
+    """'start' / 'end' if every part of the rule places the callsign there, otherwise None."""
+    positions = set()
+    for part in (RULE_NUMBER.sub('', p.strip()) for p in rule.split('|') if p.strip()):
+        match = CALLSIGN_PLACEHOLDER.search(part)
+        if match is None:
+            continue
+        if match.start() == 0:
+            positions.add('start')
+        elif match.end() == len(part.rstrip(' .')):
+            positions.add('end')
+        else:
+            positions.add('middle')
+    return positions.pop() if len(positions) == 1 and positions != {'middle'} else None
+
+
+def check_callsign_position(text, rule):
+    """
+    Returns:
+        bool | None: True when a callsign is found where the rule requires it, None otherwise
+                     (missing, misplaced or unusual callsigns are left to the LLM).
+    """
+    position = _placeholder_position(rule.lower())
+    if position is None:
+        return None
+
+    text = text.lower().strip(' .,')
+    for start, end in _find_callsigns(text):
+        if position == 'start' and start == 0:
+            return True
+        if position == 'end' and end == len(text):
+            return True
+    return None
+
+
+class FastPathStats:
+    """
+    Counts how many decisions were taken by a fast path and how many needed the LLM.
+    With a `key` (e.g. the phrase) each decision is counted once, even if the node runs again
+    in a supervisor round.
+    """
+
+    def __init__(self):
+        self.counts = {}
+        self._seen = set()
+
+    def record(self, check, fast, key=None):
+        if key is not None:
+            if (check, key) in self._seen:
+                return
+            self._seen.add((check, key))
+        counts = self.counts.setdefault(check, {'fast': 0, 'llm': 0})
+        counts['fast' if fast else 'llm'] += 1
+
+    def summary(self):
+        fast = sum(c['fast'] for c in self.counts.values())
+        total = fast + sum(c['llm'] for c in self.counts.values())
+        return {
+            'checks': {check: dict(counts) for check, counts in self.counts.items()},
+            'llm_calls_avoided': fast,
+            'avoided_fraction': round(fast / total, 3) if total else 0.0,
+        }
@@ -803,6 +803,41 @@ Tu tarea es evaluar una conversación a partir de una lista de errores proporcio
 }
 """
 
+promptScoreAll = """
+Eres un experto en evaluar comunicaciones entre pilotos y controladores aéreos (ATCO).  
+Tu tarea es evaluar una conversación a partir de los errores encontrados y asignar, en una única respuesta, una puntuación del 0 al 5 para cada uno de estos criterios:
+   - mezcla_idiomas: uso consistente de un único idioma durante toda la conversación.
+   - colacion: repeticiones y confirmaciones necesarias. Si la colación no aplica, asigna un 5.
+   - fraseologia: fraseología conforme a las normas. Si la evaluación dice que la frase sigue la fraseología, asigna un 5.
+   - call_signs: uso correcto de los distintivos de llamada.
+   - puntuacion_piloto: calidad de las comunicaciones del piloto.
+   - puntuacion_atco: calidad de las comunicaciones del controlador.
+   - puntuacion_total: media ponderada de todos los criterios anteriores.
+
+### Instrucciones:
+1. Proporciona una breve explicación justificando cada puntuación.
+2. Ten en cuenta los siguientes criterios para puntuar:  
+   - Tolerancia: Errores menores o no críticos no deben reducir significativamente la puntuación.  
+   - Solo reduce drásticamente la puntuación en casos de errores graves que comprometan la claridad o la seguridad de la comunicación.  
+   - 5: Sin errores o errores insignificantes.  
+   - 4-5: Algunos errores menores, pero la comunicación sigue siendo clara.  
+   - 3-4: Errores moderados que podrían causar ligeros malentendidos.  
+   - 2-3: Errores significativos que afectan parcialmente la comunicación.  
+   - 0-1: Uso completamente incorrecto o confuso de la fraseología.
+
+### Formato de salida:
+```json
+{
+  "mezcla_idiomas": {"score": <puntuación>, "explanations": "<breve explicación>"},
+  "colacion": {"score": <puntuación>, "explanations": "<breve explicación>"},
+  "fraseologia": {"score": <puntuación>, "explanations": "<breve explicación>"},
+  "call_signs": {"score": <puntuación>, "explanations": "<breve explicación>"},
+  "puntuacion_piloto": {"score": <puntuación>, "explanations": "<breve explicación>"},
+  "puntuacion_atco": {"score": <puntuación>, "explanations": "<breve explicación>"},
+  "puntuacion_total": {"score": <puntuación>, "explanations": "<breve explicación>"}
+}
+"""
+
 promptScoreLanguage = """
 Eres un experto en evaluar la consistencia del uso de idiomas en comunicaciones aeronáuticas entre pilotos y controladores aéreos (ATCO).  
 Tu tarea es evaluar una conversación a partir de una lista de errores proporcionada y asignar una puntuación del 0 al 5 exclusivamente para la **mezcla de idiomas**.  
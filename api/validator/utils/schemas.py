@@ -0,0 +1,83 @@
+"""
+Response schemas of the Validator prompts.
+
+The JSON schema of each model is sent to Ollama as `format`, so the model is constrained to
+produce a valid object of that shape; the response is then parsed with orjson and validated
+with pydantic. Field names match the JSON examples in `prompts.py`.
+"""
+from functools import lru_cache
+
+import orjson
+from pydantic import BaseModel
+
+
+class LanguageDetection(BaseModel):
+    language: str
+    explanation: str = ''
+
+
+class IdentifiedRule(BaseModel):
+    explanation: str = ''
+    rule: str
+    rule_exists: bool
+
+
+class LanguageCheck(BaseModel):
+    can_mix: bool
+    is_correct: bool
+    explanation: str
+
+
+class NeedCollation(BaseModel):
+    needCollation: bool
+    explanations: str = ''
+
+
+class CallSignCheck(BaseModel):
+    correct_call_sign: bool
+    explanation: str
+    callsign: str = ''
+
+
+class Verdict(BaseModel):
+    """Checks (phraseology, collation) and supervisor reviews."""
+    is_correct: bool
+    explanation: str
+
+
+class Explanation(BaseModel):
+    explanation: str
+
+
+class Score(BaseModel):
+    score: float
+    explanations: str
+
+
+class ScoreAll(BaseModel):
+    mezcla_idiomas: Score
+    colacion: Score
+    fraseologia: Score
+    call_signs: Score
+    puntuacion_piloto: Score
+    puntuacion_atco: Score
+    puntuacion_total: Score
+
+
+@lru_cache(maxsize=None)
+def json_schema(schema: type[BaseModel]) -> dict:
+    """JSON schema sent to Ollama in the `format` field (computed once per model)."""
+    return schema.model_json_schema()
+
+
+def parse(content: str, schema: type[BaseModel]):
+    """
+    Parses a structured response.
+
+    Returns:
+        dict | None: The validated response, or None if it is not valid JSON for the schema.
+    """
+    try:
+        return schema.model_validate(orjson.loads(content)).model_dump()
+    except ValueError:  # orjson.JSONDecodeError and pydantic.ValidationError
+        return None
@@ -1,5 +1,8 @@
 import re, unicodedata, csv
 import numpy as np
+from collections import Counter
+from functools import lru_cache
+from scipy.sparse import csr_matrix
 from sklearn.feature_extraction.text import TfidfVectorizer
 
 def normalize_text(text):
@@ -128,6 +131,108 @@ def calculate_top_similarities(text, text_dict, language, top_n=3):
     return top_texts_original, top_scores_original
 
 
+def _language_variant(language):
+    """Maps the detected language to the rule variant used for matching ('spanish', 'english' or 'mixed')."""
+    return language if language in ('spanish', 'english') else 'mixed'
+
+
+class RuleIndex:
+    """
+    TF-IDF index over the phraseology rules for one language variant.
+
+    The rules are parsed, cleaned and vectorized once. Each query is a single sparse
+    mat-vec against the L2-normalized rule matrix (cosine similarity).
+
+    Unlike `calculate_top_similarities`, the vectorizer is fitted on the rules only. Query
+    words that no rule contains still count in the query norm (with the IDF they would get as
+    a single-document term), so scores stay close to the refit-per-query values and the
+    existing thresholds keep their meaning.
+    """
+
+    def __init__(self, text_dict, language):
+        self.language = _language_variant(language)
+
+        text_values_cleaned = []  # List for cleaned phrases
+        self.rules = []  # List for original phrases
+        for rules in text_dict.values():
+            for rule in rules.values():
+                # Select the appropriate part of the rule based on the language
+                rule_parts = [part.strip() for part in rule.split('|') if part.strip()]
+                if self.language == 'spanish' and len(rule_parts) > 0:
+                    selected_rule = rule_parts[0]  # First part corresponds to Spanish
+                elif self.language == 'english' and len(rule_parts) > 1:
+                    selected_rule = rule_parts[1]  # Second part corresponds to English
+                else:
+                    selected_rule = rule  # Use the entire rule for mixed language or if no match is found
+
+                text_values_cleaned.append(normalize_text(remove_text_between_brackets(selected_rule)))
+                self.rules.append(normalize_text(selected_rule))
+
+        self.vectorizer = TfidfVectorizer()
+        # TfidfVectorizer L2-normalizes each row: dot products are cosine similarities
+        self.matrix = self.vectorizer.fit_transform(text_values_cleaned).tocsr()
+        self.analyzer = self.vectorizer.build_analyzer()
+        self.vocabulary = self.vectorizer.vocabulary_
+        self.idf = self.vectorizer.idf_
+        # Smoothed IDF of a term that only appears in the query (df=1 over n_rules + 1 documents)
+        n_documents = self.matrix.shape[0] + 1
+        self.oov_idf = np.log((1 + n_documents) / 2) + 1
+
+    def _vectorize(self, texts):
+        """TF-IDF query vectors (L2-normalized including out-of-vocabulary words)."""
+        rows, cols, values = [], [], []
+        for row, text in enumerate(texts):
+            counts = Counter(self.analyzer(normalize_text(text)))
+            entries = []
+            norm = 0.0
+            for term, tf in counts.items():
+                col = self.vocabulary.get(term)
+                weight = tf * (self.idf[col] if col is not None else self.oov_idf)
+                norm += weight * weight
+                if col is not None:
+                    entries.append((col, weight))
+            norm = np.sqrt(norm) or 1.0
+            for col, weight in entries:
+                rows.append(row)
+                cols.append(col)
+                values.append(weight / norm)
+        return csr_matrix((values, (rows, cols)), shape=(len(texts), len(self.vocabulary)))
+
+    def scores(self, texts):
+        """Returns the (len(texts), n_rules) similarity matrix."""
+        return (self._vectorize(texts) @ self.matrix.T).toarray()
+
+    def _top(self, scores, top_n, threshold):
+        top_indices = np.argsort(scores)[-top_n:][::-1]
+        top_indices = [i for i in top_indices if scores[i] > threshold]
+        return [self.rules[i] for i in top_indices], [float(scores[i]) for i in top_indices]
+
+    def query(self, text, top_n=3, threshold=0.2):
+        """
+        Returns the most similar rules to `text`.
+
+        Returns:
+            top_texts (list): Most similar original rules, best first.
+            top_scores (list): Corresponding similarity scores (only those above `threshold`).
+        """
+        return self._top(self.scores([text])[0], top_n, threshold)
+
+    def query_batch(self, texts, top_n=3, threshold=0.2):
+        """Same as `query` for several phrases at once (one sparse product for all of them)."""
+        if not texts:
+            return []
+        return [self._top(row, top_n, threshold) for row in self.scores(texts)]
+
+
+def get_rule_index(path, language):
+    """Parses the rules file and builds its `RuleIndex` once per (file, language variant)."""
+    return _build_rule_index(path, _language_variant(language))
+
+@lru_cache(maxsize=None)
+def _build_rule_index(path, variant):
+    return RuleIndex(getRules(path), variant)
+
+
 def prepareTextToTTS(text, language):
     """
     Converts a text into a format suitable for Text-to-Speech (TTS) by replacing digits with their word equivalents
@@ -5,14 +5,19 @@ as 'pilot' and 'ATCO' (air traffic control), evaluate various aspects of the com
 like phraseology and collation, and store the results for further analysis.
 """
 
-import os, json
+import os, json, asyncio, weakref
+from contextvars import ContextVar
 from .utils.utils import *
 from .utils.prompts import *
 from .utils.logger_config import logger
+from .utils import fast_paths
+from .utils import schemas
 from typing import TypedDict
 from langgraph.graph import StateGraph, START, END
 from langchain_core.messages import SystemMessage, HumanMessage
 from langchain_ollama import ChatOllama
+from ..llm_cache import get_llm_cache
+from ..llm_client import get_llm_client
 
 
 class Phrase:
@@ -29,8 +34,10 @@ class Phrase:
         rule (str): The rule of the phraseology associated with the phrase.
         callSignFailure (str): Stores an explanation if there is a callsign failure.
         phraseologyFails (str): Stores the phraseology-related issues with the phrase.
+        phraseologyCorrect (bool): Verdict of the last phraseology check (None if not checked).
         otherPhraseology (bool): Indicates if the phrase does not follow the standard phraseology (True if non-standard, False if standard).
         supervised (dict): Dictionary tracking the supervision state, including a counter for rechecks and an explanation.
+        evaluations (list[str]): Normalized evaluations of the current supervised check, used to detect convergence.
     """
     def __init__(self, speaker: str, text: str):
         """
@@ -45,8 +52,14 @@ class Phrase:
         self.rule = ''
         self.callSignFailure = ''
         self.phraseologyFails = ''
+        self.phraseologyCorrect = None
         self.otherPhraseology = False
+        self.resetSupervision()
+
+    def resetSupervision(self):
+        """Clears the supervision state before the next supervised check."""
         self.supervised = {'counter': 0, 'checkAgain': True, 'explanation': ''}
+        self.evaluations = []
 
     def __str__(self) -> str:
         return f'Speaker: {self.speaker}. Phrase: {self.text}. Rule: {self.rule}. Minor fails: {self.phraseologyFails}. Supervised: {self.supervised}'
@@ -66,6 +79,7 @@ class AgentState(TypedDict):
         language_error (str): A string indicating any language-related errors.
         collation_error (dict): Dictionary tracking the supervision state with a string indicating any collation errors (e.g., missing or incorrect information).
         score (dict): A dictionary storing scores or results related to the validation process.
+        errors_summary (str): Summary of the errors found, used by the scorer.
         next (str): Indicates the next node in the supervisor loop.
     """
     input: list[tuple]
@@ -74,8 +88,57 @@ class AgentState(TypedDict):
     language_error: str
     collation_error: dict
     score: dict
+    errors_summary: str
     next: str
 
+class ValidationMetrics:
+    """
+    LLM usage of a single conversation.
+
+    Attributes:
+        llm_calls (int): Requests sent to the LLM (cache hits included).
+        tokens (int): Tokens reported by the LLM (prompt + completion).
+        supervisor_iterations (dict): Supervisor rounds per supervised node.
+        fast_paths (FastPathStats): Decisions taken by the deterministic pre-checks.
+        stops (dict): Why the supervised re-checks stopped before the supervisor approved them:
+                      'converged' (same evaluation or feedback again), 'oscillation' (an evaluation
+                      seen before came back), 'max_iterations' or 'budget'.
+    """
+    def __init__(self, max_llm_calls: int = 0, max_tokens: int = 0):
+        self.max_llm_calls = max_llm_calls
+        self.max_tokens = max_tokens
+        self.llm_calls = 0
+        self.tokens = 0
+        self.supervisor_iterations = {}
+        self.stops = {'converged': 0, 'oscillation': 0, 'max_iterations': 0, 'budget': 0}
+        self.fast_paths = fast_paths.FastPathStats()
+
+    def record_call(self, response):
+        self.llm_calls += 1
+        usage = getattr(response, 'usage_metadata', None) or {}
+        self.tokens += usage.get('total_tokens', 0)
+
+    def budget_exhausted(self) -> bool:
+        return bool((self.max_llm_calls and self.llm_calls >= self.max_llm_calls) or
+                    (self.max_tokens and self.tokens >= self.max_tokens))
+
+    def to_dict(self) -> dict:
+        return {
+            'llm_calls': self.llm_calls,
+            'tokens': self.tokens,
+            'supervisor_iterations': dict(self.supervisor_iterations),
+            'stops': dict(self.stops),
+            'budget_exhausted': self.budget_exhausted(),
+        }
+
+# Metrics of the conversation being validated (graph nodes run in tasks that inherit the context)
+_metrics: ContextVar[ValidationMetrics] = ContextVar('validation_metrics')
+
+
+def _normalizeEvaluation(text) -> str:
+    return ' '.join(str(text or '').lower().split())
+
+
 class Validator:
     """
     A class responsible for validating various aspects of communication between roles, such as 'pilot' and 'ATCO'.
@@ -106,22 +169,54 @@ class Validator:
         validator.invoke(input_data)
     """
 
-    def __init__(self, model: str, validateOnlyPhraseology: bool = False):
+    def __init__(self, model: str, validateOnlyPhraseology: bool = False, max_concurrency: int = None, scoring_mode: str = None,
+                 structured_output: bool = None, max_supervisor_iterations: int = None, max_llm_calls: int = None,
+                 max_tokens: int = None):
         """
         Initializes the Validator class with a specified model for validation.
 
         Args:
             model (str): The name or identifier of the model to be used for validation. 
             validateOnlyPhraseology (bool): Flag indicating whether to validate only phraseology (default is False).
-        """
-        self.model = ChatOllama(model=model, temperature=0.1)
+            max_concurrency (int): Maximum number of simultaneous requests to Ollama
+                                   (default: VALIDATOR_MAX_CONCURRENCY environment variable or 4).
+            scoring_mode (str): 'concurrent' (one request per score category, sent concurrently) or
+                                'single' (one request returning all the scores in one JSON object).
+                                Default: VALIDATOR_SCORING_MODE environment variable or 'concurrent'.
+            structured_output (bool): Constrain the responses with the JSON schemas of `utils/schemas.py`
+                                      (Ollama >= 0.5). Default: VALIDATOR_STRUCTURED_OUTPUT environment
+                                      variable ('0' disables it) or True.
+            max_supervisor_iterations (int): Supervisor rounds per phrase (and for the collation) before giving up.
+                                             Default: VALIDATOR_MAX_SUPERVISOR_ITERATIONS environment variable or 5.
+            max_llm_calls (int): LLM requests per conversation after which no more supervisor re-checks are started
+                                 (0 = unlimited). Default: VALIDATOR_MAX_LLM_CALLS environment variable or 0.
+            max_tokens (int): Same limit in tokens (0 = unlimited). Default: VALIDATOR_MAX_TOKENS environment variable or 0.
+        """
+        # Respuestas cacheadas por modelo + mensajes (api/llm_cache.py)
+        # Pool, timeouts, reintentos y circuit breaker compartidos con el sanitizador (api/llm_client.py)
+        self.llm_client = get_llm_client()
+        self.model = ChatOllama(
+            model=model, temperature=0.1, cache=get_llm_cache(),
+            base_url=self.llm_client.ollama_base_url, client_kwargs=self.llm_client.ollama_client_kwargs()
+        )
         self.validateOnlyPhraseology = validateOnlyPhraseology
-        self.errors_summary = ""
-        self.result = {}
+        self.max_concurrency = max_concurrency or int(os.getenv('VALIDATOR_MAX_CONCURRENCY', '4'))
+        self._semaphores = weakref.WeakKeyDictionary()  # One semaphore per event loop
+        self.scoring_mode = scoring_mode or os.getenv('VALIDATOR_SCORING_MODE', 'concurrent')
+        if structured_output is None:
+            structured_output = os.getenv('VALIDATOR_STRUCTURED_OUTPUT', '1') != '0'
+        self.structured_output = structured_output
+        self.max_supervisor_iterations = max_supervisor_iterations or int(os.getenv('VALIDATOR_MAX_SUPERVISOR_ITERATIONS', '5'))
+        self.max_llm_calls = max_llm_calls if max_llm_calls is not None else int(os.getenv('VALIDATOR_MAX_LLM_CALLS', '0'))
+        self.max_tokens = max_tokens if max_tokens is not None else int(os.getenv('VALIDATOR_MAX_TOKENS', '0'))
+
+        # Airline names for the callsign fast paths (read here: the async nodes cannot use the ORM)
+        fast_paths.refresh_airlines()
 
         # Load phraseology
         current_dir = os.path.dirname(os.path.abspath(__file__))
-        self.rules = getRules(os.path.join(current_dir, 'utils', 'phraseology.md'))
+        self.rules_path = os.path.join(current_dir, 'utils', 'phraseology.md')
+        self.rules = getRules(self.rules_path)
 
         # Add nodes
         builder = StateGraph(AgentState)
@@ -134,9 +229,11 @@ class Validator:
         builder.add_node('check_other_phraseology', self.__checkOtherPhraseology)
         builder.add_node('scorer', self.__scorer)
 
+        # Rule identification and the language check are independent: run them in parallel
+        # and wait for both before the supervised checks
         builder.add_edge(START, 'identify_rule')
-        builder.add_edge('identify_rule', 'check_language')
-        builder.add_edge('check_language', 'check_collation')
+        builder.add_edge(START, 'check_language')
+        builder.add_edge(['identify_rule', 'check_language'], 'check_collation')
 
         self.need_supervisor = ['check_collation', 'check_callsign', 'check_phraseology']
         conditional_map = {k: k for k in self.need_supervisor}
@@ -203,6 +300,49 @@ class Validator:
 
         return cleanedResponse
 
+    def __semaphore(self):
+        """Returns the concurrency limiter of the running event loop."""
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        return semaphore
+
+    async def __invoke(self, messages: list, schema=None):
+        """
+        Sends a request to the LLM without blocking the event loop, constrained to the JSON schema
+        of `schema` when structured output is enabled. At most `max_concurrency` requests are in
+        flight at the same time. Transient failures are retried with jittered backoff and a failing
+        Ollama opens the shared circuit breaker (see `api/llm_client.py`).
+        """
+        kwargs = {'format': schemas.json_schema(schema)} if self.structured_output and schema is not None else {}
+
+        async def request():
+            async with self.__semaphore():
+                return await self.model.ainvoke(messages, **kwargs)
+
+        response = await self.llm_client.call('ollama', request)
+        metrics = _metrics.get(None)
+        if metrics is not None:
+            metrics.record_call(response)
+        return response
+
+    async def __ask(self, messages: list, schema=None):
+        """
+        Sends a request to the LLM and parses its JSON output.
+
+        Structured responses are parsed and validated directly; the regex repair of `__cleanOutput`
+        is only used as a fallback (structured output disabled or an invalid response).
+        """
+        response = await self.__invoke(messages, schema)
+        if self.structured_output and schema is not None:
+            parsed = schemas.parse(response.content, schema)
+            if parsed is not None:
+                logger.debug(f'Response: {parsed}')
+                return parsed
+            logger.warning(f'Response does not match {schema.__name__}, repairing it: {response.content}')
+        return self.__cleanOutput(response)
+
     def __normalizeRule(self, rule_text: str):
         """Normalizes the rule text by removing extra spaces, converting to lowercase, removing all symbols,
         removing accents, and reducing internal whitespace to single spaces. This helps ensure consistent comparisons between
@@ -229,7 +369,7 @@ class Validator:
         return re.sub(r'\s+', ' ', cleaned_text.strip())
 
 
-    def __identifyRule(self, state: AgentState):
+    async def __identifyRule(self, state: AgentState):
         """
         Identifies the rule associated with the conversation phrases based on the phraseology.
 
@@ -241,22 +381,34 @@ class Validator:
         logger.info('Identifying rules')
         state['phrases'] = [Phrase(speaker=entry[0], text=entry[1]) for entry in state['input']]
 
-        for phrase in state['phrases']:
+        # Identify language of each phrase: lexicon first, the LLM (concurrently) only when uncertain
+        languages = [fast_paths.detect_language(phrase.text) for phrase in state['phrases']]
+        uncertain = [i for i, language in enumerate(languages) if language is None]
+        for i, language in enumerate(languages):
+            _metrics.get().fast_paths.record('language', language is not None, key=i)
+
+        responses = await asyncio.gather(*(
+            self.__ask([HumanMessage(content=f"{prompt_language_detection}\n {state['phrases'][i].text}")], schemas.LanguageDetection)
+            for i in uncertain
+        ))
+        for i, response in zip(uncertain, responses):
+            languages[i] = response.get('language', '')
+
+        # Calculate top similarities rules: one batched query per language variant
+        top_similarities = [None] * len(state['phrases'])
+        for language in set(languages):
+            indices = [i for i, lang in enumerate(languages) if lang == language]
+            results = get_rule_index(self.rules_path, language).query_batch([state['phrases'][i].text for i in indices])
+            for i, result in zip(indices, results):
+                top_similarities[i] = result
+
+        async def selectRule(phrase, top_rules, top_scores):
             logger.debug(f'Phrase: {phrase.text}')
 
-            # Identify language of the phrase
-            response = self.model.invoke([HumanMessage(content=f'{prompt_language_detection}\n {phrase.text}')])
-            response = self.__cleanOutput(response)
-            language = response.get('language', '')
-
-            # Calculate top similarities rules
-            top_rules, _ = calculate_top_similarities(phrase.text, self.rules, language)
-            
             if len(top_rules) > 0:
                 # Select the most similar rule with the LLM
                 prompt = f'INSTRUCCIONES:\n {promptIdentifyFilteredRules}\n {phrase.text}\nFRASEOLOGÍA:\n {top_rules}'
-                response = self.model.invoke([SystemMessage(content=context), HumanMessage(content=prompt)])
-                response = self.__cleanOutput(response)
+                response = await self.__ask([SystemMessage(content=context), HumanMessage(content=prompt)], schemas.IdentifiedRule)
                 rule = response.get('rule', '')
 
                 # Normalize the rule and the top rules for comparison
@@ -264,11 +416,10 @@ class Validator:
                 normalized_top_rules = [self.__normalizeRule(top_rule) for top_rule in top_rules]
 
                 if response.get('rule_exists') == False or normalized_rule not in normalized_top_rules:
-                    # Rule does not exist or is not in the top rules
-                    top_rule, score = calculate_top_similarities(phrase.text, self.rules, language, top_n=1)
-                    if score[0] > 0.60:
-                        logger.debug(f"Top rule: {top_rule[0]} with score: {score[0]}")
-                        phrase.rule = top_rule[0]
+                    # Rule does not exist or is not in the top rules: fall back to the best TF-IDF match
+                    if top_scores[0] > 0.60:
+                        logger.debug(f"Top rule: {top_rules[0]} with score: {top_scores[0]}")
+                        phrase.rule = top_rules[0]
                     else:
                         phrase.otherPhraseology = True
                 else:          
@@ -281,10 +432,15 @@ class Validator:
 
             if phrase.otherPhraseology == True:
                 phrase.rule = 'No se ha encontrado ninguna regla en la fraseología que coincida con la frase'
+
+        await asyncio.gather(*(
+            selectRule(phrase, top_rules, top_scores)
+            for phrase, (top_rules, top_scores) in zip(state['phrases'], top_similarities)
+        ))
         
         return {'phrases': state['phrases']}
 
-    def __checkLanguage(self, state: AgentState):
+    async def __checkLanguage(self, state: AgentState):
         """
         Checks the language usage in the conversation data to ensure that the communication follows the correct language rules.
 
@@ -298,14 +454,13 @@ class Validator:
 
         prompt = f'INSTRUCCIONES:\n{promptCheckLanguage}\n Conversacion: {conversation}'
 
-        response = self.model.invoke([SystemMessage(content=context), HumanMessage(content=prompt)])
-        response = self.__cleanOutput(response)
+        response = await self.__ask([SystemMessage(content=context), HumanMessage(content=prompt)], schemas.LanguageCheck)
         if response.get('can_mix') == False and response.get('is_correct') == False:
             return {'language_error': response.get('explanation')}
 
         return {'language_error': 'El uso del lenguaje es correcto'}   
     
-    def __checkCollation(self, state: AgentState):
+    async def __checkCollation(self, state: AgentState):
         """
         Checks the collation of the conversation data to ensure it adheres to the expected rules.
 
@@ -320,27 +475,29 @@ class Validator:
 
         if collation_state['counter'] > 0:
             prompt = f"INSTRUCCIONES:\n{promptCheckAgainCollation}\n Conversacion: {conversation}\n Evaluación anterior: {collation_state['explanation']}\nEvaluación del supervisor: {collation_state['supervisor_explanation']}"
-            response = self.model.invoke([SystemMessage(content=context), HumanMessage(content=prompt)])
-            response = self.__cleanOutput(response)
+            response = await self.__ask([SystemMessage(content=context), HumanMessage(content=prompt)], schemas.Verdict)
             collation_state['explanation'] = response.get('explanation')
 
             return {'collation_error': collation_state, 'next': 'check_collation'}
 
-        prompt = f'\nINSTRUCCIONES:\n {promptNeedCollation}\n {conversation}'
-        response = self.model.invoke([SystemMessage(content=context), HumanMessage(content=prompt)])
-        response = self.__cleanOutput(response)
+        # Without ATCO instructions there is nothing to read back
+        needCollation = fast_paths.needs_collation(state['input'])
+        _metrics.get().fast_paths.record('collation', needCollation is not None, key='conversation')
+        if needCollation is None:
+            prompt = f'\nINSTRUCCIONES:\n {promptNeedCollation}\n {conversation}'
+            response = await self.__ask([SystemMessage(content=context), HumanMessage(content=prompt)], schemas.NeedCollation)
+            needCollation = response.get('needCollation')
 
-        if response.get('needCollation') == True:
+        if needCollation == True:
             prompt = f'\nINSTRUCCIONES:\n {promptCheckCollation}\n {conversation}'
-            response = self.model.invoke([SystemMessage(content=context), HumanMessage(content=prompt)])
-            response = self.__cleanOutput(response)
+            response = await self.__ask([SystemMessage(content=context), HumanMessage(content=prompt)], schemas.Verdict)
             collation_state['explanation'] = response.get('explanation')
 
             return {'collation_error': collation_state, 'next': 'check_collation'}
         
         return {'collation_error': {'explanation': 'No aplica'}, 'next': 'check_collation'}
 
-    def __checkCallSign(self, state: AgentState):
+    async def __checkCallSign(self, state: AgentState):
         """
         Checks the consistency of call signs in the conversation data.
 
@@ -351,28 +508,39 @@ class Validator:
         """
         logger.info('Checking call sign')
 
+        pending = []  # (phrase, prompt)
         for phrase in state['phrases']:
             if 'distintivo de llamada' in phrase.rule or 'call sign' in phrase.rule:
                 if phrase.supervised['counter'] == 0:
+                    # Callsign found where the rule requires it: correct, no LLM check or supervision needed
+                    found = fast_paths.check_callsign_position(phrase.text, phrase.rule)
+                    _metrics.get().fast_paths.record('callsign', found is not None, key=id(phrase))
+                    if found:
+                        phrase.callSignFailure = 'Correcto'
+                        phrase.supervised['checkAgain'] = False
+                        continue
                     prompt = f'INSTRUCCIONES:\n{promptCheckCallSign}\n Regla: {phrase.rule}\n Frase: {phrase.text}'
                 elif phrase.supervised['checkAgain'] == True:
                     prompt = f"INSTRUCCIONES:\n{promptCheckAgainCallSign}\n Regla: {phrase.rule}\n Frase: {phrase.text}\nEvaluación anterior: {phrase.callSignFailure}\nEvaluación del supervisor: {phrase.supervised['explanation']}"
                 else:
                     continue
                 logger.debug(f'Text: {phrase.text}. Rule: {phrase.rule}')
-                response = self.model.invoke([SystemMessage(content=context), HumanMessage(content=prompt)])
-                response = self.__cleanOutput(response)
-
-                if response.get('correct_call_sign') == False:
-                    phrase.callSignFailure = response.get('explanation')
-                else:
-                    phrase.callSignFailure = 'Correcto'
+                pending.append((phrase, prompt))
             elif phrase.otherPhraseology == False:
                 phrase.callSignFailure = 'No requiere call sign'
 
+        responses = await asyncio.gather(*(
+            self.__ask([SystemMessage(content=context), HumanMessage(content=prompt)], schemas.CallSignCheck) for _, prompt in pending
+        ))
+        for (phrase, _), response in zip(pending, responses):
+            if response.get('correct_call_sign') == False:
+                phrase.callSignFailure = response.get('explanation')
+            else:
+                phrase.callSignFailure = 'Correcto'
+
         return {'phrases': state['phrases'], 'next': 'check_callsign'}  
 
-    def __checkPhraseology(self, state: AgentState):
+    async def __checkPhraseology(self, state: AgentState):
         """
         Checks if each phrase in the conversation follows the standard phraseology rules.
 
@@ -383,6 +551,7 @@ class Validator:
         """
         logger.info('Checking phraseology')
 
+        pending = []  # (phrase, prompt)
         for phrase in state['phrases']:
             if phrase.otherPhraseology == False:
                 if phrase.supervised['counter'] == 0:
@@ -393,13 +562,18 @@ class Validator:
                     continue
 
                 logger.debug(f'Text: {phrase.text}. Rule: {phrase.rule}')
-                response = self.model.invoke([SystemMessage(content=context), HumanMessage(content=prompt)])
-                response = self.__cleanOutput(response)
-                phrase.phraseologyFails = response.get('explanation')
+                pending.append((phrase, prompt))
+
+        responses = await asyncio.gather(*(
+            self.__ask([SystemMessage(content=context), HumanMessage(content=prompt)], schemas.Verdict) for _, prompt in pending
+        ))
+        for (phrase, _), response in zip(pending, responses):
+            phrase.phraseologyFails = response.get('explanation')
+            phrase.phraseologyCorrect = response.get('is_correct')
 
         return {'phrases': state['phrases'], 'next': 'check_phraseology'}
 
-    def __supervisor(self, state: AgentState):
+    async def __supervisor(self, state: AgentState):
         """
         Supervises the validation results from the self.need_supervisors nodes, ensuring that evaluations from the llm are correct.
         If an evaluation is marked as incorrect, it provides feedback and flag it for re-evaluation.
@@ -407,69 +581,140 @@ class Validator:
         """
         logger.info('Supervising')
         checkAgain = False
+        metrics = _metrics.get()
+        metrics.supervisor_iterations[state['next']] = metrics.supervisor_iterations.get(state['next'], 0) + 1
 
         if state['next'] == 'check_phraseology':
+            pending = []  # (phrase, evaluation, prompt)
             for phrase in state['phrases']:
                 if phrase.otherPhraseology == False and phrase.supervised['checkAgain'] == True:
                     prompt = f'INSTRUCCIONES:\n{promptSupervisorPhraseology}\n Regla: {phrase.rule}\n Conversacion: {phrase.text}\n Evaluacion del llm: {phrase.phraseologyFails}'
                     logger.debug(f'Text: {phrase.text}. Rule: {phrase.rule}. Evaluacion anterior: {phrase.phraseologyFails}')
-                    response = self.model.invoke([SystemMessage(content=context), HumanMessage(content=prompt)])
-                    response = self.__cleanOutput(response)
-
-                    phrase.supervised['counter'] += 1
-                    phrase.supervised['explanation'] = response.get('explanation')
+                    pending.append((phrase, phrase.phraseologyFails, prompt))
 
-                    if response.get('is_correct') == False and phrase.supervised['counter'] < 5:
-                        checkAgain = True
-                        phrase.supervised['checkAgain'] = True
-                    else:
-                        phrase.supervised['checkAgain'] = False
+            if await self.__supervisePhrases(pending):
+                checkAgain = True
 
             if checkAgain == False:
                 for phrase in state['phrases']:
-                    phrase.supervised = {'counter': 0, 'checkAgain': True, 'explanation': ''}
+                    phrase.resetSupervision()
             return {'checkAgain': checkAgain, 'phrases': state['phrases']}
 
         elif state['next'] == 'check_callsign':
+            pending = []  # (phrase, evaluation, prompt)
             for phrase in state['phrases']:
                 if ('distintivo de llamada' in phrase.rule or 'call sign' in phrase.rule) and phrase.supervised['checkAgain'] == True:
                     prompt = f'INSTRUCCIONES:\n{promptSuperviseCallSign}\n Regla: {phrase.rule}\n Frase: {phrase.text}\n Evaluacion del llm: {phrase.callSignFailure}'
                     logger.debug(f'Text: {phrase.text}. Rule: {phrase.rule}. Evaluacion anterior: {phrase.callSignFailure}')
-                    response = self.model.invoke([SystemMessage(content=context), HumanMessage(content=prompt)])
-                    response = self.__cleanOutput(response)
-
-                    phrase.supervised['counter'] += 1
-                    phrase.supervised['explanation'] = response.get('explanation')
+                    pending.append((phrase, phrase.callSignFailure, prompt))
 
-                    if response.get('is_correct') == False and phrase.supervised['counter'] < 5:
-                        checkAgain = True
-                        phrase.supervised['checkAgain'] = True
-                    else:
-                        phrase.supervised['checkAgain'] = False
+            if await self.__supervisePhrases(pending):
+                checkAgain = True
 
             if checkAgain == False:
                 for phrase in state['phrases']:
-                    phrase.supervised = {'counter': 0, 'checkAgain': True, 'explanation': ''}            
+                    phrase.resetSupervision()            
             return {'checkAgain': checkAgain, 'phrases': state['phrases']}
         
         elif state['next'] == 'check_collation':
             collation_state = state['collation_error']
-            if collation_state['explanation'] != 'No aplica':
+            history = collation_state.setdefault('history', [])
+            stop = self.__convergence(history, collation_state['explanation'])
+            if collation_state['explanation'] != 'No aplica' and stop is None:
                 conversation = "\n".join([f"{role.upper()}: {message}" for role, message in state['input']])
                 logger.debug(f"Conversacion: {conversation}.\nEvaluacion del llm: {collation_state['explanation']}")
 
                 prompt = f"\nINSTRUCCIONES:\n {promptSuperviseCollation}\n Conversación: {conversation} Evaluacion del llm: {collation_state['explanation']}"
-                response = self.model.invoke([SystemMessage(content=context), HumanMessage(content=prompt)])
-                response = self.__cleanOutput(response)
+                response = await self.__ask([SystemMessage(content=context), HumanMessage(content=prompt)], schemas.Verdict)
                 
                 collation_state['counter'] += 1
-                if response.get('is_correct') == False and collation_state['counter'] < 5:
-                    checkAgain = True
+                if response.get('is_correct') == False:
+                    stop = self.__stopReason(collation_state['counter'], collation_state.get('supervisor_explanation'), response.get('explanation'))
+                    if stop is None:
+                        checkAgain = True
                     collation_state['supervisor_explanation'] = response.get('explanation')
+            if stop is not None:
+                metrics.stops[stop] += 1
+                logger.debug(f'Collation supervision stopped: {stop}')
             return {'checkAgain': checkAgain, 'collation_error': collation_state}
 
         return {'checkAgain': checkAgain}
 
+    async def __supervisePhrases(self, pending: list):
+        """
+        Sends the supervisor prompts of several phrases concurrently and updates their supervision state.
+        Phrases whose re-check converged are not sent to the supervisor again.
+
+        Args:
+            pending (list[tuple[Phrase, str, str]]): (phrase, evaluation under review, supervisor prompt).
+
+        Returns:
+            bool: True if any phrase has to be checked again.
+        """
+        metrics = _metrics.get()
+        supervised = []
+        for phrase, evaluation, prompt in pending:
+            stop = self.__convergence(phrase.evaluations, evaluation)
+            if stop is None:
+                supervised.append((phrase, prompt))
+            else:
+                metrics.stops[stop] += 1
+                phrase.supervised['checkAgain'] = False
+                logger.debug(f'Supervision of "{phrase.text}" stopped: {stop}')
+
+        responses = await asyncio.gather(*(
+            self.__ask([SystemMessage(content=context), HumanMessage(content=prompt)], schemas.Verdict) for _, prompt in supervised
+        ))
+
+        checkAgain = False
+        for (phrase, _), response in zip(supervised, responses):
+            phrase.supervised['counter'] += 1
+            previous_explanation = phrase.supervised['explanation']
+            phrase.supervised['explanation'] = response.get('explanation')
+            phrase.supervised['checkAgain'] = False
+
+            if response.get('is_correct') == False:
+                stop = self.__stopReason(phrase.supervised['counter'], previous_explanation, response.get('explanation'))
+                if stop is None:
+                    checkAgain = True
+                    phrase.supervised['checkAgain'] = True
+                else:
+                    metrics.stops[stop] += 1
+        return checkAgain
+
+    def __convergence(self, history: list, evaluation):
+        """
+        Records the evaluation under review and checks whether the re-checks stopped making progress.
+
+        Returns:
+            str | None: 'converged' if the re-check repeated the previous evaluation, 'oscillation'
+                        if it came back to an older one, None otherwise.
+        """
+        evaluation = _normalizeEvaluation(evaluation)
+        stop = None
+        if history and evaluation == history[-1]:
+            stop = 'converged'
+        elif evaluation in history:
+            stop = 'oscillation'
+        history.append(evaluation)
+        return stop
+
+    def __stopReason(self, counter: int, previous_feedback, feedback):
+        """
+        Decides whether a rejected evaluation may be checked again.
+
+        Returns:
+            str | None: Why the re-checks stop ('max_iterations', 'budget' or 'converged' when the
+                        supervisor repeats the same feedback), None to check again.
+        """
+        if counter >= self.max_supervisor_iterations:
+            return 'max_iterations'
+        if _metrics.get().budget_exhausted():
+            return 'budget'
+        if previous_feedback and _normalizeEvaluation(previous_feedback) == _normalizeEvaluation(feedback):
+            return 'converged'
+        return None
+
     def __shouldContinue(self, state: AgentState):
         """
         Evaluates whether the validation process should proceed based on the current state of the conversation.
@@ -489,7 +734,7 @@ class Validator:
             next_index = self.need_supervisor.index(state['next']) + 1
             return self.need_supervisor[next_index]
 
-    def __checkOtherPhraseology(self, state: AgentState):
+    async def __checkOtherPhraseology(self, state: AgentState):
         """
         Evaluates phrases that do not conform to the standard phraseology.
 
@@ -500,17 +745,17 @@ class Validator:
         logger.info('Checking other phraseology')
         conversation = "\n".join([f"{role.upper()}: {message}" for role, message in state['input']])
 
-        for phrase in state['phrases']:
-            if phrase.otherPhraseology == True:
-                prompt = f'INSTRUCCIONES:\n{promptCheckOtherPhraseology}\n Frase: {phrase.text} Conversacion entera: {conversation}'
-                logger.debug(f'Text: {phrase.text}.')
-                response = self.model.invoke([SystemMessage(content=context), HumanMessage(content=prompt)])
-                response = self.__cleanOutput(response)
-                phrase.phraseologyFails = response.get('explanation')
+        others = [phrase for phrase in state['phrases'] if phrase.otherPhraseology == True]
+        responses = await asyncio.gather(*(
+            self.__ask([SystemMessage(content=context), HumanMessage(content=f'INSTRUCCIONES:\n{promptCheckOtherPhraseology}\n Frase: {phrase.text} Conversacion entera: {conversation}')], schemas.Explanation)
+            for phrase in others
+        ))
+        for phrase, response in zip(others, responses):
+            phrase.phraseologyFails = response.get('explanation')
 
         return {'phrases': state['phrases']}
 
-    def __scorer(self, state: AgentState):
+    async def __scorer(self, state: AgentState):
         """
         Evaluates the errors in the conversation and assigns a score based on the validation results.
 
@@ -521,91 +766,135 @@ class Validator:
         """
         logger.info('Putting score')
         logger.debug(state)
-        self.errors_summary = ''
+        errors_summary = ''
         
         # Evaluación de los errores de lenguaje
         if state.get('language_error'):
-            self.errors_summary += f"- Mezcla de idiomas: {state['language_error']}\n"
+            errors_summary += f"- Mezcla de idiomas: {state['language_error']}\n"
 
         # Evaluación de errores de colación
         if state.get('collation_error').get('explanation'):
-            self.errors_summary += f"- Colación: {state['collation_error']['explanation']}\n"
+            errors_summary += f"- Colación: {state['collation_error']['explanation']}\n"
 
         # Evaluación de las frases revisadas
         for phrase in state['phrases']:
-            self.errors_summary += f"\nFrase: \"{phrase.text}\" (de {phrase.speaker})\n"
-            self.errors_summary += f"  Regla aplicada: {phrase.rule}\n"
+            errors_summary += f"\nFrase: \"{phrase.text}\" (de {phrase.speaker})\n"
+            errors_summary += f"  Regla aplicada: {phrase.rule}\n"
             if phrase.callSignFailure:
-                self.errors_summary += f" Callsign: {phrase.callSignFailure}\n"
+                errors_summary += f" Callsign: {phrase.callSignFailure}\n"
             if phrase.otherPhraseology == True:
-                self.errors_summary += f"  Fraseologia: Evaluación del llm: {phrase.phraseologyFails}\n"
+                errors_summary += f"  Fraseologia: Evaluación del llm: {phrase.phraseologyFails}\n"
             else:
-                self.errors_summary += f"  Fraseologia: {phrase.phraseologyFails}\n"
+                errors_summary += f"  Fraseologia: {phrase.phraseologyFails}\n"
             
         conversation = "\n".join([f"{role.upper()}: {message}" for role, message in state['input']])
-        scores = {}
-
-        prompt = f"iNSTRUCCIONES:\n{promptScoreLanguage}\nConversacion:{conversation}\nErrores encontrados:\n{state['language_error']}"
-        response = self.model.invoke([SystemMessage(content=context), HumanMessage(content=prompt)])
-        scores['mezcla_idiomas'] = self.__cleanOutput(response)
 
-        prompt = f"iNSTRUCCIONES:\n{promptScoreCollation}\nConversacion:{conversation}\nErrores encontrados:\n{state['collation_error']['explanation']}"
-        response = self.model.invoke([SystemMessage(content=context), HumanMessage(content=prompt)])
-        scores['colacion'] = self.__cleanOutput(response)
-        
+        # The seven score prompts only share the errors summary: they are independent requests
+        prompts = {
+            'mezcla_idiomas': f"iNSTRUCCIONES:\n{promptScoreLanguage}\nConversacion:{conversation}\nErrores encontrados:\n{state['language_error']}",
+            'colacion': f"iNSTRUCCIONES:\n{promptScoreCollation}\nConversacion:{conversation}\nErrores encontrados:\n{state['collation_error']['explanation']}",
+        }
         for category, prompt in [('fraseologia', promptScorePhraseology), ('call_signs', promptScoreCallsigns), ('puntuacion_piloto', promptScorePilot), ('puntuacion_atco', promptScoreAtco), ('puntuacion_total', promptScoreTotal)]:
-            prompt = f"iNSTRUCCIONES:\n{prompt}\nConversacion:{conversation}\nLista de errores encontrados:\n{self.errors_summary}"
-            response = self.model.invoke([SystemMessage(content=context), HumanMessage(content=prompt)])
-            scores[category] = self.__cleanOutput(response)
+            prompts[category] = f"iNSTRUCCIONES:\n{prompt}\nConversacion:{conversation}\nLista de errores encontrados:\n{errors_summary}"
+
+        scores = {}
+        if self.scoring_mode == 'single':
+            scores = await self.__scoreAll(conversation, errors_summary, state)
+
+        # Concurrent mode, or categories missing from the single response
+        missing = [category for category in prompts if category not in scores]
+        responses = await asyncio.gather(*(
+            self.__ask([SystemMessage(content=context), HumanMessage(content=prompts[category])], schemas.Score) for category in missing
+        ))
+        scores.update(zip(missing, responses))
+        scores = {category: scores[category] for category in prompts}
 
         #TODO Añadir valoracion de gravedad de los errores
-        return {'score': scores}
+        return {'score': scores, 'errors_summary': errors_summary}
+
+    async def __scoreAll(self, conversation: str, errors_summary: str, state: AgentState):
+        """
+        Requests all the scores in a single structured call.
+
+        Returns:
+            dict: {category: {'score', 'explanations'}} with the categories that could be parsed.
+        """
+        prompt = (
+            f"iNSTRUCCIONES:\n{promptScoreAll}\nConversacion:{conversation}\n"
+            f"Errores de idioma:\n{state['language_error']}\n"
+            f"Errores de colación:\n{state['collation_error']['explanation']}\n"
+            f"Lista de errores encontrados:\n{errors_summary}"
+        )
+        response = await self.__invoke([SystemMessage(content=context), HumanMessage(content=prompt)], schemas.ScoreAll)
+        content = response.content
+        if self.structured_output:
+            parsed = schemas.parse(content, schemas.ScoreAll)
+            if parsed is not None:
+                return parsed
+
+        # The response is a nested object: parse from the first '{' to the last '}'
+        try:
+            parsed = json.loads(content[content.index('{'):content.rindex('}') + 1])
+        except ValueError as e:
+            logger.warning(f"Could not parse the combined score response, falling back to one request per category: {e}")
+            return {}
 
-    def serialize_result(self):
+        return {category: value for category, value in parsed.items() if isinstance(value, dict) and 'score' in value}
+
+    def serialize_result(self, result: dict):
         """
         Serializa el resultado del validador para que sea compatible con JSON.
-        
+
         Convierte los objetos Phrase y otros datos no serializables a diccionarios
         y tipos de datos básicos que son serializables a JSON.
-        
+
+        Args:
+            result (dict): Estado final del grafo de una conversación (ver `ainvoke`).
+
         Returns:
             dict: Versión serializable del resultado de la validación
         """
         serialized = {}
-        
+
         # Serializar los atributos generales
-        if 'language_error' in self.result:
-            serialized['language_error'] = self.result['language_error']
-        
-        if 'collation_error' in self.result:
+        if 'language_error' in result:
+            serialized['language_error'] = result['language_error']
+
+        if 'collation_error' in result:
             serialized['collation_error'] = {
-                'explanation': self.result['collation_error'].get('explanation', ''),
-                'counter': self.result['collation_error'].get('counter', 0),
-                'supervisor_explanation': self.result['collation_error'].get('supervisor_explanation', '')
+                'explanation': result['collation_error'].get('explanation', ''),
+                'counter': result['collation_error'].get('counter', 0),
+                'supervisor_explanation': result['collation_error'].get('supervisor_explanation', '')
             }
-        
+
         # Serializar las frases
-        if 'phrases' in self.result:
+        if 'phrases' in result:
             serialized['phrases'] = []
-            for phrase in self.result['phrases']:
+            for phrase in result['phrases']:
                 serialized_phrase = {
                     'speaker': phrase.speaker,
                     'text': phrase.text,
                     'rule': phrase.rule,
                     'callSignFailure': phrase.callSignFailure,
                     'phraseologyFails': phrase.phraseologyFails,
+                    'phraseologyCorrect': phrase.phraseologyCorrect,
                     'otherPhraseology': phrase.otherPhraseology,
                     'supervised': phrase.supervised
                 }
                 serialized['phrases'].append(serialized_phrase)
-        
+
         # Serializar las puntuaciones
-        if 'score' in self.result:
-            serialized['score'] = self.result['score']
-        
+        if 'score' in result:
+            serialized['score'] = result['score']
+
         # Incluir el resumen de errores
-        serialized['errors_summary'] = self.errors_summary
-        
+        serialized['errors_summary'] = result.get('errors_summary', '')
+
+        # Uso del LLM en esta conversación y decisiones tomadas sin LLM
+        if 'metrics' in result:
+            serialized['metrics'] = result['metrics'].to_dict()
+            serialized['fast_paths'] = result['metrics'].fast_paths.summary()
+
         return serialized
 
     def invoke(self, input: list[tuple[str, str]]):
@@ -626,17 +915,53 @@ class Validator:
         Returns:
             - If `validateOnlyPhraseology` is `False`, returns a serialized version of the validation result.
             - If `validateOnlyPhraseology` is `True`, returns the result of the phraseology check as a list of phrases and their phraseology status.
+
+        Runs on the shared background event loop of `llm_client`: the Ollama/httpx clients are bound
+        to the loop they were first used on, so a reused Validator cannot start a new loop per call.
+        """
+        return self.llm_client.run(self.ainvoke(input))
+
+    async def ainvoke(self, input: list[tuple[str, str]]):
+        """
+        Async version of `invoke`: runs the graph on the current event loop.
+        The LLM calls of independent phrases and branches are sent concurrently.
+
+        All the state of a validation lives in the graph state and the metrics context, so the same
+        Validator can validate several conversations concurrently (see `validate_many`).
         """
         input = [(role.lower(), phrase.lower()) for role, phrase in input]
-        self.result = self.graph.invoke({'input': input, 'collation_error': {'counter': 0, 'explanation': '', 'supervisor_explanation': ''}}, {'recursion_limit': 40})
+        metrics = ValidationMetrics(self.max_llm_calls, self.max_tokens)
+        token = _metrics.set(metrics)
+        try:
+            # Each supervised node runs at most `max_supervisor_iterations` check + supervisor rounds
+            recursion_limit = 2 * len(self.need_supervisor) * (self.max_supervisor_iterations + 1) + 10
+            result = await self.graph.ainvoke({'input': input, 'collation_error': {'counter': 0, 'explanation': '', 'supervisor_explanation': ''}}, {'recursion_limit': recursion_limit})
+        finally:
+            _metrics.reset(token)
+        result['metrics'] = metrics
+
+        logger.info(f"LLM usage: {metrics.llm_calls} calls, {metrics.tokens} tokens, supervisor iterations {metrics.supervisor_iterations}, stops {metrics.stops}")
+        summary = metrics.fast_paths.summary()
+        logger.info(f"Fast paths: {summary['llm_calls_avoided']} LLM calls avoided ({summary['avoided_fraction']:.0%} of the pre-checked decisions)")
 
         if self.validateOnlyPhraseology == False:
-            self.saveToFile()
-            return self.serialize_result()
+            self.saveToFile(result)
+            return self.serialize_result(result)
         else:
-            return self.followPhraseology()
+            return self.followPhraseology(result)
+
+    async def validate_many(self, conversations: list[list[tuple[str, str]]]):
+        """
+        Validates several conversations concurrently. The LLM requests of all of them share the
+        `max_concurrency` limit.
+
+        Returns:
+            list: The result of `ainvoke` for each conversation, in the same order. A conversation that
+                  fails returns its exception instead of stopping the others.
+        """
+        return await asyncio.gather(*(self.ainvoke(conversation) for conversation in conversations), return_exceptions=True)
 
-    def saveToFile(self):
+    def saveToFile(self, result: dict):
         """
         Saves the conversation, errors, and scores to a log file for later review.
 
@@ -652,25 +977,25 @@ class Validator:
         with open(filename, 'a', encoding='utf-8') as file:
             # Imprimir y guardar la conversación
             file.write("\n\nConversación:\n")
-            for phrase in self.result.get('phrases'):
+            for phrase in result.get('phrases'):
                 file.write(f"\t{phrase.speaker}: {phrase.text}\n")
             
-            file.write(f"\nLista de errores:\n{self.errors_summary}")
+            file.write(f"\nLista de errores:\n{result.get('errors_summary', '')}")
             
             file.write("\nPuntuaciones:\n")
             try:
                 # Imprimir y guardar las puntuaciones
-                for category, data in self.result['score'].items():
+                for category, data in result['score'].items():
                     file.write(f"\t{category.capitalize()}: Puntuación = {data.get('score')}, Explicación = {data.get('explanations')}\n")
             except Exception:
                 # Si el modelo no ha devuelto las puntuaciones en formato JSON
-                file.write(self.result)
+                file.write(str(result.get('score')))
 
         logger.info(f"Output saved to {filename}")
 
-    def followPhraseology(self):
+    def followPhraseology(self, result: dict):
         """
-        This function iterates through the phrases stored in `self.result['phrases']`, retrieves the text of each phrase,
+        This function iterates through the phrases stored in `result['phrases']`, retrieves the text of each phrase,
         and returns a boolean value for each phrase indicating whether or not the phrase follows the phraseology.
 
         Returns:
@@ -680,7 +1005,7 @@ class Validator:
         """
         phrases = []
 
-        for phrase in self.result['phrases']:
+        for phrase in result['phrases']:
             phrases.append((phrase.text, not phrase.otherPhraseology))
 
         return phrases
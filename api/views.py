@@ -1,9 +1,11 @@
+import os
 import logging
 import uuid
 from pathlib import Path
 from django.conf import settings
 from django.utils import timezone
 from django.shortcuts import get_object_or_404
+from django.http import FileResponse
 from rest_framework import status, viewsets, permissions, filters
 from rest_framework.decorators import api_view, permission_classes, action
 from rest_framework.response import Response
@@ -20,10 +22,13 @@ from api.models.models import CommunicationSession, AudioFile, SpeechSegment
 from .serializers import (
     DashboardSessionSerializer, 
     CommunicationSessionDetailSerializer, 
-    AudioFileSerializer
+    AudioFileSerializer,
+    SpeechSegmentSerializer
 )
 # Tareas asíncronas (se actualizarán en el siguiente paso)
-from .tasks import process_audio_file_task
+from .tasks import process_audio_file_task, validate_session_task
+from .diarizer import export_segment_audio
+from . import streaming
 
 logger = logging.getLogger(__name__)
 
@@ -145,17 +150,75 @@ class SessionViewSet(viewsets.ModelViewSet):
             logger.error(f"Error creating session: {e}")
             return Response({'detail': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    @action(detail=False, methods=['POST'])
+    def live(self, request):
+        """
+        Abre una sesión de transcripción en vivo.
+        Payload: airport_code, session_date (opcional).
+        Después el cliente envía el audio con `live_chunk`.
+        """
+        try:
+            session = CommunicationSession.objects.create(
+                atco=request.user,
+                airport_code=request.data.get('airport_code', 'UNKNOWN'),
+                session_date=request.data.get('session_date', timezone.now()),
+                status='processing'
+            )
+            audio_instance = AudioFile(session=session, original_filename=f"live_{session.id}.wav")
+            audio_instance.file.name = f"sessions/audio/live_{session.id}.wav"
+            audio_instance.save()
+
+            streaming.open_stream(session, audio_instance)
+
+            serializer = CommunicationSessionDetailSerializer(session)
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+        except Exception as e:
+            logger.error(f"Error opening live session: {e}")
+            return Response({'detail': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    @action(detail=True, methods=['POST'], url_path='live/chunk', parser_classes=[])
+    def live_chunk(self, request, pk=None):
+        """
+        Recibe un trozo de audio en vivo (cuerpo: PCM int16 LE, 16 kHz, mono) y encola su
+        procesado en Celery. Devuelve los segmentos ya transcritos que terminan después de
+        `?after=<segundos>` (el cliente pasa el `end_time` del último que recibió).
+        Con `?final=1` se cierra el stream y la sesión pasa a revisión.
+        """
+        session = self.get_object()
+        try:
+            final = request.query_params.get('final') in ('1', 'true')
+            after = float(request.query_params.get('after', 0))
+
+            # Puede haberlo cerrado `final` o el reaper en otro proceso: se comprueba al escribir
+            streaming.LiveTranscriptionStream(session.id).append(request.body)
+            streaming.enqueue_processing(session.id, final=final)
+
+            segments = SpeechSegment.objects.filter(audio_file__session=session, end_time__gt=after).order_by('start_time')
+            return Response({
+                'segments': SpeechSegmentSerializer(segments, many=True).data,
+                'final': final
+            }, status=status.HTTP_202_ACCEPTED)
+
+        except streaming.LiveStreamClosedError as e:
+            if e.finalized:
+                return Response({'detail': 'Live stream already closed for this session'}, status=status.HTTP_409_CONFLICT)
+            return Response({'detail': 'No live stream open for this session'}, status=status.HTTP_404_NOT_FOUND)
+        except Exception as e:
+            logger.error(f"Error processing live chunk for session {session.id}: {e}")
+            return Response({'detail': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
     @action(detail=True, methods=['POST'])
     def validate(self, request, pk=None):
         """
         Trigger manual para lanzar la validación de Safety.
         """
         session = self.get_object()
-        # TODO: Implementar llamada a celery validation_task
-        session.status = 'validated' # Mock temporal
-        session.safety_score = 95
-        session.save()
-        return Response({'detail': 'Validation started'}, status=200)
+        if session.status in ('pending', 'processing'):
+            return Response({'detail': 'Session is still being processed'}, status=status.HTTP_409_CONFLICT)
+
+        validate_session_task.delay(str(session.id))
+        return Response({'detail': 'Validation started'}, status=status.HTTP_202_ACCEPTED)
 
 # ==========================================
 # SEGMENT EDITING VIEWS
@@ -178,3 +241,36 @@ class SegmentUpdateView(APIView):
             
         segment.save()
         return Response({'detail': 'Updated'}, status=200)
+
+
+class SegmentAudioView(APIView):
+    """
+    Devuelve el recorte de audio de un segmento.
+    El WAV se genera la primera vez que se pide (el pipeline ya no lo escribe) y se reutiliza después.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        segment = get_object_or_404(SpeechSegment, pk=pk)
+        if segment.audio_file.session.atco != request.user:
+            return Response({'detail': 'Forbidden'}, status=403)
+
+        if segment.segment_file_path:
+            segment_abs_path = os.path.join(settings.MEDIA_ROOT, segment.segment_file_path)
+        else:
+            segment_abs_path = None
+
+        if not segment_abs_path or not os.path.exists(segment_abs_path):
+            audio_path = segment.audio_file.file.path
+            basename = os.path.splitext(os.path.basename(audio_path))[0]
+            segment_abs_path = os.path.join(os.path.dirname(audio_path), f"{basename}_segments", f"segment_{segment.id}.wav")
+            try:
+                export_segment_audio(audio_path, segment.start_time, segment.end_time, segment_abs_path)
+            except Exception as e:
+                logger.error(f"Error exporting segment {pk}: {e}")
+                return Response({'detail': 'Segment audio not available'}, status=status.HTTP_404_NOT_FOUND)
+
+            segment.segment_file_path = os.path.relpath(segment_abs_path, settings.MEDIA_ROOT)
+            segment.save(update_fields=['segment_file_path'])
+
+        return FileResponse(open(segment_abs_path, 'rb'), content_type='audio/wav')
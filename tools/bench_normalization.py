@@ -0,0 +1,77 @@
+"""
+Micro-benchmark de las reglas de normalización (api/transcriber/normalization_rules.py).
+
+Compara el motor compilado (apply_normalization_rules) con la implementación secuencial de
+referencia (una pasada re.sub por regla) y comprueba que ambos producen el mismo texto.
+
+Uso:
+    python tools/bench_normalization.py [--iterations 2000] [--airport LECU]
+"""
+import os
+import sys
+import time
+import argparse
+import importlib.util
+
+RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'api', 'transcriber', 'normalization_rules.py')
+
+# Frases típicas tras Whisper (sin normalizar)
+UTTERANCES = [
+    "Cuatro Vientos torre buenos días Aerotec uno dos tres solicita rodaje",
+    "airotek one two three autorizado a rodar punto de espera pista dos siete",
+    "european flyers cinco cero cero rueda al punto de espera pista nueve",
+    "Quality fly tres cuatro QNH uno cero uno nueve viento en cual",
+    "eco charly ray yuli victoria notifique tarra 4 vientos",
+    "on fire compañero general los vientres tower frecuencia uno dos tres",
+    "Escotia libra kilo lima mike autorizado aterrizar pista 2 7 viento tres cero cero grados diez nudos",
+    "Qualified seis siete amandando la frecuencia mil gracias",
+    "valladolí nivel de vuelo cero ocho cero directo",
+    "Canary fly dos uno cinco contacte aproximación",
+]
+
+
+def load_rules():
+    spec = importlib.util.spec_from_file_location('normalization_rules', RULES_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def bench(func, airport, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for text in UTTERANCES:
+            func(text, airport)
+    return (time.perf_counter() - start) / (iterations * len(UTTERANCES))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=2000)
+    parser.add_argument('--airport', action='append', help='Código ICAO (repetible). Por defecto: sin aeropuerto, LECU y GCFV')
+    args = parser.parse_args()
+
+    rules = load_rules()
+    airports = args.airport or [None, 'LECU', 'GCFV']
+
+    for airport in airports:
+        for text in UTTERANCES:
+            expected = rules.apply_normalization_rules_sequential(text, airport)
+            actual = rules.apply_normalization_rules(text, airport)
+            if expected != actual:
+                print(f"MISMATCH [{airport}] {text!r}\n  sequential: {expected!r}\n  compiled:   {actual!r}")
+                sys.exit(1)
+
+        passes = len(rules.get_rule_passes(airport))
+        n_rules = len(rules.COMMON_RULES) + len(rules.AIRPORT_RULES.get(airport, []) if airport else [])
+        sequential = bench(rules.apply_normalization_rules_sequential, airport, args.iterations)
+        compiled = bench(rules.apply_normalization_rules, airport, args.iterations)
+        print(
+            f"{airport or 'DEFAULT':8} rules={n_rules:3} passes={passes:3}  "
+            f"sequential={sequential * 1e6:8.1f} us/utt  compiled={compiled * 1e6:8.1f} us/utt  "
+            f"speedup={sequential / compiled:4.1f}x"
+        )
+
+
+if __name__ == '__main__':
+    main()
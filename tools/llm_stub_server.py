@@ -0,0 +1,79 @@
+"""
+Servidor stub de Ollama (/api/chat) y Gemini (generateContent) para probar api/llm_client.py
+(timeouts, reintentos y circuit breaker) sin modelos ni conexión externa.
+
+Responde con un JSON fijo de sanitizador ({"refined_text", "speaker"}) o con el que se pase en
+--reply, tras --latency segundos, y falla con HTTP 503 en una fracción --failure-rate de las
+peticiones.
+
+Uso:
+    python tools/llm_stub_server.py [--port 11500] [--latency 0.2] [--failure-rate 0.3] [--reply '{...}']
+    OLLAMA_BASE_URL=http://localhost:11500 GEMINI_BASE_URL=http://localhost:11500 ...
+"""
+import json
+import time
+import random
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_REPLY = {'refined_text': 'Recibido', 'speaker': 'PILOT'}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+    failure_rate = 0.0
+    reply = json.dumps(DEFAULT_REPLY)
+    requests = 0
+
+    def do_POST(self):
+        StubHandler.requests += 1
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        time.sleep(self.latency)
+
+        if random.random() < self.failure_rate:
+            return self._send(503, {'error': 'stub failure'})
+        if self.path.startswith('/api/chat'):
+            return self._send(200, {
+                'model': 'stub', 'created_at': '1970-01-01T00:00:00Z', 'done': True, 'done_reason': 'stop',
+                'message': {'role': 'assistant', 'content': self.reply},
+                'prompt_eval_count': 1, 'eval_count': 1,
+            })
+        if ':generateContent' in self.path:
+            return self._send(200, {'candidates': [{'content': {'parts': [{'text': self.reply}]}}]})
+        self._send(404, {'error': f'unknown path {self.path}'})
+
+    def _send(self, status: int, body: dict):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        print(f"[stub #{StubHandler.requests}] {format % args}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=11500)
+    parser.add_argument('--latency', type=float, default=0.0, help='segundos por respuesta')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='fracción de respuestas 503')
+    parser.add_argument('--reply', default=None, help='contenido (JSON) de la respuesta del modelo')
+    args = parser.parse_args()
+
+    StubHandler.latency = args.latency
+    StubHandler.failure_rate = args.failure_rate
+    if args.reply is not None:
+        StubHandler.reply = args.reply
+
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), StubHandler)
+    print(f"LLM stub listening on http://127.0.0.1:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -58,6 +58,57 @@ CELERY_TASK_SOFT_TIME_LIMIT = 3300  # 55 min soft limit (lanza excepción)
 # 5. Heartbeats: Mantener conexión viva con RabbitMQ (evita "Connection Storm")
 CELERY_BROKER_HEARTBEAT = 10 # Segundos
 
+# --- VLAS PIPELINE SETTINGS ---
+# Segmentos por batch en la transcripción Faster-Whisper (invoke_batch)
+WHISPER_BATCH_SIZE = int(os.getenv('WHISPER_BATCH_SIZE', '8'))
+
+# Servidor de modelos persistente (python manage.py run_model_server).
+# Si está vacío, cada worker carga Whisper/pyannote en su propio proceso.
+MODEL_SERVER_ADDRESS = os.getenv('MODEL_SERVER_ADDRESS') or None  # ej: 'model-server:7070' o '/tmp/vlas-models.sock'
+MODEL_SERVER_COALESCE_MS = int(os.getenv('MODEL_SERVER_COALESCE_MS', '50'))
+MODEL_SERVER_MAX_BATCH_SEGMENTS = int(os.getenv('MODEL_SERVER_MAX_BATCH_SEGMENTS', '64'))
+MODEL_SERVER_TIMEOUT = int(os.getenv('MODEL_SERVER_TIMEOUT', '3600'))
+
+# Fan-out de la transcripción en un chord de Celery (un task por batch de segmentos).
+# El buffer de audio se comparte entre workers como .npy en MEDIA_ROOT/cache/pcm.
+PIPELINE_FANOUT = os.getenv('PIPELINE_FANOUT', '1').lower() in ['true', 't', '1']
+PIPELINE_FANOUT_BATCH_SEGMENTS = int(os.getenv('PIPELINE_FANOUT_BATCH_SEGMENTS', '16'))
+
+# Pipeline transcripción → sanitización → BD de un audio (api/stage_pipeline.py): elementos máximos por cola entre etapas
+PIPELINE_QUEUE_SIZE = int(os.getenv('PIPELINE_QUEUE_SIZE', '32'))
+
+# Diarización por ventanas de grabaciones largas y PCM en memory-map: el diarizador no depende de
+# Django y lee DIARIZATION_CHUNK_S/_OVERLAP_S, DIARIZATION_STITCH_THRESHOLD, AUDIO_PCM_CACHE_DIR/_MAX_BYTES,
+# AUDIO_PCM_SPILL_DIR y AUDIO_RESAMPLER del entorno (api/diarizer.py, api/audio_loader.py)
+
+# Caché por contenido (hash del PCM) de diarización y transcripciones (api/transcription_cache.py)
+TRANSCRIPTION_CACHE_ENABLED = os.getenv('TRANSCRIPTION_CACHE_ENABLED', '1').lower() in ['true', 't', '1']
+TRANSCRIPTION_CACHE_DIR = os.getenv('TRANSCRIPTION_CACHE_DIR') or None  # por defecto MEDIA_ROOT/cache
+TRANSCRIPTION_CACHE_MAX_BYTES = int(os.getenv('TRANSCRIPTION_CACHE_MAX_BYTES', str(512 * 1024 ** 2)))
+
+# Diccionario de normalización (TranscriptionCorrection) en memoria: segundos hasta recargarlo
+# en procesos que no reciben la señal de guardado (workers, servidor de modelos)
+NORMALIZATION_DICTIONARY_TTL = int(os.getenv('NORMALIZATION_DICTIONARY_TTL', '60'))
+
+# Transcripción en vivo (api/streaming.py)
+LIVE_STREAM_MIN_SILENCE_MS = int(os.getenv('LIVE_STREAM_MIN_SILENCE_MS', '500'))  # silencio que cierra una transmisión
+LIVE_STREAM_MAX_UTTERANCE_S = int(os.getenv('LIVE_STREAM_MAX_UTTERANCE_S', '30'))  # corte forzado de locuciones largas
+LIVE_STREAM_SANITIZE = os.getenv('LIVE_STREAM_SANITIZE', '1').lower() in ['true', 't', '1']
+LIVE_STREAM_IDLE_TIMEOUT_S = int(os.getenv('LIVE_STREAM_IDLE_TIMEOUT_S', '120'))  # streams sin audio este tiempo se cierran solos
+LIVE_STREAM_QUEUE = os.getenv('LIVE_STREAM_QUEUE') or None  # cola de Celery del procesado en vivo (None = la de por defecto)
+
+# Sanitizador semántico (api/transcriber/semantic_sanitizer.py)
+SANITIZER_BACKEND = os.getenv('SANITIZER_BACKEND', 'gemini')  # 'gemini' o 'ollama' (local, sin conexión externa)
+SANITIZER_MODEL = os.getenv('SANITIZER_MODEL') or None  # por defecto gemini-1.5-flash / OLLAMA_MODEL
+SANITIZER_BATCH_SIZE = int(os.getenv('SANITIZER_BATCH_SIZE', '8'))  # segmentos por petición
+SANITIZER_CONTEXT_LINES = int(os.getenv('SANITIZER_CONTEXT_LINES', '3'))  # frases refinadas de la ventana anterior como contexto
+
+# Validación de sesiones (api/session_validation.py). El Validator lee además VALIDATOR_* y LLM_CACHE_* del entorno
+VALIDATOR_MODEL = os.getenv('VALIDATOR_MODEL', OLLAMA_MODEL)
+VALIDATION_CONVERSATION_GAP_S = float(os.getenv('VALIDATION_CONVERSATION_GAP_S', '30'))  # silencio que separa dos conversaciones
+VALIDATION_SAME_SPEAKER_GAP_S = float(os.getenv('VALIDATION_SAME_SPEAKER_GAP_S', '5'))  # mismo interlocutor tras este silencio = intercambio nuevo
+VALIDATION_MAX_EXCHANGE_TURNS = int(os.getenv('VALIDATION_MAX_EXCHANGE_TURNS', '8'))  # 0 = sin límite
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.1/howto/deployment/checklist/